@@ -0,0 +1,251 @@
+"""챌린지 트래커 주요 동작 벤치마크 (화면에 창을 띄우지 않음)
+
+숨긴(withdraw) Tk 창에 PokemonChallengeGUI를 만들고 입력 시나리오를 재생하면서
+시나리오별 소요 시간, 메모리 할당(tracemalloc), Tk 호출 수를 측정합니다.
+기준값(JSON)과 비교해서 느려졌으면 종료 코드 1로 끝납니다.
+
+사용법:
+    python benchmark_tracker.py                        # 기준값과 비교
+    python benchmark_tracker.py --save-baseline        # 현재 결과를 기준값으로 저장
+    python benchmark_tracker.py --trace typing.json    # 검색어 입력 기록 재생 (문자열 리스트)
+
+리눅스에서 화면이 없으면 xvfb-run python benchmark_tracker.py 로 실행합니다.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tkinter as tk
+import tracemalloc
+
+import challenge_core as core
+import oneshot_allmove_challenge as tracker
+
+# 실행 위치와 관계없이 이 스크립트 옆의 기준값 파일 사용
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+
+# 기본 검색어 입력 기록 (IME 조합 중간 상태 포함, 지우기까지)
+DEFAULT_TYPING_TRACE = [
+    "ㅂ", "부", "불", "불ㄲ", "불꼬", "불꽃", "불꽃ㅍ", "불꽃퍼", "불꽃펀", "불꽃펀ㅊ", "불꽃펀치",
+    "불꽃펀", "불꽃", "불", "",
+    "ㄷㅊ", "ㄷ", "", "1", "12", "123", "12", "1", "",
+]
+
+# 필터 조합 (타입, 카테고리, 사용 여부)
+FILTER_TRACE = [
+    ("불꽃", "전체", "전체"), ("불꽃", "물리", "전체"), ("물", "특수", "사용안됨"),
+    ("전체", "변화", "전체"), ("전체", "전체", "사용됨"), ("전체", "전체", "전체"),
+]
+
+
+class TkCallCounter:
+    """Tk 인터프리터 프록시 - 위젯이 Tcl로 보내는 호출 수를 셈"""
+    def __init__(self, tkapp):
+        self._tkapp = tkapp
+        self.calls = 0
+
+    def call(self, *args):
+        self.calls += 1
+        return self._tkapp.call(*args)
+
+    def eval(self, script):
+        self.calls += 1
+        return self._tkapp.eval(script)
+
+    def __getattr__(self, name):
+        return getattr(self._tkapp, name)
+
+
+class Benchmark:
+    def __init__(self, repeat, typing_trace):
+        self.repeat = repeat
+        self.typing_trace = typing_trace
+        self.results = {}
+
+    def setup_app(self):
+        """임시 폴더에서 앱 생성 (설정/캐시/Lua 인터페이스 파일이 작업 폴더를 건드리지 않게)"""
+        self.workdir = tempfile.mkdtemp(prefix="tracker_bench_")
+        # 수정 시각까지 복사해야 바이너리 캐시가 그대로 쓰임
+        for name in ("pokemon_moves.csv", "pokemon_moves.cache"):
+            shutil.copy2(os.path.join(self.source_dir, name), self.workdir)
+        os.chdir(self.workdir)
+
+        self.root = tk.Tk()
+        self.root.withdraw()
+        self.counter = TkCallCounter(self.root.tk)
+        self.root.tk = self.counter
+        self.app = tracker.PokemonChallengeGUI(self.root)
+        self.root.update()
+
+    def teardown_app(self):
+        self.app.save_worker.stop()
+        self.app.lua_channel.stop()
+        self.app.close_journal()
+        self.root.destroy()
+        os.chdir(self.source_dir)
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def measure(self, name, scenario):
+        """시나리오를 repeat번 실행해 중앙값 시간, 마지막 한 번은 tracemalloc으로 할당량 측정"""
+        times = []
+        calls = 0
+        for _ in range(self.repeat):
+            self.setup_app()
+            try:
+                start_calls = self.counter.calls
+                start = time.perf_counter()
+                scenario()
+                self.root.update_idletasks()
+                times.append((time.perf_counter() - start) * 1000)
+                calls = self.counter.calls - start_calls
+            finally:
+                self.teardown_app()
+
+        self.setup_app()
+        try:
+            tracemalloc.start()
+            scenario()
+            self.root.update_idletasks()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        finally:
+            self.teardown_app()
+
+        self.results[name] = {
+            "wall_ms": statistics.median(times),
+            "wall_ms_min": min(times),
+            "alloc_peak_kb": peak / 1024,
+            "alloc_retained_kb": current / 1024,
+            "tk_calls": calls,
+        }
+        print(f"{name:<24} {self.results[name]['wall_ms']:9.2f} ms  "
+              f"peak {peak / 1024:9.1f} KB  Tk 호출 {calls:7d}")
+
+    # ---- 시나리오 ----
+
+    def scenario_load_moves(self):
+        """기술 데이터 로드 (캐시 사용) + 목록 구성"""
+        self.app.load_moves_data()
+
+    def scenario_typing(self):
+        """검색창 입력 재생 (디바운스 없이 입력마다 필터링)"""
+        for text in self.typing_trace:
+            self.app.search_var.set(text)
+            self.app.search_scheduler.cancel()
+            self.app.refresh_treeview()
+
+    def scenario_filters(self):
+        """타입/카테고리/사용 여부 필터 변경"""
+        for move_type, category, status in FILTER_TRACE:
+            self.app.type_var.set(move_type)
+            self.app.category_var.set(category)
+            self.app.status_var.set(status)
+            self.app.refresh_treeview()
+        for column in ("name", "power", "accuracy", "pp", "id"):
+            self.app.sort_treeview(column)
+
+    def scenario_combo_search(self):
+        """기술 선택 콤보박스 입력 재생"""
+        for text in self.typing_trace:
+            self.app.move_selection_var.set(text)
+            self.app.apply_move_combo_search()
+        self.app.update_available_moves_combo()
+
+    def scenario_full_run(self):
+        """467개 기술을 모두 사용 (무작위 순서, 1P/2P 번갈아)"""
+        move_ids = [record.id for record in self.app.move_table]
+        random.Random(4).shuffle(move_ids)
+        for i, move_id in enumerate(move_ids):
+            self.app.use_move(move_id, 1 + i % 2)
+        self.app.update_history_display()
+
+    def scenario_save_load(self):
+        """사용 기록이 찬 상태에서 저장/불러오기 반복"""
+        for record in self.app.move_table:
+            self.app.use_move(record.id)
+        file_path = os.path.join(self.workdir, "saves", "bench.json")
+        for _ in range(5):
+            self.app._save_to_file(file_path, manual=False)
+            # 백그라운드 저장이 끝날 때까지 대기 (결과 처리는 poll_save_results와 같게)
+            self.app.save_worker.results.get(timeout=10)
+            self.app.saves_in_flight = 0
+            self.app._load_from_file(file_path)
+            self.app.refresh_treeview()
+            self.app.update_history_display()
+
+    def run(self):
+        self.source_dir = os.path.dirname(os.path.abspath(__file__))
+        # 첫 실행에서 바이너리 캐시가 만들어지도록 한 번 로드
+        core.MoveDataCache(os.path.join(self.source_dir, "pokemon_moves.csv")).load()
+
+        self.measure("load_moves_data", self.scenario_load_moves)
+        self.measure("typing", self.scenario_typing)
+        self.measure("filters_and_sort", self.scenario_filters)
+        self.measure("combo_search", self.scenario_combo_search)
+        self.measure("full_run_467", self.scenario_full_run)
+        self.measure("save_load_cycle", self.scenario_save_load)
+        return self.results
+
+
+def compare(results, baseline, tolerance):
+    """기준값보다 나빠진 항목 목록 (시간/할당은 tolerance 비율, Tk 호출 수는 그대로 비교)"""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        # 1 ms 미만 차이는 측정 오차로 봄
+        if result["wall_ms"] > base["wall_ms"] * (1 + tolerance) + 1.0:
+            regressions.append(f"{name}: 시간 {base['wall_ms']:.2f} → {result['wall_ms']:.2f} ms")
+        if result["alloc_peak_kb"] > base["alloc_peak_kb"] * (1 + tolerance) + 16:
+            regressions.append(f"{name}: 할당 {base['alloc_peak_kb']:.1f} → {result['alloc_peak_kb']:.1f} KB")
+        if result["tk_calls"] > base["tk_calls"]:
+            regressions.append(f"{name}: Tk 호출 {base['tk_calls']} → {result['tk_calls']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="챌린지 트래커 벤치마크")
+    parser.add_argument("--repeat", type=int, default=5, help="시나리오 반복 횟수 (중앙값 사용)")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="기준값 파일")
+    parser.add_argument("--save-baseline", action="store_true", help="현재 결과를 기준값으로 저장")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="허용 비율 (기본 0.25 = 25%%)")
+    parser.add_argument("--trace", help="검색어 입력 기록 JSON (문자열 리스트)")
+    args = parser.parse_args()
+
+    typing_trace = DEFAULT_TYPING_TRACE
+    if args.trace:
+        with open(args.trace, 'r', encoding='utf-8') as f:
+            typing_trace = json.load(f)
+
+    results = Benchmark(args.repeat, typing_trace).run()
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"기준값 저장: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"기준값 파일 없음 ({args.baseline}) - --save-baseline으로 먼저 저장하세요")
+        return 0
+
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print("\n성능 저하 발견:")
+        for line in regressions:
+            print(f"  - {line}")
+        return 1
+    print("\n기준값 대비 성능 저하 없음")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -15,6 +15,7 @@ if exist *.spec del *.spec
 echo [2/5] Building executable with PyInstaller...
 echo This may take a few minutes...
 pyinstaller --onefile --windowed oneshot_allmove_challenge.py
+pyinstaller --onefile challenge_cli.py
 
 if not exist dist\oneshot_allmove_challenge.exe (
     echo ERROR: Build failed! Check if PyInstaller is installed.
@@ -30,6 +31,7 @@ mkdir release\lua_interface
 
 echo [4/5] Copying files to release...
 copy dist\oneshot_allmove_challenge.exe release\
+copy dist\challenge_cli.exe release\
 copy pokemon_moves.csv release\
 copy oneshot_allmove_script.lua release\
 copy settings.ini release\
@@ -39,6 +41,7 @@ echo [5/5] Cleaning up build files...
 rmdir /s /q build
 rmdir /s /q dist
 del oneshot_allmove_challenge.spec
+del challenge_cli.spec
 
 echo.
 echo ==========================================
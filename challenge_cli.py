@@ -0,0 +1,244 @@
+"""원샷 올무브 챌린지 명령줄 도구 (GUI 없이 기술 사용/상태 확인/메모리 스캔/내보내기)
+
+tkinter를 불러오지 않으므로 바로 실행되어 단축키나 매크로(스트림 덱 등)에 연결하기 좋습니다.
+
+사용법:
+    python challenge_cli.py use 123 --player 2          # 123번 기술 사용 (2P 슬롯 1), Lua에 전송
+    python challenge_cli.py use 불꽃펀치 냉동펀치 --slot 1  # 여러 기술을 슬롯 2, 3에 한 번에
+    python challenge_cli.py status                      # 진행 상황
+    python challenge_cli.py scan 33,45,0,0 --wide       # 기술 슬롯 주소 스캔
+    python challenge_cli.py pointers                    # Lua가 찾은 포인터 경로 (--reset: 다시 검색)
+    python challenge_cli.py export --format csv -o moves.csv
+
+세이브 파일은 --save로 지정하고, 없으면 saves 폴더에서 가장 최근에 수정된 .json 파일을 씁니다.
+기술 사용은 세이브 파일의 저널에 기록되므로, 같은 세이브 파일을 GUI가 열고 있으면 use는 거부됩니다
+(status/export는 저널을 열지 않고 읽기만 하므로 GUI와 함께 쓸 수 있습니다).
+"""
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+import time
+
+from challenge_core import ChallengeSession, LuaSessionFile, load_settings
+
+
+def find_latest_save(directory="saves"):
+    """가장 최근에 수정된 세이브 파일 (없으면 None)"""
+    saves = glob.glob(os.path.join(directory, "*.json"))
+    return max(saves, key=os.path.getmtime) if saves else None
+
+
+def open_session(args):
+    # 실행마다 같은 Lua 세션 ID를 이어 씀 (핫키로 자주 실행해도 Lua가 기억할 세션이 늘지 않게)
+    session_file = LuaSessionFile(os.path.join(args.lua_dir, "cli_session.txt"))
+    session = ChallengeSession(load_settings(), lua_directory=args.lua_dir, lua_session_file=session_file)
+    session.load_moves(args.moves_csv)
+    save_file = args.save or find_latest_save()
+    if save_file and os.path.exists(save_file):
+        # 기록하는 명령만 저널을 열고 잠금 (GUI가 열고 있으면 JournalLockedError)
+        session.load(save_file, open_journal=args.command == "use")
+    return session
+
+
+def resolve_move(session, text):
+    """기술 ID 또는 기술명으로 기술 찾기"""
+    if text.isdigit():
+        return session.move_table.get(int(text))
+    for record in session.move_table:
+        if record.name == text:
+            return record
+    return None
+
+
+def wait_responses(session, seqs, timeout):
+    """seqs의 최종 응답이 모두 올 때까지 응답 전달, 시간 초과면 False"""
+    waiting = set(seqs)
+    deadline = time.perf_counter() + timeout
+    while waiting and time.perf_counter() < deadline:
+        session.lua_channel.dispatch_responses()
+        session.lua_channel.poll_acks()
+        waiting &= set(session.lua_channel.callbacks)
+        time.sleep(0.005)
+    return not waiting
+
+
+def command_use(session, args):
+    writes = []
+    for offset, text in enumerate(args.targets):
+        record = resolve_move(session, text)
+        if record is None:
+            print(f"알 수 없는 기술: {text}", file=sys.stderr)
+            return 1
+        if record.id in session.used_moves:
+            print(f"이미 사용된 기술: {record.id}. {record.name}", file=sys.stderr)
+            return 1
+        if any(move_id == record.id for _, _, move_id in writes):
+            print(f"같은 기술을 두 번 지정했습니다: {record.id}. {record.name}", file=sys.stderr)
+            return 1
+        slot = args.slot - 1 + offset
+        if slot > 3:
+            print("기술 슬롯은 4번까지입니다.", file=sys.stderr)
+            return 1
+        writes.append((args.player, slot, record.id))
+
+    session.use_moves(writes)
+    if session.current_save_file is None:
+        print("세이브 파일 없음: 사용 기록이 저장되지 않습니다.", file=sys.stderr)
+    elif session.journal is None:
+        session.save(session.current_save_file)  # 저널을 쓰지 않으면 스냅샷 바로 저장
+
+    for player, slot, move_id in writes:
+        print(f"{player}P 슬롯 {slot + 1}: {move_id}. {session.move_table.get(move_id).name}")
+
+    if args.no_lua:
+        return 0
+    results = []
+    seq = session.send_moves(writes, callback=lambda seq, kind, payload: results.append((kind, payload)))
+    if args.wait <= 0:
+        return 0
+    if not wait_responses(session, [seq], args.wait):
+        print("Lua 응답 없음 (명령은 큐에 남아 있습니다)", file=sys.stderr)
+        return 1
+    kind, payload = results[-1]
+    if kind == "ERROR":
+        print(f"Lua 명령 실패: {payload}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def command_status(session, args):
+    status = session.status()
+    if args.json:
+        print(json.dumps(status, ensure_ascii=False, indent=2))
+        return 0
+
+    total = status["total"]
+    percentage = status["used"] / total * 100 if total else 0.0
+    print(f"세이브 파일: {status['save_file'] or '없음'}")
+    print(f"게임: {status['game_version']}")
+    print(f"사용한 기술: {status['used']}/{total} ({percentage:.1f}%)")
+    for name in ("types", "categories"):
+        print("  " + "  ".join(f"{key} {used}/{subtotal}" for key, (used, subtotal) in status[name].items()))
+    for record in status["last_moves"]:
+        print(f"  [{record['timestamp']}] {record['id']}. {record['name']}")
+    return 0
+
+
+def command_scan(session, args):
+    command = f"SCAN:{args.pattern}" + (":WIDE" if args.wide else "")
+    results = []
+
+    def on_response(seq, kind, payload):
+        if kind == "PROGRESS":
+            print(f"스캔 중... {payload}%", file=sys.stderr)
+        else:
+            results.append((kind, payload))
+
+    seq = session.lua_channel.send(command, callback=on_response)
+    if not wait_responses(session, [seq], args.timeout):
+        print("Lua 응답 없음 - BizHawk에서 Lua 스크립트가 실행 중인지 확인하세요.", file=sys.stderr)
+        return 1
+    kind, payload = results[-1]
+    if kind == "ERROR":
+        print(f"스캔 실패: {payload}", file=sys.stderr)
+        return 1
+    print(payload)
+    return 0
+
+
+def command_pointers(session, args):
+    results = []
+    seq = session.lua_channel.send("POINTERS:RESET" if args.reset else "POINTERS",
+                                   callback=lambda seq, kind, payload: results.append((kind, payload)))
+    if not wait_responses(session, [seq], args.timeout):
+        print("Lua 응답 없음 - BizHawk에서 Lua 스크립트가 실행 중인지 확인하세요.", file=sys.stderr)
+        return 1
+    kind, payload = results[-1]
+    if kind == "ERROR":
+        messages = {"NO_POINTERS": "포인터 경로 없음 - 대전 중에 주소를 찾으면 검색합니다.",
+                    "SEARCHING": "포인터 경로 검색 중입니다."}
+        print(messages.get(payload, f"오류: {payload}"), file=sys.stderr)
+        return 1
+    if kind == "DONE":
+        print("포인터 경로를 지웠습니다 (대전 중이면 다시 검색합니다).")
+        return 0
+    # "0x기준주소|0x오프셋,..." -> "[0x기준주소] +0x20 -> [...] +0xAEC" (대괄호 = 그 주소의 포인터 값)
+    for path in payload.split(";"):
+        base, _, offsets = path.partition("|")
+        print(f"[{base}] " + " -> [...] ".join(f"+{offset}" for offset in offsets.split(",")))
+    return 0
+
+
+def command_export(session, args):
+    used_at = {record["id"]: record["timestamp"] for record in session.move_history}
+    rows = [{"id": record.id, "name": record.name, "type": record.type, "category": record.category,
+             "used": record.id in session.used_moves, "used_at": used_at.get(record.id, "")}
+            for record in session.move_table]
+
+    output = open(args.output, 'w', encoding='utf-8-sig' if args.format == "csv" else 'utf-8', newline='') \
+        if args.output else sys.stdout
+    try:
+        if args.format == "csv":
+            writer = csv.DictWriter(output, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+        else:
+            json.dump({"status": session.status(), "moves": rows, "history": session.move_history},
+                      output, ensure_ascii=False, indent=2)
+            output.write("\n")
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="원샷 올무브 챌린지 명령줄 도구")
+    parser.add_argument("--save", help="세이브 파일 (기본: saves 폴더의 가장 최근 파일)")
+    parser.add_argument("--moves-csv", default="pokemon_moves.csv", help="기술 데이터 CSV")
+    parser.add_argument("--lua-dir", default="lua_interface", help="Lua 통신 폴더")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    use_parser = commands.add_parser("use", help="기술 사용 (ID 또는 기술명, 여러 개면 다음 슬롯에)")
+    use_parser.add_argument("targets", nargs="+", metavar="기술")
+    use_parser.add_argument("--player", type=int, choices=(1, 2), default=1)
+    use_parser.add_argument("--slot", type=int, choices=(1, 2, 3, 4), default=1, help="첫 기술을 바꿀 슬롯")
+    use_parser.add_argument("--no-lua", action="store_true", help="기록만 하고 Lua에 보내지 않음")
+    use_parser.add_argument("--wait", type=float, default=0.0, help="Lua 완료 응답을 기다릴 시간(초)")
+
+    status_parser = commands.add_parser("status", help="진행 상황")
+    status_parser.add_argument("--json", action="store_true")
+
+    scan_parser = commands.add_parser("scan", help="현재 기술 4개로 기술 슬롯 주소 스캔 (예: 33,45,0,0)")
+    scan_parser.add_argument("pattern", metavar="기술4개")
+    scan_parser.add_argument("--wide", action="store_true", help="Main RAM 전체 스캔")
+    scan_parser.add_argument("--timeout", type=float, default=10.0)
+
+    pointers_parser = commands.add_parser("pointers", help="Lua가 찾은 기술 슬롯 포인터 경로")
+    pointers_parser.add_argument("--reset", action="store_true", help="저장된 경로를 지우고 다시 검색")
+    pointers_parser.add_argument("--timeout", type=float, default=5.0)
+
+    export_parser = commands.add_parser("export", help="기술별 사용 여부 내보내기")
+    export_parser.add_argument("--format", choices=("csv", "json"), default="csv")
+    export_parser.add_argument("-o", "--output")
+
+    args = parser.parse_args()
+    handlers = {"use": command_use, "status": command_status, "scan": command_scan,
+                "pointers": command_pointers, "export": command_export}
+
+    try:
+        session = open_session(args)
+    except (OSError, ValueError) as e:
+        print(f"오류: {e}", file=sys.stderr)
+        return 1
+    try:
+        return handlers[args.command](session, args)
+    finally:
+        session.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
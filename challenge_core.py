@@ -0,0 +1,1710 @@
+"""원샷 올무브 챌린지 핵심 로직 (tkinter 없이 동작)
+
+기술 데이터/검색 인덱스, 사용 상태, 세이브 파일/저널, Lua 명령 채널과 ChallengeSession을 담고 있습니다.
+GUI(oneshot_allmove_challenge.py)와 CLI(challenge_cli.py)가 같이 사용합니다.
+"""
+import configparser
+import csv
+import hashlib
+import io
+import json
+import marshal
+import math
+import os
+import queue
+import select
+import struct
+import sys
+import threading
+import time
+from datetime import datetime
+
+# 한글 음절 분해용 자모 테이블
+CHOSEONG = "ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ"
+JONGSEONG = ("", "ㄱ", "ㄲ", "ㄳ", "ㄴ", "ㄵ", "ㄶ", "ㄷ", "ㄹ", "ㄺ", "ㄻ", "ㄼ", "ㄽ", "ㄾ", "ㄿ", "ㅀ",
+             "ㅁ", "ㅂ", "ㅄ", "ㅅ", "ㅆ", "ㅇ", "ㅈ", "ㅊ", "ㅋ", "ㅌ", "ㅍ", "ㅎ")
+# 겹받침 -> (앞 받침, 다음 글자 초성)
+COMPOUND_JONGSEONG = {"ㄳ": "ㄱㅅ", "ㄵ": "ㄴㅈ", "ㄶ": "ㄴㅎ", "ㄺ": "ㄹㄱ", "ㄻ": "ㄹㅁ", "ㄼ": "ㄹㅂ",
+                      "ㄽ": "ㄹㅅ", "ㄾ": "ㄹㅌ", "ㄿ": "ㄹㅍ", "ㅀ": "ㄹㅎ", "ㅄ": "ㅂㅅ"}
+
+
+def decompose_hangul(char):
+    """한글 음절을 (초성, 중성, 종성) 인덱스로 분해, 한글 음절이 아니면 None"""
+    code = ord(char) - 0xAC00
+    if 0 <= code < 11172:
+        return code // 588, (code % 588) // 28, code % 28
+    return None
+
+
+class MoveSearchIndex:
+    """기술명 검색 인덱스 (초성 검색, 접두어 우선 순위 정렬)
+
+    글자별 역색인(비트셋)으로 후보를 좁힌 뒤 후보만 실제로 비교합니다.
+    - "ㅁㅊ" -> 막치기 (초성)
+    - "막칙" -> 막치기 (입력 중인 마지막 글자의 받침을 다음 글자 초성으로 해석)
+    """
+    CACHE_SIZE = 64
+
+    def __init__(self, names):
+        self.names = {}           # 기술 ID -> 기술명 (소문자)
+        self.syllables = {}       # 기술 ID -> 글자별 분해 결과
+        self.id_texts = {}        # 기술 ID -> ID 문자열
+        self.char_bits = {}       # 글자 -> 비트셋
+        self.cho_bits = {}        # 초성 인덱스 -> 비트셋
+        self.syllable_bits = {}   # (초성, 중성) -> 비트셋
+        self.id_char_bits = {}    # ID 숫자 -> 비트셋
+        self.all_bits = 0
+        self.cache = {}           # (검색어, ID 검색 여부) -> 일치 비트셋
+
+        for move_id, name in names.items():
+            bit = 1 << move_id
+            self.all_bits |= bit
+            name = str(name).lower()
+            self.names[move_id] = name
+            self.id_texts[move_id] = str(move_id)
+            self.syllables[move_id] = [decompose_hangul(c) for c in name]
+
+            for char, parts in zip(name, self.syllables[move_id]):
+                self.char_bits[char] = self.char_bits.get(char, 0) | bit
+                if parts:
+                    self.cho_bits[parts[0]] = self.cho_bits.get(parts[0], 0) | bit
+                    key = parts[:2]
+                    self.syllable_bits[key] = self.syllable_bits.get(key, 0) | bit
+            for char in self.id_texts[move_id]:
+                self.id_char_bits[char] = self.id_char_bits.get(char, 0) | bit
+
+    STATE_FIELDS = ("names", "syllables", "id_texts", "char_bits", "cho_bits",
+                    "syllable_bits", "id_char_bits", "all_bits")
+
+    def to_state(self):
+        """캐시 저장용 상태 (검색 결과 캐시는 제외)"""
+        return {field: getattr(self, field) for field in self.STATE_FIELDS}
+
+    @classmethod
+    def from_state(cls, state):
+        """to_state() 결과로 인덱스 복원"""
+        index = cls.__new__(cls)
+        for field in cls.STATE_FIELDS:
+            setattr(index, field, state[field])
+        index.cache = {}
+        return index
+
+    def _tokenize(self, query):
+        """검색어를 글자별 비교 토큰으로 변환"""
+        tokens = []
+        for i, char in enumerate(query):
+            is_last = i == len(query) - 1
+            parts = decompose_hangul(char)
+            if char in CHOSEONG:
+                tokens.append(("cho", CHOSEONG.index(char), char))
+            elif parts and is_last and parts[2] == 0:
+                tokens.append(("syllable", parts[0], parts[1]))
+            elif parts and is_last:
+                jong = JONGSEONG[parts[2]]
+                split = COMPOUND_JONGSEONG.get(jong, jong)
+                keep = JONGSEONG.index(split[0]) if len(split) == 2 else 0
+                tokens.append(("last", char, parts[0], parts[1], keep, CHOSEONG.index(split[-1])))
+            else:
+                tokens.append(("char", char))
+        return tokens
+
+    def _token_bits(self, token):
+        """토큰과 일치할 수 있는 후보 비트셋 (상위 집합)"""
+        kind = token[0]
+        if kind == "cho":
+            return self.cho_bits.get(token[1], 0) | self.char_bits.get(token[2], 0)
+        if kind == "syllable":
+            return self.syllable_bits.get(token[1:], 0)
+        if kind == "last":
+            return self.char_bits.get(token[1], 0) | self.syllable_bits.get(token[2:4], 0)
+        return self.char_bits.get(token[1], 0)
+
+    def _match_at(self, move_id, tokens, start):
+        """start 위치부터 토큰이 연속으로 일치하면 끝 위치, 아니면 -1"""
+        name = self.names[move_id]
+        syllables = self.syllables[move_id]
+        pos = start
+        for token in tokens:
+            if pos >= len(name):
+                return -1
+            kind = token[0]
+            parts = syllables[pos]
+            if kind == "char":
+                if name[pos] != token[1]:
+                    return -1
+            elif kind == "cho":
+                if name[pos] != token[2] and not (parts and parts[0] == token[1]):
+                    return -1
+            elif kind == "syllable":
+                if not (parts and parts[:2] == token[1:]):
+                    return -1
+            else:  # last
+                if name[pos] != token[1]:
+                    # "막치" 입력 도중 "막칙"이 된 경우: 받침을 다음 글자 초성으로
+                    nxt = syllables[pos + 1] if pos + 1 < len(name) else None
+                    if not (parts and parts == token[2:5] and nxt and nxt[0] == token[5]):
+                        return -1
+                    pos += 1
+            pos += 1
+        return pos
+
+    def _find(self, move_id, tokens):
+        """이름에서 처음 일치하는 (시작, 끝) 위치, 없으면 None"""
+        for start in range(len(self.names[move_id]) - len(tokens) + 1):
+            end = self._match_at(move_id, tokens, start)
+            if end >= 0:
+                return start, end
+        return None
+
+    def match_bits(self, query, match_ids=False):
+        """검색어와 일치하는 기술 비트셋
+
+        이전 검색어를 포함하는 검색어라면 이전 결과 안에서만 다시 찾습니다.
+        """
+        query = query.strip().lower()
+        if not query:
+            return self.all_bits
+        key = (query, match_ids)
+        if key in self.cache:
+            return self.cache[key]
+
+        tokens = self._tokenize(query)
+        name_candidates = self.all_bits
+        for token in tokens:
+            name_candidates &= self._token_bits(token)
+        id_candidates = 0
+        if match_ids and query.isdigit():
+            id_candidates = self.all_bits
+            for char in query:
+                id_candidates &= self.id_char_bits.get(char, 0)
+
+        # 새 검색어에 포함되는 이전 검색어가 있으면 그 결과로 후보 제한
+        for (prev_query, prev_match_ids), prev_bits in self.cache.items():
+            if prev_match_ids == match_ids and prev_query in query:
+                name_candidates &= prev_bits
+                id_candidates &= prev_bits
+
+        bits = 0
+        for move_id in self.names:
+            bit = 1 << move_id
+            if id_candidates & bit and query in self.id_texts[move_id]:
+                bits |= bit
+            elif name_candidates & bit and self._find(move_id, tokens):
+                bits |= bit
+
+        if len(self.cache) >= self.CACHE_SIZE:
+            self.cache.pop(next(iter(self.cache)))
+        self.cache[key] = bits
+        return bits
+
+    def search(self, query, candidates=None, match_ids=False):
+        """검색어와 일치하는 기술 ID를 관련도 순으로 반환
+
+        순위: 완전 일치 > 접두어 > 단어 시작 > 부분 일치, 같은 순위는 앞쪽 위치/짧은 이름/ID 순
+        """
+        query = query.strip().lower()
+        bits = self.match_bits(query, match_ids)
+        if candidates is not None:
+            bits &= candidates
+        tokens = self._tokenize(query)
+
+        ranked = []
+        for move_id in self.names:
+            if not bits >> move_id & 1:
+                continue
+            name = self.names[move_id]
+            rank, start = 4, len(name)
+            if match_ids and query.isdigit() and query in self.id_texts[move_id]:
+                id_text = self.id_texts[move_id]
+                rank = 0 if id_text == query else 1 if id_text.startswith(query) else 3
+                start = 0
+            found = self._find(move_id, tokens)
+            if found:
+                name_start, name_end = found
+                if name_start == 0:
+                    name_rank = 0 if name_end == len(name) else 1
+                elif name[name_start - 1] == " ":
+                    name_rank = 2
+                else:
+                    name_rank = 3
+                if (name_rank, name_start) < (rank, start):
+                    rank, start = name_rank, name_start
+            ranked.append((rank, start, len(name), move_id))
+
+        ranked.sort()
+        return [move_id for *_, move_id in ranked]
+
+
+def convert_to_numeric_if_possible(value):
+    """가능하면 숫자로 변환, 불가능하면 원본 문자열 반환"""
+    # 숫자만 있는 경우 int로 변환
+    if value.isdigit():
+        return int(value)
+    return value  # "—", "∞" 등은 원본 유지
+
+
+def extract_accuracy_number(value):
+    """명중률에서 숫자만 추출 (정렬용)"""
+    if '%' in value:
+        # "100%", "85%" 등에서 숫자만 추출
+        num_str = value.replace('%', '')
+        if num_str.isdigit():
+            return int(num_str)
+    elif value == '∞':
+        return 999  # 무한대는 가장 큰 값으로
+    elif value == '—':
+        return -1   # 없음은 가장 작은 값으로
+    return value
+
+
+class MoveRecord:
+    """기술 한 개의 데이터 (숫자 컬럼은 로드 시 한 번만 변환)"""
+    __slots__ = ("id", "name", "type", "category", "power", "accuracy", "accuracy_display", "pp")
+
+    def __init__(self, move_id, name, move_type, category, power, accuracy_display, pp):
+        self.id = move_id
+        self.name = name
+        self.type = move_type
+        self.category = category
+        self.power = convert_to_numeric_if_possible(power)
+        self.accuracy = extract_accuracy_number(accuracy_display)  # 정렬용 숫자
+        self.accuracy_display = accuracy_display                   # 원본 표시값
+        self.pp = convert_to_numeric_if_possible(pp)
+
+    def to_state(self):
+        return tuple(getattr(self, field) for field in self.__slots__)
+
+    @classmethod
+    def from_state(cls, state):
+        """to_state() 결과로 복원 (숫자 변환 생략)"""
+        record = cls.__new__(cls)
+        for field, value in zip(cls.__slots__, state):
+            setattr(record, field, value)
+        return record
+
+    def display_values(self):
+        """Treeview 표시값"""
+        return (self.id, self.name, self.type, self.category,
+                self.power, self.accuracy_display, self.pp)
+
+
+class MoveTable:
+    """기술 데이터 테이블 (pandas 없이 csv 모듈로 로드)"""
+
+    def __init__(self, records):
+        self.records = records
+        self.by_id = {record.id: record for record in records}
+
+    @classmethod
+    def load(cls, path="pokemon_moves.csv"):
+        """CSV 파일에서 테이블 생성"""
+        with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+            return cls.parse(f.read())
+
+    @classmethod
+    def parse(cls, text):
+        """CSV 문자열에서 테이블 생성"""
+        records = []
+        for row in csv.DictReader(io.StringIO(text)):
+            records.append(MoveRecord(
+                int(row['id']), row['name'], row['type'], row['category'],
+                row['power'].strip(), row['accuracy'].strip(), row['pp'].strip()
+            ))
+        return cls(records)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def get(self, move_id):
+        return self.by_id.get(move_id)
+
+
+EMPTY_SLOT_LABEL = "0. (빈 슬롯)"
+
+
+class UsedMoveState:
+    """사용한 기술 집합 (비트셋, 비트 번호 = 기술 ID) + 타입/카테고리별 사용 수
+
+    기술 하나를 추가/제거할 때 사용 수를 바로 갱신하므로 통계는 다시 세지 않습니다.
+    비트셋 단위로 바꿀 때(load_bits/set_bits/clear_bits)는 타입/카테고리 마스크의 popcount로 다시 계산합니다.
+    기술 수와 마스크는 기술 데이터에서 만들어지므로 데이터에 없는 ID는 무시합니다.
+    """
+    def __init__(self, move_types=None, move_categories=None):
+        self.move_types = move_types or {}            # 기술 ID -> 타입
+        self.move_categories = move_categories or {}  # 기술 ID -> 카테고리
+        self.move_count = len(self.move_types)
+        self.all_bits = 0
+        self.type_masks = {}
+        self.category_masks = {}
+        for move_id, move_type in self.move_types.items():
+            bit = 1 << move_id
+            self.all_bits |= bit
+            self.type_masks[move_type] = self.type_masks.get(move_type, 0) | bit
+            category = self.move_categories.get(move_id)
+            self.category_masks[category] = self.category_masks.get(category, 0) | bit
+        self.type_totals = {key: mask.bit_count() for key, mask in self.type_masks.items()}
+        self.category_totals = {key: mask.bit_count() for key, mask in self.category_masks.items()}
+        self.clear()
+
+    def clear(self):
+        self.bits = 0
+        self.count = 0
+        self.type_counts = dict.fromkeys(self.type_masks, 0)
+        self.category_counts = dict.fromkeys(self.category_masks, 0)
+
+    def copy(self):
+        """저장 스레드에 넘길 스냅샷 (마스크는 공유)"""
+        state = UsedMoveState.__new__(UsedMoveState)
+        state.__dict__.update(self.__dict__)
+        state.type_counts = dict(self.type_counts)
+        state.category_counts = dict(self.category_counts)
+        return state
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, move_id):
+        return bool(self.bits >> move_id & 1)
+
+    def add(self, move_id):
+        """기술 사용 표시, 새로 추가되었으면 True"""
+        bit = 1 << move_id
+        if not self.all_bits & bit or self.bits & bit:
+            return False
+        self.bits |= bit
+        self.count += 1
+        self.type_counts[self.move_types[move_id]] += 1
+        self.category_counts[self.move_categories.get(move_id)] += 1
+        return True
+
+    def discard(self, move_id):
+        """기술 사용 표시 해제, 제거되었으면 True"""
+        bit = 1 << move_id
+        if not self.bits & bit:
+            return False
+        self.bits &= ~bit
+        self.count -= 1
+        self.type_counts[self.move_types[move_id]] -= 1
+        self.category_counts[self.move_categories.get(move_id)] -= 1
+        return True
+
+    def load_bits(self, bits):
+        """비트셋 전체 교체 후 사용 수 재계산"""
+        self.bits = bits & self.all_bits
+        self.count = self.bits.bit_count()
+        self.type_counts = {key: (self.bits & mask).bit_count() for key, mask in self.type_masks.items()}
+        self.category_counts = {key: (self.bits & mask).bit_count() for key, mask in self.category_masks.items()}
+
+    def set_bits(self, bits):
+        self.load_bits(self.bits | bits)
+
+    def clear_bits(self, bits):
+        self.load_bits(self.bits & ~bits)
+
+    @property
+    def unused_bits(self):
+        return self.all_bits & ~self.bits
+
+    def type_progress(self, move_type):
+        """(사용 수, 전체 수)"""
+        return self.type_counts.get(move_type, 0), self.type_totals.get(move_type, 0)
+
+    def category_progress(self, category):
+        return self.category_counts.get(category, 0), self.category_totals.get(category, 0)
+
+
+class MoveIndex:
+    """필터링/정렬용 사전 계산 인덱스 (기술 데이터 로드 시 한 번만 생성)
+
+    기술 집합은 비트셋(int)으로 표현합니다. 비트 번호 = 기술 ID.
+    """
+    SORT_COLUMNS = ("id", "name", "type", "category", "power", "accuracy", "pp")
+
+    def __init__(self, move_table):
+        self.ids = [record.id for record in move_table]
+        self.rows = {}           # 기술 ID -> Treeview 표시값
+        self.type_bits = {}      # 타입 -> 비트셋
+        self.category_bits = {}  # 카테고리 -> 비트셋
+        self.all_bits = 0
+
+        sort_keys = {col: {} for col in self.SORT_COLUMNS}
+        for record in move_table:
+            move_id = record.id
+            bit = 1 << move_id
+            self.all_bits |= bit
+            self.rows[move_id] = record.display_values()
+            self.type_bits[record.type] = self.type_bits.get(record.type, 0) | bit
+            self.category_bits[record.category] = self.category_bits.get(record.category, 0) | bit
+
+            sort_keys['id'][move_id] = move_id
+            for col in ('name', 'type', 'category'):
+                sort_keys[col][move_id] = getattr(record, col)
+            for col in ('power', 'accuracy', 'pp'):
+                # 숫자가 아닌 값("—" 등)은 정렬 방향과 상관없이 맨 뒤로
+                value = getattr(record, col)
+                sort_keys[col][move_id] = value if isinstance(value, int) else None
+
+        # 컬럼별 정렬 순열 (오름차순/내림차순 모두 미리 계산)
+        self.sort_orders = {}
+        for col, keys in sort_keys.items():
+            valid = [i for i in self.ids if keys[i] is not None]
+            missing = [i for i in self.ids if keys[i] is None]
+            self.sort_orders[(col, False)] = sorted(valid, key=keys.get) + missing
+            self.sort_orders[(col, True)] = sorted(valid, key=keys.get, reverse=True) + missing
+
+        # 기술명 검색 인덱스 (초성/접두어 검색)
+        self.search = MoveSearchIndex({move_id: row[1] for move_id, row in self.rows.items()})
+        self._init_available()
+
+    STATE_FIELDS = ("ids", "rows", "type_bits", "category_bits", "all_bits", "sort_orders")
+
+    def to_state(self):
+        """캐시 저장용 상태 (사용 비트맵 제외)"""
+        state = {field: getattr(self, field) for field in self.STATE_FIELDS}
+        state["search"] = self.search.to_state()
+        return state
+
+    @classmethod
+    def from_state(cls, state):
+        """to_state() 결과로 인덱스 복원"""
+        index = cls.__new__(cls)
+        for field in cls.STATE_FIELDS:
+            setattr(index, field, state[field])
+        index.search = MoveSearchIndex.from_state(state["search"])
+        index._init_available()
+        return index
+
+    def _init_available(self):
+        """사용 상태와 콤보박스 표시 문자열("ID. 이름")을 한 번만 만들어 둠"""
+        self.used = UsedMoveState({move_id: self.rows[move_id][2] for move_id in self.ids},
+                                  {move_id: self.rows[move_id][3] for move_id in self.ids})
+        self.labels = {move_id: f"{move_id}. {self.rows[move_id][1]}" for move_id in self.ids}
+        self.available = dict(self.labels)  # 사용 가능한 기술 ID -> 표시 문자열 (ID 순서 유지)
+        self._available_values = None
+        self._slot_values = None
+
+    def _rebuild_available(self):
+        self.available = {move_id: self.labels[move_id] for move_id in self.ids if not self.is_used(move_id)}
+        self._available_values = None
+
+    @property
+    def used_bits(self):
+        return self.used.bits
+
+    def set_used(self, move_id, used=True):
+        """사용 상태 갱신 (사용하면 사용 가능 목록에서 하나만 제거)"""
+        if used:
+            self.used.add(move_id)
+            if self.available.pop(move_id, None) is not None:
+                self._available_values = None
+        elif self.used.discard(move_id):
+            self._rebuild_available()  # 순서 유지를 위해 다시 만듦 (드문 경우)
+
+    def load_used(self, used_bits):
+        """사용 비트셋 전체 교체 (로드/초기화)"""
+        self.used.load_bits(used_bits)
+        self._rebuild_available()
+
+    def slot_values(self):
+        """기술 슬롯 선택 목록 ("0. (빈 슬롯)" + 전체 기술), 처음 요청할 때 한 번만 만들어 모든 창이 공유"""
+        if self._slot_values is None:
+            self._slot_values = (EMPTY_SLOT_LABEL,) + tuple(self.labels[move_id] for move_id in self.ids)
+        return self._slot_values
+
+    def slot_label(self, move_id):
+        """기술 ID의 슬롯 표시 문자열 (0이나 없는 ID는 빈 슬롯)"""
+        return self.labels.get(move_id, EMPTY_SLOT_LABEL)
+
+    def available_values(self):
+        """사용 가능한 기술 표시 문자열 튜플 (바뀌었을 때만 새로 만듦)"""
+        if self._available_values is None:
+            self._available_values = tuple(self.available.values())
+        return self._available_values
+
+    def is_used(self, move_id):
+        return move_id in self.used
+
+    def filter(self, search_text="", move_type=None, category=None, status=None,
+               sort_column=None, sort_reverse=False, match_ids=False):
+        """조건에 맞는 기술 ID 리스트를 정렬된 순서로 반환
+
+        status: None(전체), "used", "unused"
+        match_ids: 검색어를 기술 ID에도 적용
+        """
+        bits = self.all_bits
+        if move_type:
+            bits &= self.type_bits.get(move_type, 0)
+        if category:
+            bits &= self.category_bits.get(category, 0)
+        if status == "used":
+            bits &= self.used_bits
+        elif status == "unused":
+            bits &= ~self.used_bits
+        if search_text and bits:
+            bits &= self.search.match_bits(search_text, match_ids)
+
+        order = self.sort_orders.get((sort_column, sort_reverse), self.ids)
+        return [move_id for move_id in order if bits >> move_id & 1]
+
+
+class MoveDataCache:
+    """정규화된 기술 테이블/정렬 순서/검색 인덱스를 바이너리 파일로 캐시
+
+    CSV 옆에 저장되며, CSV의 수정 시각/크기가 같으면 그대로 사용하고
+    다르면 내용 해시를 비교해 바뀐 경우에만 다시 생성합니다.
+    """
+    MAGIC = b"PKMC"
+    FORMAT_VERSION = 1
+    # 매직, 포맷 버전, marshal 버전, CSV mtime(ns), CSV 크기, CSV SHA-1
+    HEADER = struct.Struct("<4sHHQQ20s")
+
+    def __init__(self, csv_path, cache_path=None):
+        self.csv_path = csv_path
+        self.cache_path = cache_path or os.path.splitext(csv_path)[0] + ".cache"
+        self.write_error = None  # 마지막 캐시 저장 오류 (저장 실패해도 CSV에서 읽은 데이터는 그대로 사용)
+
+    def load(self):
+        """(MoveTable, MoveIndex) 반환 - 캐시가 유효하면 캐시에서, 아니면 CSV에서"""
+        stat = os.stat(self.csv_path)
+        header, payload = self._read_cache()
+
+        if header and header[3] == stat.st_mtime_ns and header[4] == stat.st_size:
+            restored = self._restore(payload)
+            if restored:
+                return restored
+            # 헤더는 맞지만 페이로드가 잘렸거나 손상된 경우: CSV에서 다시 생성
+            header = None
+
+        with open(self.csv_path, 'rb') as f:
+            csv_bytes = f.read()
+        digest = hashlib.sha1(csv_bytes).digest()
+
+        if header and header[5] == digest:
+            # 내용은 같고 수정 시각만 바뀐 경우: 헤더만 갱신
+            restored = self._restore(payload)
+            if restored:
+                self._write_cache(stat, digest, payload)
+                return restored
+
+        move_table = MoveTable.parse(csv_bytes.decode('utf-8-sig'))
+        move_index = MoveIndex(move_table)
+        payload = marshal.dumps({
+            "records": [record.to_state() for record in move_table],
+            "index": move_index.to_state(),
+        })
+        self._write_cache(stat, digest, payload)
+        return move_table, move_index
+
+    def _read_cache(self):
+        """(헤더, 페이로드) 반환, 없거나 버전이 다르면 (None, None)"""
+        try:
+            with open(self.cache_path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None, None
+
+        if len(data) < self.HEADER.size:
+            return None, None
+        header = self.HEADER.unpack_from(data)
+        if header[:3] != (self.MAGIC, self.FORMAT_VERSION, marshal.version):
+            return None, None
+        return header, data[self.HEADER.size:]
+
+    def _restore(self, payload):
+        """(MoveTable, MoveIndex) 반환, 페이로드가 손상되어 읽을 수 없으면 None"""
+        try:
+            data = marshal.loads(payload)
+            move_table = MoveTable([MoveRecord.from_state(state) for state in data["records"]])
+            return move_table, MoveIndex.from_state(data["index"])
+        except (EOFError, ValueError, TypeError, KeyError, IndexError):
+            return None
+
+    def _write_cache(self, stat, digest, payload):
+        """임시 파일에 쓴 뒤 교체 (캐시 저장 실패는 write_error에만 남김)"""
+        header = self.HEADER.pack(self.MAGIC, self.FORMAT_VERSION, marshal.version,
+                                  stat.st_mtime_ns, stat.st_size, digest)
+        temp_path = self.cache_path + ".tmp"
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(header + payload)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.cache_path)
+        except OSError as e:
+            self.write_error = e
+
+
+def pack_used_moves(used_moves):
+    """UsedMoveState를 비트필드 16진수 문자열로 변환 (파일에서는 비트 i = 기술 ID i+1)"""
+    # 기술 ID가 1부터 빠짐없이 이어지면 move_count비트, 중간에 빈 ID가 있으면 가장 큰 ID까지
+    size = max(used_moves.move_count, used_moves.all_bits.bit_length() - 1)
+    return (used_moves.bits >> 1).to_bytes((size + 7) // 8, 'little').hex()
+
+
+def unpack_used_moves(hex_text):
+    """pack_used_moves()의 역변환, 사용 비트셋(비트 번호 = 기술 ID) 반환"""
+    return int.from_bytes(bytes.fromhex(hex_text), 'little') << 1
+
+
+def used_bits_from_list(used_list):
+    """예전 세이브 형식(bool 리스트, 인덱스 i = 기술 ID i+1)을 사용 비트셋으로 변환"""
+    bits = 0
+    for i, used in enumerate(used_list):
+        if used:
+            bits |= 1 << (i + 1)
+    return bits
+
+
+def acquire_file_lock(path):
+    """path에 배타 잠금을 걸고 열린 파일 반환 (파일을 닫으면 풀림), 이미 잠겨 있으면 OSError"""
+    lock_file = open(path, 'a+b')
+    try:
+        if sys.platform == "win32":
+            import msvcrt
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        raise
+    return lock_file
+
+
+class JournalLockedError(OSError):
+    """다른 프로세스(GUI/CLI)가 같은 세이브 파일의 저널을 열고 있음"""
+
+
+class ChallengeJournal:
+    """세이브 파일 옆에 기술 사용 기록을 한 줄씩 추가하는 저널 (세이브 파일명 + ".journal")
+
+    각 기록은 {"seq", "op", "id", "player", "timestamp"} JSON 한 줄이며 추가할 때마다 fsync합니다.
+    스냅샷(세이브 파일)에는 반영된 마지막 seq가 journal_seq로 저장되고,
+    로드 시 그보다 큰 seq의 기록만 다시 적용합니다.
+
+    정리(compact_through)는 메모리의 기록으로 파일을 다시 쓰므로, 열려 있는 동안 잠금 파일
+    (저널 파일명 + ".lock")에 배타 잠금을 걸어 다른 프로세스가 같은 저널에 쓰지 못하게 합니다.
+    """
+    SUFFIX = ".journal"
+    LOCK_SUFFIX = ".lock"
+
+    def __init__(self, save_path, start_seq=0, records=None, truncate=False):
+        self.save_path = save_path
+        self.path = save_path + self.SUFFIX
+        self.seq = start_seq                 # 마지막으로 기록된 seq
+        self.records = list(records or [])   # 마지막 스냅샷 이후 기록
+        os.makedirs(os.path.dirname(save_path) or ".", exist_ok=True)
+        self._lock_file = self._acquire_lock()
+        try:
+            if not truncate:
+                self._trim_partial_line()
+            self._file = open(self.path, 'w' if truncate else 'a', encoding='utf-8')
+        except OSError:
+            self._lock_file.close()
+            raise
+
+    def _acquire_lock(self):
+        """잠금 파일에 배타 잠금, 이미 잠겨 있으면 JournalLockedError"""
+        try:
+            return acquire_file_lock(self.path + self.LOCK_SUFFIX)
+        except OSError:
+            raise JournalLockedError(f"다른 프로그램이 세이브 파일을 사용 중입니다: {self.save_path}")
+
+    def _trim_partial_line(self):
+        """기록 도중 끊긴 마지막 줄을 잘라냄 (그대로 두면 이어 쓴 기록과 한 줄로 붙어버림)"""
+        try:
+            f = open(self.path, 'rb+')
+        except FileNotFoundError:
+            return
+        with f:
+            data = f.read()
+            if data and not data.endswith(b"\n"):
+                f.truncate(data.rfind(b"\n") + 1)
+                f.flush()
+                os.fsync(f.fileno())
+
+    @property
+    def pending(self):
+        """마지막 스냅샷 이후 기록 수"""
+        return len(self.records)
+
+    def append(self, op, **fields):
+        """기록 한 줄 추가 후 디스크에 즉시 반영"""
+        self.seq += 1
+        record = {"seq": self.seq, "op": op, **fields}
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.records.append(record)
+        return self.seq
+
+    def compact_through(self, seq):
+        """seq까지 스냅샷에 반영된 기록 삭제 (스냅샷 이후 추가된 기록은 유지)"""
+        self.records = [record for record in self.records if record["seq"] > seq]
+        self._file.seek(0)
+        self._file.truncate()
+        for record in self.records:
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+        self._lock_file.close()
+
+    @classmethod
+    def read_records(cls, save_path, after_seq=0):
+        """after_seq 이후 기록 리스트 (기록 도중 끊기는 등 읽을 수 없는 줄은 건너뜀)"""
+        records = []
+        try:
+            with open(save_path + cls.SUFFIX, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if not isinstance(record, dict):
+                        continue
+                    if record.get("seq", 0) > after_seq:
+                        records.append(record)
+        except FileNotFoundError:
+            pass
+        return records
+
+
+def build_save_data(file_path, used_moves, move_history, journal_seq, game_version="Unknown"):
+    """세이브 파일(스냅샷) 내용 구성"""
+    return {
+        "save_name": os.path.basename(file_path),
+        "created_date": datetime.now().isoformat(),
+        "format": 2,
+        "move_count": used_moves.move_count,
+        "used_moves_bits": pack_used_moves(used_moves),
+        "journal_seq": journal_seq,
+        "move_history": move_history,
+        "metadata": {
+            "game_version": game_version,
+            "challenge_type": "Single Use",
+            "total_moves": used_moves.move_count,
+            "used_count": len(used_moves)
+        }
+    }
+
+
+def write_save_file(file_path, save_data):
+    """임시 파일에 쓴 뒤 교체 (저장 도중 종료되어도 이전 스냅샷 유지)"""
+    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+    temp_path = file_path + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(save_data, f, ensure_ascii=False, separators=(',', ':'))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, file_path)
+
+
+class SaveWorker:
+    """세이브 파일 직렬화와 디스크 쓰기를 처리하는 백그라운드 스레드
+
+    Tk 스레드는 submit()으로 상태 복사본만 넘기고, 완료 결과는 results 큐에서 꺼내 처리합니다.
+    결과: (파일 경로, journal_seq, 소요 시간(ms), 오류 또는 None, 수동 저장 여부)
+    """
+    def __init__(self):
+        self.jobs = queue.Queue()
+        self.results = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name="SaveWorker", daemon=True)
+        self.thread.start()
+
+    def submit(self, file_path, used_moves, move_history, journal_seq, manual=False, game_version="Unknown"):
+        self.jobs.put((file_path, used_moves, move_history, journal_seq, manual, game_version))
+
+    def stop(self, timeout=5.0):
+        """남은 작업을 마치고 스레드 종료"""
+        self.jobs.put(None)
+        self.thread.join(timeout)
+
+    def _run(self):
+        while True:
+            jobs = [self.jobs.get()]
+            while True:
+                try:
+                    jobs.append(self.jobs.get_nowait())
+                except queue.Empty:
+                    break
+
+            # 밀린 작업은 파일별로 가장 최근 스냅샷만 쓰면 됨
+            latest = {}
+            for job in jobs:
+                if job is not None:
+                    manual = job[4] or (job[0] in latest and latest[job[0]][4])
+                    latest[job[0]] = job[:4] + (manual, job[5])
+
+            for file_path, used_moves, move_history, journal_seq, manual, game_version in latest.values():
+                start = time.perf_counter()
+                try:
+                    save_data = build_save_data(file_path, used_moves, move_history, journal_seq, game_version)
+                    write_save_file(file_path, save_data)
+                    error = None
+                except Exception as e:
+                    error = e
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                self.results.put((file_path, journal_seq, elapsed_ms, error, manual))
+
+            if None in jobs:
+                return
+
+
+def format_move_command(writes):
+    """[(플레이어, 슬롯(0~3), 기술 ID), ...] -> Lua 기술 변경 명령
+
+    1P/2P 첫 번째 슬롯 하나면 이전 형식("1P:123"), 그 외에는 "BATCH:1P:0=123,1=45;2P:0=77"
+    """
+    if len(writes) == 1 and writes[0][1] == 0:
+        player, _, move_id = writes[0]
+        return f"{player}P:{move_id}"
+
+    groups = {}
+    for player, slot, move_id in writes:
+        groups.setdefault(player, []).append(f"{slot}={move_id}")
+    return "BATCH:" + ";".join(f"{player}P:{','.join(slots)}" for player, slots in groups.items())
+
+
+class LuaResponseWatcher:
+    """Lua 응답 로그(lua_interface/response.txt)에 추가된 줄을 큐로 넘기는 감시 스레드
+
+    리눅스에서는 inotify로 변경을 바로 감지하고, 그 외에는 poll_interval(초)마다 파일 크기를 확인합니다.
+    한 줄 = "세션|seq|종류|내용", 이 세션의 응답과 모든 세션에 보내는 알림(세션 "*")만
+    responses 큐에 (seq, 종류, 내용)으로 넣습니다.
+    Lua가 로그를 줄이면(최근 줄만 남김) 마지막으로 읽은 줄을 남은 내용에서 찾아 그 다음부터 읽으므로
+    이미 넘긴 응답은 다시 넣지 않습니다.
+    """
+    EVENT_SESSION = "*"
+    IN_MODIFY = 0x002
+    IN_CLOSE_WRITE = 0x008
+    IN_MOVED_TO = 0x080
+    IN_CREATE = 0x100
+
+    def __init__(self, path, session, poll_interval=0.02):
+        self.path = path
+        self.session = session
+        self.poll_interval = poll_interval
+        self.responses = queue.Queue()
+        self._offset = self._size()  # 이전 실행의 응답은 건너뜀
+        self._last_line = None  # 마지막으로 읽은 줄 (로그가 줄었을 때 이어 읽을 위치 찾기용)
+        self._stop_event = threading.Event()
+        self._inotify_fd = self._open_inotify()
+        self.thread = threading.Thread(target=self._run, name="LuaResponseWatcher", daemon=True)
+        self.thread.start()
+
+    def _size(self):
+        try:
+            return os.stat(self.path).st_size
+        except OSError:
+            return 0
+
+    def _open_inotify(self):
+        """응답 파일이 있는 폴더에 inotify 감시 등록, 사용할 수 없으면 None (stat 폴링)"""
+        if not sys.platform.startswith("linux"):
+            return None
+        try:
+            import ctypes
+            libc = ctypes.CDLL(None, use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK)
+            if fd < 0:
+                return None
+            directory = os.path.dirname(self.path) or "."
+            os.makedirs(directory, exist_ok=True)
+            mask = self.IN_MODIFY | self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_CREATE
+            if libc.inotify_add_watch(fd, os.fsencode(directory), mask) < 0:
+                os.close(fd)
+                return None
+            return fd
+        except (OSError, AttributeError):
+            return None
+
+    def stop(self, timeout=2.0):
+        self._stop_event.set()
+        self.thread.join(timeout)
+        if self._inotify_fd is not None:
+            os.close(self._inotify_fd)
+            self._inotify_fd = None
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            if self._inotify_fd is not None:
+                # 이벤트 내용은 필요 없고 깨어나기만 하면 됨 (0.5초마다 종료 확인)
+                ready, _, _ = select.select([self._inotify_fd], [], [], 0.5)
+                if ready:
+                    try:
+                        while os.read(self._inotify_fd, 4096):
+                            pass
+                    except (BlockingIOError, OSError):
+                        pass
+            else:
+                self._stop_event.wait(self.poll_interval)
+            self._read_new_lines()
+
+    def _read_new_lines(self):
+        size = self._size()
+        if size < self._offset:
+            # Lua가 로그를 줄임 (다시 쓰는 중이면 다음에 확인)
+            offset = self._resync_offset()
+            if offset is None:
+                return
+            self._offset = offset
+        if size == self._offset:
+            return
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(self._offset)
+                data = f.read()
+        except OSError:
+            return
+
+        # 쓰는 중인 마지막 줄은 다음에 읽음
+        end = data.rfind(b"\n") + 1
+        self._offset += end
+        if end:
+            self._last_line = data[data.rfind(b"\n", 0, end - 1) + 1:end]
+        for line in data[:end].decode('utf-8', 'replace').splitlines():
+            parts = line.split("|", 3)
+            if len(parts) == 4 and parts[0] in (self.session, self.EVENT_SESSION) and parts[1].isdigit():
+                self.responses.put((int(parts[1]), parts[2], parts[3]))
+
+
+    def _resync_offset(self):
+        """줄어든 로그에서 마지막으로 읽은 줄 바로 다음 위치
+
+        찾지 못하면 0(처음부터), 파일을 다시 쓰는 중이라 아직 알 수 없으면 None
+        """
+        if self._last_line is None:
+            return 0
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        # 응답 줄에는 세션과 seq가 들어 있어 같은 줄이 두 번 나오는 일은 거의 없음
+        position = data.rfind(self._last_line)
+        if position >= 0 and (position == 0 or data[position - 1:position] == b"\n"):
+            return position + len(self._last_line)
+        if data == b"" or not data.endswith(b"\n"):
+            return None
+        return 0
+
+
+class LuaCommandChannel:
+    """Lua 스크립트로 명령을 보내는 순번 있는 추가 전용 큐 (lua_interface/command_queue.txt)
+
+    한 줄 = "세션|seq|명령". 세션은 보내는 쪽 인스턴스마다 다르므로 여러 프로그램이 같이 써도 됩니다.
+    실행할 때마다 새로 시작하는 도구(CLI)는 LuaSessionFile로 세션 ID와 seq를 이어 씁니다.
+    Lua는 세션별로 처리한 seq를 ack.txt에 "세션:seq[:추가seq,...]" 줄로 기록합니다
+    (seq까지는 빠짐없이 처리, 추가 seq는 앞 seq가 빠진 채 처리된 seq).
+    이미 처리한 seq는 다시 실행하지 않으므로 응답이 늦은 명령은 같은 seq로 다시 보내고,
+    재전송 간격은 매번 두 배로 늘려 MAX_RESENDS번 보내도 처리되지 않으면 포기합니다
+    (callback에 ERROR "NO_ACK" 전달).
+    화면에만 필요한 명령은 send(ttl=초)로 유효 시간을 붙이면 "세션|seq@기한|명령"으로 기록합니다
+    (기한 = Unix 시각 초). 기한이 지나면 재전송하지 않고 callback에 ERROR "EXPIRED"를 전달하며,
+    Lua도 기한이 지난 명령은 실행하지 않고 처리한 것으로만 기록합니다.
+    파일 쓰기는 백그라운드 스레드에서 처리하므로 send()는 바로 반환됩니다.
+
+    명령 결과는 Lua가 response.txt에 seq와 함께 기록하고, LuaResponseWatcher가 읽어 둔 응답을
+    dispatch_responses()(Tk 스레드)가 send()에 넘긴 callback(seq, 종류, 내용)으로 전달합니다.
+    종류: RESULT(스캔 결과), ERROR(오류 코드), PROGRESS(진행률 %), DONE(명령 완료)
+
+    명령 없이 Lua가 먼저 보내는 알림은 세션 "*", seq 0으로 오며 on_event(종류, 내용)로 전달합니다.
+    종류: USED(전투에서 기술 사용 감지, 내용 "1P:0=33" = 플레이어:슬롯=기술 ID)
+    """
+    FINAL_RESPONSES = ("RESULT", "ERROR", "DONE")
+    MAX_RESENDS = 5
+
+    def __init__(self, directory="lua_interface", resend_timeout=5.0, session=None, start_seq=0):
+        self.directory = directory
+        self.queue_file = os.path.join(directory, "command_queue.txt")
+        self.ack_file = os.path.join(directory, "ack.txt")
+        self.game_info_file = os.path.join(directory, "game_info.txt")
+        self._game_info_mtime = None
+        self.callbacks = {}  # seq -> 응답을 받을 callback
+        self.on_write = None  # 명령을 파일에 쓴 직후 호출 (seq, perf_counter 시각), 쓰기 스레드에서 호출됨
+        self.on_event = None  # Lua 알림을 받을 callback(종류, 내용), Tk 스레드에서 호출됨
+        self.last_error = None  # 마지막 전송 오류/전송 포기 설명 (상태 표시용, 표시한 쪽에서 None으로)
+        self.resend_timeout = resend_timeout
+        self.session = session or os.urandom(4).hex()
+        self.seq = start_seq
+        self.pending = {}  # seq -> [명령, 마지막 전송 시각, 재전송 횟수, 기한(Unix 초) 또는 None]
+
+        self._writes = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name="LuaCommandChannel", daemon=True)
+        self.thread.start()
+        self.watcher = LuaResponseWatcher(os.path.join(directory, "response.txt"), self.session)
+
+    def send(self, command, callback=None, ttl=None):
+        """명령 전송 예약 후 seq 반환 (callback이 있으면 이 명령의 응답마다 호출)
+
+        ttl(초)을 주면 그 시간이 지나도록 Lua가 처리하지 않은 명령은 버려집니다.
+        """
+        self.seq += 1
+        deadline = math.ceil(time.time() + ttl) if ttl is not None else None
+        self.pending[self.seq] = [command, time.perf_counter(), 0, deadline]
+        if callback is not None:
+            self.callbacks[self.seq] = callback
+        self._writes.put((self.seq, command, deadline))
+        return self.seq
+
+    def cancel(self, seq):
+        """seq의 응답을 더 이상 받지 않음 (명령 자체는 취소되지 않음)"""
+        self.callbacks.pop(seq, None)
+
+    def dispatch_responses(self):
+        """도착한 응답을 callback으로 전달 (Tk 스레드에서 호출), 처리한 응답 수 반환"""
+        count = 0
+        while True:
+            try:
+                seq, kind, payload = self.watcher.responses.get_nowait()
+            except queue.Empty:
+                return count
+            count += 1
+
+            if seq == 0:
+                if self.on_event is not None:
+                    self.on_event(kind, payload)
+                continue
+
+            # 응답이 왔으면 Lua가 처리한 명령
+            self.pending.pop(seq, None)
+
+            if kind in self.FINAL_RESPONSES:
+                callback = self.callbacks.pop(seq, None)
+            else:
+                callback = self.callbacks.get(seq)
+            if callback is not None:
+                callback(seq, kind, payload)
+
+    def poll_acks(self):
+        """ack.txt를 확인해 새로 완료된 seq 리스트 반환
+
+        시간 초과된 명령은 재전송하고, MAX_RESENDS번 재전송해도 처리되지 않은 명령은 포기합니다.
+        기한이 지난 명령은 재전송하지 않고 바로 포기합니다.
+        """
+        try:
+            with open(self.ack_file, 'r', encoding='utf-8') as f:
+                lines = f.read().splitlines()
+        except OSError:
+            lines = []
+
+        acked_seq, extra_seqs = 0, set()
+        for line in lines:
+            parts = line.strip().split(":")
+            if parts[0] == self.session and len(parts) > 1 and parts[1].isdigit():
+                acked_seq = int(parts[1])
+                if len(parts) > 2:
+                    extra_seqs = {int(seq) for seq in parts[2].split(",") if seq.isdigit()}
+
+        done = sorted(seq for seq in self.pending if seq <= acked_seq or seq in extra_seqs)
+        for seq in done:
+            del self.pending[seq]
+
+        now = time.perf_counter()
+        wall_now = time.time()
+        for seq, entry in list(self.pending.items()):
+            if entry[3] is not None and wall_now > entry[3]:
+                del self.pending[seq]
+                callback = self.callbacks.pop(seq, None)
+                if callback is not None:
+                    callback(seq, "ERROR", "EXPIRED")
+                continue
+            if now - entry[1] <= self.resend_timeout * 2 ** entry[2]:
+                continue
+            if entry[2] >= self.MAX_RESENDS:
+                del self.pending[seq]
+                self.last_error = f"응답 없음, 전송 포기: #{seq}"
+                callback = self.callbacks.pop(seq, None)
+                if callback is not None:
+                    callback(seq, "ERROR", "NO_ACK")
+                continue
+            entry[1] = now
+            entry[2] += 1
+            self._writes.put((seq, entry[0], entry[3]))
+        return done
+
+    def read_game_info(self):
+        """Lua가 기록한 game_info.txt ("키=값" 줄) 읽기, 바뀌지 않았거나 없으면 None"""
+        try:
+            mtime = os.stat(self.game_info_file).st_mtime_ns
+            if mtime == self._game_info_mtime:
+                return None
+            with open(self.game_info_file, 'r', encoding='utf-8') as f:
+                lines = f.read().splitlines()
+        except OSError:
+            return None
+        self._game_info_mtime = mtime
+        return dict(line.split("=", 1) for line in lines if "=" in line)
+
+    def oldest_pending_age(self):
+        """가장 오래 기다린 명령의 대기 시간(초), 없으면 0"""
+        if not self.pending:
+            return 0.0
+        return time.perf_counter() - min(entry[1] for entry in self.pending.values())
+
+    def stop(self, timeout=2.0):
+        """남은 쓰기를 마치고 스레드 종료"""
+        self._writes.put(None)
+        self.thread.join(timeout)
+        self.watcher.stop(timeout)
+
+    def _run(self):
+        while True:
+            job = self._writes.get()
+            if job is None:
+                return
+            seq, command, deadline = job
+            tag = f"{seq}@{deadline}" if deadline is not None else str(seq)
+            line = f"{self.session}|{tag}|{command}\n"
+            for attempt in range(3):
+                try:
+                    os.makedirs(self.directory, exist_ok=True)
+                    with open(self.queue_file, 'a', encoding='utf-8') as f:
+                        f.write(line)
+                    if self.on_write is not None:
+                        self.on_write(seq, time.perf_counter())
+                    break
+                except OSError as e:
+                    # Lua가 파일을 비우는 중일 수 있으므로 잠시 후 재시도 (실패해도 재전송으로 복구)
+                    self.last_error = f"명령 전송 오류: {e}"
+                    time.sleep(0.01)
+
+
+class LuaSessionFile:
+    """실행할 때마다 새로 시작하는 도구(CLI)가 같은 Lua 세션 ID를 이어 쓰도록 저장하는 파일
+
+    한 줄 = "세션:마지막 seq". 실행마다 새 세션을 쓰면 Lua가 기억하는 세션이 계속 늘어나므로
+    세션을 이어 쓰고 seq만 늘립니다. 쓰는 동안 잠가 두며, 동시에 실행된 다른 프로세스는 새 세션을 씁니다.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._lock_file = None
+
+    def acquire(self):
+        """(세션, 마지막 seq) 반환, 다른 프로세스가 사용 중이면 None"""
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._lock_file = acquire_file_lock(self.path + ".lock")
+        except OSError:
+            return None
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                session, _, seq = f.read().strip().partition(":")
+        except OSError:
+            session, seq = "", ""
+        if not session.isalnum() or not seq.isdigit():
+            return os.urandom(4).hex(), 0
+        return session, int(seq)
+
+    def release(self, session, seq):
+        """마지막으로 보낸 seq 저장 후 잠금 해제"""
+        if self._lock_file is None:
+            return
+        try:
+            temp_path = self.path + ".tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.write(f"{session}:{seq}\n")
+            os.replace(temp_path, self.path)
+        finally:
+            self._lock_file.close()
+            self._lock_file = None
+
+
+def percentile(sorted_values, fraction):
+    """정렬된 값에서 nearest-rank 백분위수"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class ActionTracer:
+    """기술 사용 한 번의 단계별 시각 기록 (GUI 클릭 → 명령 파일 → Lua 읽기 → RAM 쓰기 → 터치 완료)
+
+    GUI 단계는 time.perf_counter(), Lua 단계는 trace.txt의 os.clock() 기준이라 시계가 다릅니다.
+    Lua 단계끼리의 차이는 그대로 쓰고, 명령 파일 쓰기 → Lua 읽기 대기는
+    (응답 도착 - 파일 쓰기) - (Lua 읽기 → RAM 쓰기)로 추정합니다 (응답 감시 지연 포함).
+    꺼져 있으면 begin()이 동작을 만들지 않으므로 나머지 기록 호출은 아무것도 하지 않습니다.
+    """
+    # (키, 표시 이름)
+    STAGES = (
+        ("click_to_state", "클릭 → 상태 변경"),
+        ("state_to_send", "상태 변경 → 명령 전송"),
+        ("ui_refresh", "UI 갱신"),
+        ("file_write", "명령 파일 쓰기"),
+        ("pickup_wait", "Lua 읽기 대기 (추정)"),
+        ("lua_write", "Lua 읽기 → RAM 쓰기"),
+        ("touch", "RAM 쓰기 → 터치 완료"),
+        ("total", "전체 (클릭 → 터치 완료)"),
+    )
+
+    def __init__(self, trace_file, session, max_actions=1000):
+        self.trace_file = trace_file
+        self.session = session
+        self.max_actions = max_actions
+        self.enabled = False
+        self.actions = []  # {"name", "seq", "gui": {단계: perf_counter}, "lua": {단계: (프레임, clock ms)}}
+        self.by_seq = {}
+        self.current = None
+
+    def begin(self, name):
+        """동작 시작 (클릭 시각 기록)"""
+        if not self.enabled:
+            self.current = None
+            return
+        self.current = {"name": name, "seq": None, "gui": {"click": time.perf_counter()}, "lua": {}}
+        self.actions.append(self.current)
+        if len(self.actions) > self.max_actions:
+            removed = self.actions.pop(0)
+            self.by_seq.pop(removed["seq"], None)
+
+    def mark(self, stage):
+        """현재 동작의 GUI 단계 시각 기록"""
+        if self.current is not None:
+            self.current["gui"][stage] = time.perf_counter()
+
+    def bind(self, seq):
+        """현재 동작에 Lua 명령 seq 연결"""
+        if self.current is not None:
+            self.current["seq"] = seq
+            self.by_seq[seq] = self.current
+
+    def mark_seq(self, seq, stage, timestamp=None):
+        """seq로 동작을 찾아 단계 시각 기록 (명령 쓰기 스레드에서도 호출됨)"""
+        action = self.by_seq.get(seq)
+        if action is not None:
+            action["gui"].setdefault(stage, timestamp if timestamp is not None else time.perf_counter())
+
+    def end(self):
+        self.current = None
+
+    def clear(self):
+        self.actions = []
+        self.by_seq = {}
+        self.current = None
+
+    def load_lua_trace(self):
+        """trace.txt에서 이 세션의 Lua 단계 기록 읽기"""
+        try:
+            with open(self.trace_file, 'r', encoding='utf-8') as f:
+                lines = f.read().splitlines()
+        except OSError:
+            return
+        for line in lines:
+            parts = line.split("|")
+            if len(parts) != 5 or parts[0] != self.session or not parts[1].isdigit():
+                continue
+            action = self.by_seq.get(int(parts[1]))
+            if action is not None:
+                try:
+                    action["lua"][parts[2]] = (int(parts[3]), float(parts[4]))
+                except ValueError:
+                    pass
+
+    def durations(self, action):
+        """동작 하나의 단계별 소요 시간(ms), 기록이 없는 단계는 빠짐"""
+        gui, lua = action["gui"], action["lua"]
+        result = {}
+
+        def gui_span(key, start, end):
+            if start in gui and end in gui:
+                result[key] = (gui[end] - gui[start]) * 1000
+
+        gui_span("click_to_state", "click", "state")
+        gui_span("state_to_send", "state", "send")
+        gui_span("ui_refresh", "send", "ui")
+        gui_span("file_write", "send", "written")
+        if "pickup" in lua and "ram_write" in lua:
+            result["lua_write"] = lua["ram_write"][1] - lua["pickup"][1]
+            if "written" in gui and "response" in gui:
+                round_trip = (gui["response"] - gui["written"]) * 1000
+                result["pickup_wait"] = max(0.0, round_trip - result["lua_write"])
+        if "ram_write" in lua and "touch_done" in lua:
+            result["touch"] = lua["touch_done"][1] - lua["ram_write"][1]
+            if "response" in gui:
+                result["total"] = (gui["response"] - gui["click"]) * 1000 + result["touch"]
+        return result
+
+    def summary(self):
+        """단계별 (표시 이름, 횟수, p50, p95, p99, 최대) 리스트"""
+        samples = {key: [] for key, _ in self.STAGES}
+        for action in self.actions:
+            for key, value in self.durations(action).items():
+                samples[key].append(value)
+
+        rows = []
+        for key, label in self.STAGES:
+            values = sorted(samples[key])
+            rows.append((label, len(values), percentile(values, 0.50), percentile(values, 0.95),
+                         percentile(values, 0.99), values[-1] if values else None))
+        return rows
+
+    def export_csv(self, path):
+        """동작별 단계 소요 시간(ms)을 CSV로 저장"""
+        keys = [key for key, _ in self.STAGES]
+        with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(["name", "seq"] + keys + ["touch_frames"])
+            for action in self.actions:
+                durations = self.durations(action)
+                lua = action["lua"]
+                touch_frames = lua["touch_done"][0] - lua["ram_write"][0] if "touch_done" in lua and "ram_write" in lua else ""
+                writer.writerow([action["name"], action["seq"]]
+                                + [f"{durations[key]:.3f}" if key in durations else "" for key in keys]
+                                + [touch_frames])
+
+    def export_chrome_trace(self, path):
+        """chrome://tracing / Perfetto에서 열 수 있는 JSON으로 저장
+
+        Lua 단계는 RAM 쓰기 시각을 응답 도착 시각에 맞춰 GUI 시간축에 배치합니다.
+        """
+        events = [
+            {"ph": "M", "name": "process_name", "pid": 1, "args": {"name": "GUI"}},
+            {"ph": "M", "name": "process_name", "pid": 2, "args": {"name": "Lua"}},
+        ]
+        origin = min((action["gui"]["click"] for action in self.actions), default=0.0)
+
+        def add(name, pid, tid, start, end, action):
+            if start is not None and end is not None and end >= start:
+                events.append({"ph": "X", "name": name, "pid": pid, "tid": tid,
+                               "ts": (start - origin) * 1e6, "dur": (end - start) * 1e6,
+                               "args": {"action": action["name"], "seq": action["seq"]}})
+
+        for action in self.actions:
+            gui, lua = action["gui"], action["lua"]
+            add("상태 변경", 1, 1, gui.get("click"), gui.get("state"), action)
+            add("명령 전송", 1, 1, gui.get("state"), gui.get("send"), action)
+            add("UI 갱신", 1, 1, gui.get("send"), gui.get("ui"), action)
+            add("명령 파일 쓰기", 1, 2, gui.get("send"), gui.get("written"), action)
+            if "response" in gui and "ram_write" in lua:
+                # Lua clock(ms) -> perf_counter(초)
+                def to_gui(stage):
+                    return gui["response"] + (lua[stage][1] - lua["ram_write"][1]) / 1000 if stage in lua else None
+                add("Lua 읽기 대기 (추정)", 2, 1, gui.get("written"), to_gui("pickup"), action)
+                add("RAM 쓰기", 2, 1, to_gui("pickup"), to_gui("ram_write"), action)
+                add("터치 입력", 2, 1, to_gui("ram_write"), to_gui("touch_done"), action)
+
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+
+
+def load_settings(path="settings.ini"):
+    """설정 파일 로드 (없으면 기본 설정)"""
+    config = configparser.ConfigParser()
+    if os.path.exists(path):
+        config.read(path, encoding='utf-8')
+    else:
+        # 기본 설정
+        config['General'] = {
+            'auto_save_interval': '600',
+            'search_debounce_ms': '150',
+            'theme': 'default',
+            'window_width': '800',
+            'window_height': '600'
+        }
+        config['Save'] = {
+            'journal_enabled': 'true',
+            'journal_compact_every': '50'
+        }
+        config['Diagnostics'] = {
+            'trace_enabled': 'false'
+        }
+        config['Detection'] = {
+            'auto_detect': 'true'
+        }
+    return config
+
+
+class ChallengeSession:
+    """챌린지 진행 상태와 동작 (기술 사용, 히스토리, 저장/불러오기, Lua 명령)
+
+    화면 갱신은 하지 않으므로 GUI는 호출 후 자기 위젯을 갱신하고, CLI는 결과만 출력합니다.
+    save_worker가 있으면 저장을 백그라운드 스레드로 넘기고(GUI), 없으면 바로 저장합니다(CLI).
+    Lua 명령 채널은 처음 사용할 때 만듭니다 (lua_session_file이 있으면 그 세션 ID를 이어 씀, CLI).
+    """
+    def __init__(self, config=None, save_worker=None, lua_directory="lua_interface", lua_session_file=None):
+        self.config = config if config is not None else load_settings()
+        self.move_table = None
+        self.move_index = None  # 필터/정렬용 사전 계산 인덱스
+        self.used_moves = UsedMoveState()  # 기술 데이터 로드 후 move_index.used로 교체
+        self.move_history = []  # 사용한 기술 히스토리 [{"id": 1, "name": "몸통박치기", "timestamp": "2025-01-15 10:30:00"}, ...]
+        self.current_save_file = None
+        self.game_version = "Unknown"  # Lua 스크립트가 감지한 게임 (game_info.txt)
+        self.journal = None  # 현재 세이브 파일의 저널 (저널 모드일 때)
+        self.dirty = False   # 마지막 저장 이후 변경 여부
+        self.changes = 0     # 변경할 때마다 1 증가 (저장 중에 바뀌었는지 확인용)
+        self.saving_changes = {}  # 파일 경로 -> 저장 요청 시점의 changes
+        self.saves_in_flight = 0
+        self.save_worker = save_worker
+        self.lua_directory = lua_directory
+        self.lua_session_file = lua_session_file
+        self._lua_channel = None
+        self._lua_session_held = False
+
+        # 저널 저장 모드 (기술 사용마다 기록, compact_every개마다 스냅샷으로 합침)
+        self.journal_enabled = self.config.getboolean('Save', 'journal_enabled', fallback=True)
+        self.journal_compact_every = self.config.getint('Save', 'journal_compact_every', fallback=50)
+
+    @property
+    def lua_channel(self):
+        """Lua 명령 채널 (응답이 command_timeout(ms) 넘게 없으면 재전송)"""
+        if self._lua_channel is None:
+            command_timeout = self.config.getint('Communication', 'command_timeout', fallback=5000)
+            identity = self.lua_session_file.acquire() if self.lua_session_file is not None else None
+            self._lua_session_held = identity is not None
+            session, start_seq = identity or (None, 0)
+            self._lua_channel = LuaCommandChannel(self.lua_directory, resend_timeout=command_timeout / 1000,
+                                                  session=session, start_seq=start_seq)
+        return self._lua_channel
+
+    def load_moves(self, csv_path="pokemon_moves.csv"):
+        """기술 테이블 + 필터/정렬/검색 인덱스 로드 (CSV가 바뀌지 않았으면 캐시에서)"""
+        self.move_table, self.move_index = MoveDataCache(csv_path).load()
+        self.move_index.load_used(self.used_moves.bits)
+        self.used_moves = self.move_index.used
+
+    # ---- 기술 사용 ----
+
+    def use_moves(self, writes, source=None):
+        """기술 사용 처리 후 추가된 히스토리 기록 리스트 반환 (Lua 전송은 send_moves)
+
+        writes: [(플레이어, 슬롯(0~3), 기술 ID), ...]
+        source: 저널에 남길 사용 경로 ("auto" = 전투 중 자동 감지), None이면 기록 안 함
+        """
+        extra = {"source": source} if source else {}
+        records = []
+        for player, slot, move_id in writes:
+            # 기술 사용 표시 (self.used_moves도 함께 갱신됨)
+            self.move_index.set_used(move_id)
+
+            # 히스토리에 추가
+            record = self.add_to_history(move_id, self.move_table.get(move_id).name, player)
+            records.append(record)
+
+            # 저널에 기록 (세이브 파일이 있을 때)
+            self.mark_dirty()
+            self.append_journal("use", id=move_id, player=player, slot=slot, timestamp=record["timestamp"],
+                                **extra)
+        return records
+
+    def record_detected(self, payload):
+        """Lua가 감지한 기술 사용("1P:0=33") 반영, 새로 사용 처리했으면 히스토리 기록 반환
+
+        이미 사용한 기술(버튼으로 사용한 뒤 전투에서 쓴 경우 등)이나 표에 없는 기술은 무시합니다.
+        """
+        try:
+            target, _, move_id = payload.partition("=")
+            player, _, slot = target.partition(":")
+            player, slot, move_id = int(player.rstrip("P")), int(slot), int(move_id)
+        except ValueError:
+            return None
+        if self.move_table is None or self.move_table.get(move_id) is None or move_id in self.used_moves:
+            return None
+        return self.use_moves([(player, slot, move_id)], source="auto")[0]
+
+    def send_moves(self, writes, callback=None):
+        """기술 여러 개를 명령 하나로 Lua에 전송 (명령 큐에 추가, 바로 반환), seq 반환"""
+        return self.lua_channel.send(format_move_command(writes), callback=callback)
+
+    def add_to_history(self, move_id, move_name, player=1):
+        """히스토리에 기술 사용 기록 추가"""
+        record = {
+            "id": move_id,
+            "name": move_name,
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        }
+        self.move_history.append(record)
+        return record
+
+    def clear_used_moves(self):
+        if self.move_index is not None:
+            self.move_index.load_used(0)
+        else:
+            self.used_moves.clear()
+
+    def reset(self):
+        """모든 기술을 사용 안함 상태로 (저널에 기록)"""
+        self.move_history.clear()
+        self.clear_used_moves()
+        self.mark_dirty()
+        self.append_journal("reset", timestamp=datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+
+    def new(self):
+        """새 챌린지 (세이브 파일 연결 해제)"""
+        self.move_history.clear()
+        self.clear_used_moves()
+        self.current_save_file = None
+        self.close_journal()
+
+    # ---- 저장/불러오기 ----
+
+    def mark_dirty(self):
+        """마지막 저장 이후 바뀌었음을 표시"""
+        self.dirty = True
+        self.changes += 1
+
+    def append_journal(self, op, **fields):
+        """저널에 기록 추가, 쌓인 기록이 많으면 스냅샷으로 합침"""
+        if self.journal is None:
+            return
+        try:
+            self.journal.append(op, **fields)
+        except OSError as e:
+            print(f"저널 기록 오류: {e}")
+            return
+        if self.journal.pending >= self.journal_compact_every and not self.saves_in_flight:
+            self.save(self.current_save_file, manual=False)
+
+    def close_journal(self):
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+
+    def load(self, file_path, open_journal=True):
+        """세이브 파일(스냅샷) 로드 후 저널에 남은 기록 적용
+
+        open_journal이 False면 저널을 열지 않고(잠금 없이) 읽기만 합니다 (CLI status/export).
+        다른 프로세스가 저널을 열고 있으면 JournalLockedError, 이때 현재 상태는 바뀌지 않습니다.
+        """
+        journal = None
+        if self.journal_enabled and open_journal:
+            # 같은 파일을 다시 불러오는 경우 자기 잠금과 충돌하지 않게 먼저 닫음
+            if self.journal is not None and os.path.abspath(self.journal.save_path) == os.path.abspath(file_path):
+                self.close_journal()
+            # 읽기 전에 잠가서 다른 프로세스가 그 사이에 추가한 기록을 놓치지 않게 함
+            journal = ChallengeJournal(file_path)
+        try:
+            journal_seq, records = self._load_snapshot(file_path)
+        except BaseException:
+            if journal is not None:
+                journal.close()
+            raise
+
+        self.close_journal()
+        if journal is not None:
+            journal.seq = journal_seq
+            journal.records = records
+            self.journal = journal
+        self.changes += 1  # 불러오기 전 상태의 저장 결과로 dirty를 지우지 않게
+        self.dirty = bool(records)
+
+    def _load_snapshot(self, file_path):
+        """스냅샷과 저널 기록을 읽어 상태에 반영, (마지막 journal_seq, 적용한 기록) 반환"""
+        with open(file_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+        if 'used_moves_bits' in data:
+            used_bits = unpack_used_moves(data['used_moves_bits'])
+        else:
+            used_bits = used_bits_from_list(data.get('used_moves', []))
+
+        # 길이는 달라도 되지만(예전 세이브는 469칸), 기술 데이터에 없는 기술이 사용됨이면 다른 데이터의 세이브
+        unknown = used_bits & ~self.used_moves.all_bits
+        if unknown and self.used_moves.move_count:
+            unknown_ids = [i for i in range(unknown.bit_length()) if unknown >> i & 1]
+            raise ValueError(f"세이브 파일에 기술 데이터에 없는 기술이 있습니다: {unknown_ids[:10]}")
+        move_history = data.get('move_history', [])
+
+        # 스냅샷 이후 저널 기록 재적용
+        journal_seq = data.get('journal_seq', 0)
+        records = ChallengeJournal.read_records(file_path, journal_seq)
+        for record in records:
+            if record.get("op") == "reset":
+                used_bits = 0
+                move_history = []
+            elif record.get("op") == "use":
+                move_id = record["id"]
+                used_bits |= 1 << move_id
+                move = self.move_table.get(move_id) if self.move_table else None
+                move_history.append({
+                    "id": move_id,
+                    "name": move.name if move else str(move_id),
+                    "timestamp": record["timestamp"]
+                })
+            journal_seq = record["seq"]
+
+        if self.move_index is not None:
+            self.move_index.load_used(used_bits)
+        else:
+            self.used_moves.load_bits(used_bits)
+        self.move_history = move_history
+        self.current_save_file = file_path
+        if self.game_version == "Unknown":
+            self.game_version = data.get("metadata", {}).get("game_version", "Unknown")
+        return journal_seq, records
+
+    def save(self, file_path, manual=True):
+        """파일에 저장 (save_worker가 있으면 요청만 하고 반환, 결과는 finish_save로 처리)
+
+        저널 모드에서는 저장 완료 후 스냅샷에 반영된 저널 기록을 정리합니다.
+        다른 프로세스가 그 파일의 저널을 열고 있으면 저장하지 않고 JournalLockedError를 냅니다.
+        """
+        # 다른 파일로 저장하면 그 파일의 저널을 새로 시작
+        if self.journal is not None and self.journal.save_path != file_path:
+            self.close_journal()
+        if self.journal_enabled and self.journal is None:
+            try:
+                self.journal = ChallengeJournal(file_path, truncate=True)
+            except JournalLockedError:
+                raise
+            except OSError as e:
+                print(f"저널 생성 오류: {e}")
+
+        journal_seq = self.journal.seq if self.journal else 0
+        self.saving_changes[file_path] = self.changes
+        if self.save_worker is not None:
+            self.save_worker.submit(file_path, self.used_moves.copy(), list(self.move_history),
+                                    journal_seq, manual, self.game_version)
+            self.saves_in_flight += 1
+            return
+        write_save_file(file_path, build_save_data(file_path, self.used_moves, self.move_history,
+                                                   journal_seq, self.game_version))
+        self.finish_save(file_path, journal_seq)
+
+    def finish_save(self, file_path, journal_seq):
+        """저장 성공 후 처리: 저장을 요청한 뒤로 바뀐 것이 없으면 dirty 해제, 스냅샷에 반영된 저널 기록 정리"""
+        if self.saving_changes.get(file_path) == self.changes:
+            self.dirty = False
+        if self.journal is not None and self.journal.save_path == file_path:
+            try:
+                self.journal.compact_through(journal_seq)
+            except OSError as e:
+                print(f"저널 정리 오류: {e}")
+
+    def update_game_info(self):
+        """Lua 스크립트가 기록한 게임/주소 정보 반영, 바뀌지 않았으면 None"""
+        info = self.lua_channel.read_game_info()
+        if info:
+            self.game_version = info.get("game", self.game_version)
+        return info
+
+    def status(self):
+        """진행 상황 요약"""
+        used = self.used_moves
+        return {
+            "save_file": self.current_save_file,
+            "game_version": self.game_version,
+            "used": len(used),
+            "total": used.move_count,
+            "types": {key: used.type_progress(key) for key in used.type_masks},
+            "categories": {key: used.category_progress(key) for key in used.category_masks},
+            "last_moves": self.move_history[-5:],
+        }
+
+    def close(self):
+        """진행 중인 저장/명령 전송 완료 대기 후 정리"""
+        if self.save_worker is not None:
+            self.save_worker.stop()
+        if self._lua_channel is not None:
+            self._lua_channel.stop()
+            if self._lua_session_held:
+                self.lua_session_file.release(self._lua_channel.session, self._lua_channel.seq)
+                self._lua_session_held = False
+        self.close_journal()
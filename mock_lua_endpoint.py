@@ -0,0 +1,895 @@
+"""BizHawk 없이 GUI ↔ Lua 통신을 시험하는 가짜 Lua 엔드포인트
+
+oneshot_allmove_script.lua와 같은 파일 규칙으로 명령을 처리합니다.
+  - command_queue.txt("세션|seq|명령") → ack.txt / response.txt("세션|seq|종류|내용")
+  - 이전 방식 command.txt → result.txt
+  - SCAN / RESCAN / SETADDR / READMOVES / nP:id / BATCH / OVERLAY / TRACE / AUTODETECT / POINTERS 명령
+  - 전투 중 PP가 줄어든 기술 알림 ("*|0|USED|1P:0=33")
+  - 포인터 경로 검색/추적 (pointer_paths.txt)
+4MB 가짜 Main RAM에 ROM 헤더와 전투 포켓몬 구조체를 넣어 두고, 프레임 단위로 시간을 흉내 냅니다.
+전투 구조체는 정적 포인터(STATIC_BATTLE_POINTER)가 가리키는 전투 데이터 안에 있고, 대전마다 옮겨집니다.
+
+사용법:
+    python mock_lua_endpoint.py serve                      # GUI와 같이 실행 (Lua 스크립트 대신)
+    python mock_lua_endpoint.py moves --count 5000         # 기술 변경 명령 연속 전송: 유실/지연 측정
+    python mock_lua_endpoint.py scans --count 200 --wide   # 스캔 반복: 정확도/처리량 측정
+    python mock_lua_endpoint.py legacy --count 200         # 이전 방식 command.txt: 덮어쓰기 유실 측정
+    python mock_lua_endpoint.py detect --count 500         # 전투 중 기술 사용 감지: 알림 유실/지연 측정
+    python mock_lua_endpoint.py battles --count 50         # 스캔 한 번 후 대전마다 구조체 이동: 포인터 경로로 따라가는지 확인
+    python mock_lua_endpoint.py serve --battle 5           # 5초마다 1P가 전투에서 기술을 쓰는 것처럼 PP 감소
+
+moves/scans/legacy/detect/battles는 임시 폴더에서 실행되고, 명령 유실이나 잘못된 스캔 결과가 있으면 종료 코드 1입니다.
+"""
+import argparse
+import bisect
+import itertools
+import json
+import os
+import queue
+import random
+import shutil
+import struct
+import sys
+import tempfile
+import threading
+import time
+
+import challenge_core as core
+
+# Lua 스크립트와 같은 값
+POLLING_INTERVAL = 60
+QUEUE_POLLING_INTERVAL = 2
+QUEUE_ROTATE_SIZE = 4096
+MAX_ACK_SESSIONS = 16
+MAX_ACK_EXTRAS = 32
+RESPONSE_ROTATE_SIZE = 16384
+RESPONSE_KEEP_LINES = 32
+MAIN_RAM_SIZE = 0x400000
+SCAN_CHUNK_SIZE = 0x8000
+MAX_SCAN_CANDIDATES = 32
+MAX_MOVE_ID = 467
+MAX_SPECIES_ID = 493
+MAX_MOVE_PP = 64
+SCAN_RANGE = (0x2C6000, 0x2C6B00)  # 플래티넘 프로필
+DEFAULT_ADDRESS = 0x2C6AEC
+BATTLER_SIZE = 0xC0
+PLAYER2_OFFSET = BATTLER_SIZE * 2
+MOVES_OFFSET = 0x0C
+PP_OFFSET = 0x2C
+ROM_HEADER_GAME_CODE = 0x3FFE0C
+TOUCH_FRAMES = 30 + (5 + 10) * 2 + 30  # 터치 입력 한 번에 걸리는 프레임 수
+AUTO_DETECT_INTERVAL = 10  # 메모리 쓰기 콜백이 없을 때의 PP 폴링 간격
+VALIDATE_INTERVAL = 60
+MAIN_RAM_BUS_BASE = 0x02000000
+MAX_POINTER_OFFSET = 0x4000
+MAX_POINTER_DEPTH = 2
+MAX_POINTER_PATHS = 32
+MOVE_PP = 35  # 가짜 전투 포켓몬의 기술별 PP
+ROM_KEY = "CPUK-0000"  # 가짜 ROM 헤더의 게임 코드-CRC
+STATIC_BATTLE_POINTER = 0x0B0000  # 전투 데이터 주소를 담은 정적 변수 위치 (가짜 게임)
+BATTLE_DATA_SLOT_OFFSET = 0xAEC  # 전투 데이터 시작 -> 1P 기술 슬롯
+
+
+class MockLuaEndpoint:
+    """프레임마다 step()을 호출하면 Lua 스크립트처럼 명령 파일을 처리하는 가짜 엔드포인트
+
+    fps가 0이면 기다리지 않고 최대한 빠르게 프레임을 진행합니다.
+    """
+    def __init__(self, directory="lua_interface", fps=60.0, seed=0):
+        self.directory = directory
+        self.fps = fps
+        self.random = random.Random(seed)
+        os.makedirs(directory, exist_ok=True)
+        self.queue_file = os.path.join(directory, "command_queue.txt")
+        self.ack_file = os.path.join(directory, "ack.txt")
+        self.response_file = os.path.join(directory, "response.txt")
+        self.command_file = os.path.join(directory, "command.txt")
+        self.result_file = os.path.join(directory, "result.txt")
+        self.pointer_file = os.path.join(directory, "pointer_paths.txt")
+
+        self.ram = bytearray(MAIN_RAM_SIZE)
+        self.ram[ROM_HEADER_GAME_CODE:ROM_HEADER_GAME_CODE + 4] = b"CPUK"
+        self.address = DEFAULT_ADDRESS
+        self.battle_data = DEFAULT_ADDRESS - BATTLE_DATA_SLOT_OFFSET
+        struct.pack_into("<I", self.ram, STATIC_BATTLE_POINTER, MAIN_RAM_BUS_BASE + self.battle_data)
+        self.battle_moves = [33, 45, 0, 0]
+        self.place_battler(DEFAULT_ADDRESS, self.battle_moves)
+
+        self.frame = 0
+        self.session_seqs = {}    # 세션 -> 빠짐없이 처리한 마지막 seq (뒤쪽이 최근에 명령을 보낸 세션)
+        self.session_extras = {}  # 세션 -> 그 이후 처리한 seq 집합 (앞 seq가 빠진 경우)
+        self.last_queue_size = -1
+        self.scan_candidates = []
+        self.active_scan = None
+        self.touch_frames_left = 0
+        self.response_size = 0
+        self.auto_detect = True
+        self.detect_snapshots = {}  # 플레이어 -> (주소, 포켓몬 번호, 기술 4개, PP 4개)
+        self.battle_turns = queue.Queue()  # 게임 쪽 동작: ("use", 플레이어, 슬롯) / ("restore", 플레이어, 슬롯)
+        self.battle_every = 0  # 0이 아니면 이 프레임마다 1P가 무작위 슬롯의 기술 사용
+        self.address_verified = self.validate_address(self.address)
+        self.pointer_paths = self.load_pointer_paths()  # [(기준 주소, (오프셋, ...)), ...]
+        self.pointer_search = None
+
+        # 측정용 기록
+        self.executed = {}  # (세션, seq) -> 실행 횟수 (중복 실행 확인)
+        self.legacy_executed = []
+        self.move_writes = 0
+        self.scanned_bytes = 0
+        self.detected = []  # 보낸 USED 알림 내용
+        self.battles = 0
+        self.pointer_switches = 0
+
+        self._stop_event = threading.Event()
+        self.thread = None
+
+        # Lua resolveAddress처럼 시작할 때 포인터 경로 확인
+        if self.address_verified and not self.follow_pointer_paths():
+            self.narrow_pointer_paths()
+
+    # ---- 가짜 RAM ----
+
+    def place_battler(self, address, moves, species=25):
+        """address에 기술 슬롯이 오도록 전투 포켓몬 구조체 배치"""
+        start = address - MOVES_OFFSET
+        struct.pack_into("<H", self.ram, start, species)
+        struct.pack_into("<4H", self.ram, address, *moves)
+        self.ram[start + PP_OFFSET:start + PP_OFFSET + 4] = bytes(MOVE_PP if move else 0 for move in moves)
+
+    def read_moves(self, address):
+        return list(struct.unpack_from("<4H", self.ram, address))
+
+    def validate_address(self, address):
+        """Lua validateMoveSlotAddress와 같은 검사 (종족 번호, 기술 ID, PP 범위)"""
+        start = address - MOVES_OFFSET
+        if start < 0 or start + PP_OFFSET + 4 > MAIN_RAM_SIZE:
+            return False
+        species = struct.unpack_from("<H", self.ram, start)[0]
+        if not 0 < species <= MAX_SPECIES_ID:
+            return False
+        moves = self.read_moves(address)
+        pps = self.ram[start + PP_OFFSET:start + PP_OFFSET + 4]
+        return moves[0] != 0 and all(move <= MAX_MOVE_ID and pp <= MAX_MOVE_PP for move, pp in zip(moves, pps))
+
+    def read_battler(self, player):
+        """전투 포켓몬 (주소, 포켓몬 번호, 기술 4개, PP 4개), 구조체가 아니면 None"""
+        address = self.address + (PLAYER2_OFFSET if player == 2 else 0)
+        if not self.validate_address(address):
+            return None
+        start = address - MOVES_OFFSET
+        species = struct.unpack_from("<H", self.ram, start)[0]
+        return address, species, self.read_moves(address), bytes(self.ram[start + PP_OFFSET:start + PP_OFFSET + 4])
+
+    # ---- 전투 흉내 / 기술 사용 감지 ----
+
+    def step_battle(self):
+        """게임 쪽 동작 처리 (기술을 쓰면 PP 1 감소, 회복하면 MOVE_PP)"""
+        if self.battle_every and self.frame % self.battle_every == 0:
+            battler = self.read_battler(1)
+            if battler is not None:
+                slots = [slot for slot in range(4) if battler[2][slot] and battler[3][slot]]
+                if slots:
+                    self.battle_turns.put(("use", 1, self.random.choice(slots)))
+        while True:
+            try:
+                action, player, slot = self.battle_turns.get_nowait()
+            except queue.Empty:
+                return
+            if action == "battle":
+                self.new_battle()
+                continue
+            index = self.address + (PLAYER2_OFFSET if player == 2 else 0) - MOVES_OFFSET + PP_OFFSET + slot
+            if action == "use":
+                self.ram[index] = max(self.ram[index] - 1, 0)
+            else:
+                self.ram[index] = MOVE_PP
+
+    def new_battle(self):
+        """새 대전: 전투 데이터를 다른 곳에 할당하고 정적 포인터만 갱신 (트래커의 주소는 그대로)"""
+        old = self.battle_data
+        self.ram[old:old + BATTLE_DATA_SLOT_OFFSET + PLAYER2_OFFSET + PP_OFFSET] = bytes(
+            BATTLE_DATA_SLOT_OFFSET + PLAYER2_OFFSET + PP_OFFSET)
+        while abs(self.battle_data - old) < 0x2000:
+            self.battle_data = self.random.randrange(0x200000, 0x380000) & ~3
+        struct.pack_into("<I", self.ram, STATIC_BATTLE_POINTER, MAIN_RAM_BUS_BASE + self.battle_data)
+        self.battle_moves = self.random.sample(range(1, MAX_MOVE_ID + 1), 4)
+        self.place_battler(self.battle_data + BATTLE_DATA_SLOT_OFFSET, self.battle_moves,
+                           species=self.random.randint(1, MAX_SPECIES_ID))
+        self.battles += 1
+
+    def resync_detection(self):
+        self.detect_snapshots = {player: self.read_battler(player) for player in (1, 2)}
+
+    def detect_move_usage(self, player):
+        """Lua detectMoveUsage와 같은 비교 (같은 기술의 PP가 1~2 줄면 USED 알림)"""
+        previous = self.detect_snapshots.get(player)
+        current = self.read_battler(player)
+        self.detect_snapshots[player] = current
+        if previous is None or current is None or previous[:2] != current[:2]:
+            return
+        for slot in range(4):
+            move_id = current[2][slot]
+            if move_id and move_id == previous[2][slot] and 1 <= previous[3][slot] - current[3][slot] <= 2:
+                payload = f"{player}P:{slot}={move_id}"
+                self.detected.append(payload)
+                self.respond((core.LuaResponseWatcher.EVENT_SESSION, 0), "USED", payload)
+
+    # ---- 포인터 경로 (Lua와 같은 규칙) ----
+
+    def load_pointer_paths(self):
+        paths = []
+        try:
+            with open(self.pointer_file, 'r', encoding='utf-8') as f:
+                lines = f.read().splitlines()
+        except OSError:
+            return paths
+        for line in lines:
+            parts = line.split("|")
+            if len(parts) == 3 and parts[0] == ROM_KEY:
+                paths.append((int(parts[1], 16), tuple(int(offset, 16) for offset in parts[2].split(","))))
+        return paths
+
+    def save_pointer_paths(self):
+        try:
+            with open(self.pointer_file, 'r', encoding='utf-8') as f:
+                lines = [line for line in f.read().splitlines() if line.split("|")[0] != ROM_KEY]
+        except OSError:
+            lines = []
+        lines += [f"{ROM_KEY}|{self.format_pointer_path(path)}" for path in self.pointer_paths]
+        with open(self.pointer_file, 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+
+    @staticmethod
+    def format_pointer_path(path):
+        base, offsets = path
+        return f"0x{base:08X}|" + ",".join(f"0x{offset:X}" for offset in offsets)
+
+    def resolve_pointer_path(self, path):
+        address, offsets = path
+        for offset in offsets:
+            if not 0 <= address <= MAIN_RAM_SIZE - 4:
+                return None
+            pointer = struct.unpack_from("<I", self.ram, address)[0]
+            if not MAIN_RAM_BUS_BASE <= pointer < MAIN_RAM_BUS_BASE + MAIN_RAM_SIZE:
+                return None
+            address = pointer - MAIN_RAM_BUS_BASE + offset
+        return address
+
+    def follow_pointer_paths(self):
+        """검증을 통과한 주소 중 가장 많은 경로가 가리키는 곳으로 갱신, 찾았으면 True"""
+        if not self.pointer_paths or self.pointer_search is not None:
+            return False
+        valid, votes = {}, {}
+        for path in self.pointer_paths:
+            address = self.resolve_pointer_path(path)
+            if address is None:
+                continue
+            if address not in valid:
+                valid[address] = self.validate_address(address)
+            if valid[address]:
+                votes[address] = votes.get(address, 0) + 1
+        if not votes:
+            return False
+        best = max(votes, key=votes.get)
+        if best != self.address or not self.address_verified:
+            if best != self.address:
+                self.address = best
+                self.pointer_switches += 1
+            self.address_verified = True
+            self.narrow_pointer_paths()
+        return True
+
+    def narrow_pointer_paths(self):
+        kept = [path for path in self.pointer_paths if self.resolve_pointer_path(path) == self.address]
+        if len(kept) != len(self.pointer_paths):
+            self.pointer_paths = kept
+            self.save_pointer_paths()
+        if not self.pointer_paths:
+            self.pointer_search = {"slot": self.address, "targets": [(self.address, ())], "depth": 1,
+                                   "next": 0, "found": [], "paths": []}
+
+    def step_pointer_search(self):
+        search = self.pointer_search
+        if search is None or self.active_scan is not None:
+            return
+        chunk_start = search["next"]
+        chunk_end = min(chunk_start + SCAN_CHUNK_SIZE, MAIN_RAM_SIZE)
+        words = struct.unpack_from(f"<{(chunk_end - chunk_start) // 4}I", self.ram, chunk_start)
+        low, high = MAIN_RAM_BUS_BASE, MAIN_RAM_BUS_BASE + MAIN_RAM_SIZE
+        targets = search["targets"]  # 기준 주소 순 (Lua findPointerTarget()과 같은 이진 검색)
+        for index, value in enumerate(words):
+            if low <= value < high:
+                pointer = value - MAIN_RAM_BUS_BASE
+                address = chunk_start + index * 4
+                for target, offsets in itertools.islice(targets, bisect.bisect_left(targets, (pointer,)), None):
+                    if target - pointer > MAX_POINTER_OFFSET:
+                        break
+                    if abs(address - target) > MAX_POINTER_OFFSET:
+                        search["found"].append((address, (target - pointer,) + offsets))
+                        if len(search["found"]) >= MAX_POINTER_PATHS:
+                            break
+                if len(search["found"]) >= MAX_POINTER_PATHS:
+                    chunk_end = MAIN_RAM_SIZE
+                    break
+
+        search["next"] = chunk_end
+        if chunk_end < MAIN_RAM_SIZE:
+            return
+        search["paths"] += [path for path in search["found"] if self.resolve_pointer_path(path) == search["slot"]]
+        if search["depth"] < MAX_POINTER_DEPTH and search["found"]:
+            search.update(targets=sorted(search["found"]), depth=search["depth"] + 1, next=0, found=[])
+            return
+        self.pointer_search = None
+        if search["slot"] == self.address:
+            self.pointer_paths = search["paths"]
+            self.save_pointer_paths()
+
+    def check_address_validation(self):
+        if self.frame % VALIDATE_INTERVAL != 0:
+            return
+        if self.follow_pointer_paths() or self.address_verified:
+            return
+        if self.validate_address(self.address):
+            self.address_verified = True
+            self.narrow_pointer_paths()
+
+    def set_address(self, address):
+        """스캔/SETADDR로 정한 주소 적용 (검증되면 포인터 경로 정리/검색)"""
+        self.address = address
+        self.address_verified = self.validate_address(address)
+        if self.address_verified:
+            self.narrow_pointer_paths()
+
+    # ---- 응답 ----
+
+    def respond(self, request, kind, payload):
+        if request is None:
+            return
+        line = f"{request[0]}|{request[1]}|{kind}|{payload}\n"
+        with open(self.response_file, 'a', encoding='utf-8') as f:
+            f.write(line)
+        self.response_size += len(line)
+
+    def respond_scan(self, request, kind, payload):
+        with open(self.result_file, 'w', encoding='utf-8') as f:
+            f.write(payload if kind == "RESULT" else f"ERROR:{payload}")
+        self.respond(request, kind, payload)
+
+    def rotate_response_log(self):
+        if self.response_size < RESPONSE_ROTATE_SIZE:
+            return
+        with open(self.response_file, 'r', encoding='utf-8') as f:
+            lines = f.read().splitlines(keepends=True)
+        kept = "".join(lines[-RESPONSE_KEEP_LINES:])
+        with open(self.response_file, 'w', encoding='utf-8') as f:
+            f.write(kept)
+        self.response_size = len(kept)
+
+    # ---- 스캔 ----
+
+    def start_scan(self, moves, range_start, range_end, request):
+        pattern = struct.pack("<4H", *moves)
+        if self.ram[self.address:self.address + 8] == pattern:
+            self.cancel_scan()
+            self.scan_candidates = [self.address]
+            self.report_scan(request)
+            return
+        self.cancel_scan()
+        self.active_scan = {"pattern": pattern, "start": range_start, "next": range_start,
+                            "end": range_end, "found": [], "request": request, "progress": 0}
+
+    def cancel_scan(self):
+        if self.active_scan is not None:
+            self.respond(self.active_scan["request"], "ERROR", "CANCELLED")
+            self.active_scan = None
+
+    def step_scan(self):
+        scan = self.active_scan
+        if scan is None:
+            return
+        chunk_start = scan["next"]
+        chunk_end = min(chunk_start + SCAN_CHUNK_SIZE, scan["end"])
+        read_end = min(chunk_end + 6, scan["end"])
+        data = self.ram[chunk_start:read_end]
+        self.scanned_bytes += chunk_end - chunk_start
+
+        # Lua와 같이 2바이트 정렬 위치만, 조각 경계에 걸친 패턴 포함
+        index = data.find(scan["pattern"])
+        while index != -1 and chunk_start + index < chunk_end:
+            if index % 2 == 0 and len(scan["found"]) < MAX_SCAN_CANDIDATES:
+                scan["found"].append(chunk_start + index)
+            index = data.find(scan["pattern"], index + 1)
+
+        scan["next"] = chunk_end
+        if chunk_end >= scan["end"]:
+            self.active_scan = None
+            self.scan_candidates = scan["found"]
+            self.report_scan(scan["request"])
+        else:
+            progress = (chunk_end - scan["start"]) * 100 // (scan["end"] - scan["start"])
+            if progress >= scan["progress"] + 5:
+                scan["progress"] = progress
+                self.respond(scan["request"], "PROGRESS", str(progress))
+
+    def report_scan(self, request):
+        if not self.scan_candidates:
+            self.respond_scan(request, "ERROR", "NOT_FOUND")
+            return
+        self.set_address(self.scan_candidates[0])
+        self.respond_scan(request, "RESULT", ",".join(f"0x{address:08X}" for address in self.scan_candidates))
+
+    # ---- 명령 ----
+
+    def apply_writes(self, writes):
+        for player, slot, move_id in writes:
+            if player not in (1, 2) or not 0 <= slot <= 3 or not 0 <= move_id <= MAX_MOVE_ID:
+                return False
+        self.follow_pointer_paths()
+        for player, slot, move_id in writes:
+            address = self.address + (PLAYER2_OFFSET if player == 2 else 0) + slot * 2
+            struct.pack_into("<H", self.ram, address, move_id)
+            self.move_writes += 1
+        self.resync_detection()
+        self.touch_frames_left = max(self.touch_frames_left, TOUCH_FRAMES)
+        return True
+
+    def execute(self, command, request=None):
+        if command.startswith(("SCAN:", "RESCAN:")):
+            moves = [int(part) for part in command.split(":")[1].split(",") if part.isdigit()]
+            if len(moves) != 4:
+                self.respond_scan(request, "ERROR", "INVALID_FORMAT")
+            elif command.startswith("RESCAN:"):
+                if not self.scan_candidates:
+                    self.respond_scan(request, "ERROR", "NO_CANDIDATES")
+                    return
+                pattern = struct.pack("<4H", *moves)
+                self.scan_candidates = [address for address in self.scan_candidates
+                                        if self.ram[address:address + 8] == pattern]
+                self.report_scan(request)
+            elif command.endswith(":WIDE"):
+                self.start_scan(moves, 0, MAIN_RAM_SIZE, request)
+            else:
+                self.start_scan(moves, SCAN_RANGE[0], SCAN_RANGE[1], request)
+        elif command.startswith("SETADDR:"):
+            try:
+                self.set_address(int(command[len("SETADDR:"):], 16))
+                self.respond_scan(request, "RESULT", f"0x{self.address:08X}")
+            except ValueError:
+                self.respond_scan(request, "ERROR", "INVALID_FORMAT")
+        elif command.startswith("BATCH:"):
+            try:
+                writes = []
+                for group in command[len("BATCH:"):].split(";"):
+                    player, slots = group.split("P:")
+                    for item in slots.split(","):
+                        slot, move_id = item.split("=")
+                        writes.append((int(player), int(slot), int(move_id)))
+            except ValueError:
+                self.respond(request, "ERROR", "INVALID_FORMAT")
+                return
+            if self.apply_writes(writes):
+                self.respond(request, "DONE", command)
+            else:
+                self.respond(request, "ERROR", "MOVE_FAILED")
+        elif command.startswith("READMOVES"):
+            player = 2 if command == "READMOVES:2P" else 1
+            self.follow_pointer_paths()
+            address = self.address + (PLAYER2_OFFSET if player == 2 else 0)
+            if self.validate_address(address):
+                self.respond(request, "RESULT", ",".join(map(str, self.read_moves(address))))
+            else:
+                self.respond(request, "ERROR", "INVALID_ADDRESS")
+        elif command.startswith(("OVERLAY:", "TRACE:")):
+            self.respond(request, "DONE", command)
+        elif command == "POINTERS:RESET":
+            self.pointer_search = None
+            self.pointer_paths = []
+            self.save_pointer_paths()
+            if self.address_verified:
+                self.narrow_pointer_paths()
+            self.respond(request, "DONE", command)
+        elif command == "POINTERS":
+            if self.pointer_paths:
+                self.respond(request, "RESULT", ";".join(map(self.format_pointer_path, self.pointer_paths)))
+            else:
+                self.respond(request, "ERROR", "SEARCHING" if self.pointer_search else "NO_POINTERS")
+        elif command.startswith("AUTODETECT:"):
+            self.auto_detect = command == "AUTODETECT:ON"
+            self.detect_snapshots = {}
+            self.respond(request, "DONE", command)
+        elif "P:" in command and command.split("P:")[0].isdigit() and command.split("P:")[1].isdigit():
+            player, move_id = command.split("P:")
+            if self.apply_writes([(int(player), 0, int(move_id))]):
+                self.respond(request, "DONE", command)
+            else:
+                self.respond(request, "ERROR", "MOVE_FAILED")
+        else:
+            self.respond(request, "ERROR", "UNKNOWN_COMMAND")
+
+    def mark_processed(self, session, seq):
+        """Lua markProcessed()와 같은 규칙 (추가 seq가 MAX_ACK_EXTRAS개를 넘으면 빠진 seq는 포기)"""
+        low = self.session_seqs.get(session, 0)
+        extras = self.session_extras.setdefault(session, set())
+        extras.add(seq)
+        while True:
+            while low + 1 in extras:
+                low += 1
+                extras.remove(low)
+            if len(extras) <= MAX_ACK_EXTRAS:
+                break
+            low = min(extras)
+            extras.remove(low)
+        self.session_seqs.pop(session, None)
+        self.session_seqs[session] = low
+
+    def evict_ack_sessions(self):
+        """Lua evictAckSessions()와 같음 (명령 큐를 비운 뒤에만 호출)"""
+        if len(self.session_seqs) <= MAX_ACK_SESSIONS:
+            return
+        for session in list(self.session_seqs)[:len(self.session_seqs) - MAX_ACK_SESSIONS]:
+            del self.session_seqs[session]
+            self.session_extras.pop(session, None)
+        self.write_acks()
+
+    def write_acks(self):
+        lines = []
+        for session, seq in self.session_seqs.items():
+            extras = self.session_extras.get(session)
+            lines.append(f"{session}:{seq}:{','.join(map(str, sorted(extras)))}\n" if extras else f"{session}:{seq}\n")
+        with open(self.ack_file, 'w', encoding='utf-8') as f:
+            f.write("".join(lines))
+
+    def check_command_queue(self):
+        try:
+            size = os.stat(self.queue_file).st_size
+        except OSError:
+            return
+        if size == self.last_queue_size:
+            return
+        with open(self.queue_file, 'r', encoding='utf-8') as f:
+            content = f.read()
+
+        acked = False
+        for line in content.splitlines(keepends=True):
+            if not line.endswith("\n"):
+                break
+            parts = line.rstrip("\r\n").split("|", 2)
+            if len(parts) != 3:
+                continue
+            seq, _, deadline = parts[1].partition("@")
+            if not seq.isdigit() or not (deadline == "" or deadline.isdigit()):
+                continue
+            session, seq, command = parts[0], int(seq), parts[2]
+            if seq > self.session_seqs.get(session, 0) and seq not in self.session_extras.get(session, ()):
+                key = (session, seq)
+                if deadline and time.time() > int(deadline):
+                    self.respond(key, "ERROR", "EXPIRED")
+                else:
+                    self.executed[key] = self.executed.get(key, 0) + 1
+                    self.execute(command, key)
+                self.mark_processed(session, seq)
+                acked = True
+        if acked:
+            self.write_acks()
+
+        if content == "" or content.endswith("\n"):
+            self.last_queue_size = size
+            rotate = size >= QUEUE_ROTATE_SIZE or len(self.session_seqs) > MAX_ACK_SESSIONS
+            if rotate and os.stat(self.queue_file).st_size == size:
+                with open(self.queue_file, 'w', encoding='utf-8'):
+                    pass
+                self.last_queue_size = 0
+                self.evict_ack_sessions()
+
+    def check_legacy_command(self):
+        try:
+            with open(self.command_file, 'r', encoding='utf-8') as f:
+                command = f.read().strip()
+        except OSError:
+            return
+        if command:
+            self.legacy_executed.append(command)
+            self.execute(command)
+            os.remove(self.command_file)
+
+    # ---- 프레임 진행 ----
+
+    def step(self):
+        """한 프레임 진행 (Lua mainLoop와 같은 순서)"""
+        self.frame += 1
+        self.rotate_response_log()
+        if self.touch_frames_left:
+            self.touch_frames_left -= 1
+        self.step_scan()
+        self.step_pointer_search()
+        self.check_address_validation()
+        self.step_battle()
+        if self.auto_detect and self.frame % AUTO_DETECT_INTERVAL == 0:
+            self.detect_move_usage(1)
+            self.detect_move_usage(2)
+        if self.frame % QUEUE_POLLING_INTERVAL == 0:
+            self.check_command_queue()
+        if self.last_queue_size < 0 and self.frame % POLLING_INTERVAL == 0:
+            self.check_legacy_command()
+
+    def run(self):
+        frame_time = 1.0 / self.fps if self.fps > 0 else 0.0
+        next_frame = time.perf_counter()
+        while not self._stop_event.is_set():
+            self.step()
+            if frame_time:
+                next_frame += frame_time
+                delay = next_frame - time.perf_counter()
+                if delay > 0:
+                    self._stop_event.wait(delay)
+                else:
+                    next_frame = time.perf_counter()  # 밀리면 따라잡지 않음 (에뮬레이터처럼)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name="MockLuaEndpoint", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self.thread is not None:
+            self.thread.join(5)
+
+
+# ---- 부하 시험 ----
+
+def wait_for(channel, predicate, timeout):
+    """predicate가 참이 될 때까지 응답 전달 (1 ms 간격)"""
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        channel.dispatch_responses()
+        channel.poll_acks()
+        if predicate():
+            return True
+        time.sleep(0.001)
+    return False
+
+
+def summarize_latency(latencies):
+    values = sorted(latencies)
+    if not values:
+        return {}
+    return {"p50_ms": core.percentile(values, 0.50), "p95_ms": core.percentile(values, 0.95),
+            "p99_ms": core.percentile(values, 0.99), "max_ms": values[-1]}
+
+
+def run_moves(endpoint, directory, count, rate, batch):
+    """기술 변경 명령 count개 전송 (rate: 초당 명령 수, 0이면 한꺼번에)"""
+    channel = core.LuaCommandChannel(directory=directory, resend_timeout=2.0)
+    sent_at, latencies, errors = {}, [], []
+
+    def on_response(seq, kind, payload):
+        if kind == "DONE":
+            latencies.append((time.perf_counter() - sent_at[seq]) * 1000)
+        else:
+            errors.append((seq, payload))
+
+    start = time.perf_counter()
+    for i in range(count):
+        writes = [(1 + (i + k) % 2, k % 4, 1 + (i * 7 + k) % MAX_MOVE_ID) for k in range(batch)]
+        seq = channel.send(core.format_move_command(writes), callback=on_response)
+        sent_at[seq] = time.perf_counter()
+        if rate > 0:
+            wait_for(channel, lambda: False, 1.0 / rate)
+        else:
+            channel.dispatch_responses()
+    wait_for(channel, lambda: len(latencies) + len(errors) >= count, 30 + count / 100)
+    elapsed = time.perf_counter() - start
+    channel.stop()
+
+    duplicates = sum(1 for n in endpoint.executed.values() if n > 1)
+    return {
+        "sent": count,
+        "completed": len(latencies),
+        "errors": len(errors),
+        "lost": count - len(latencies) - len(errors),
+        "duplicates": duplicates,
+        "ram_writes": endpoint.move_writes,
+        "commands_per_sec": len(latencies) / elapsed if elapsed else 0.0,
+        "latency": summarize_latency(latencies),
+    }
+
+
+def run_scans(endpoint, directory, count, wide):
+    """패턴을 무작위 위치에 놓고 SCAN 반복 (결과 주소가 맞는지 확인)"""
+    channel = core.LuaCommandChannel(directory=directory, resend_timeout=5.0)
+    rng = endpoint.random
+    latencies, wrong, failed = [], 0, 0
+    start_bytes = endpoint.scanned_bytes
+    start = time.perf_counter()
+
+    for _ in range(count):
+        moves = rng.sample(range(1, MAX_MOVE_ID + 1), 4)
+        low, high = (0x1000, MAIN_RAM_SIZE - 0x1000) if wide else SCAN_RANGE
+        address = rng.randrange(low + MOVES_OFFSET, high - 8) & ~1
+        endpoint.place_battler(address, moves)
+        result = []
+        sent = time.perf_counter()
+        command = f"SCAN:{','.join(map(str, moves))}" + (":WIDE" if wide else "")
+        channel.send(command, callback=lambda seq, kind, payload: kind != "PROGRESS" and result.append((kind, payload)))
+        if not wait_for(channel, lambda: result, 60):
+            failed += 1
+            continue
+        latencies.append((time.perf_counter() - sent) * 1000)
+        kind, payload = result[0]
+        if kind != "RESULT" or f"0x{address:08X}" not in payload.split(","):
+            wrong += 1
+        # 다음 스캔에서 예전 위치가 같이 잡히지 않게 지움
+        endpoint.ram[address - MOVES_OFFSET:address + PP_OFFSET] = bytes(PP_OFFSET + MOVES_OFFSET)
+
+    elapsed = time.perf_counter() - start
+    channel.stop()
+    scanned = endpoint.scanned_bytes - start_bytes
+    return {
+        "scans": count,
+        "completed": len(latencies),
+        "wrong_result": wrong,
+        "lost": failed,
+        "scanned_mb": scanned / (1024 * 1024),
+        "mb_per_sec": scanned / (1024 * 1024) / elapsed if elapsed else 0.0,
+        "latency": summarize_latency(latencies),
+    }
+
+
+def run_legacy(endpoint, directory, count, interval):
+    """이전 방식 command.txt에 interval(초) 간격으로 명령을 덮어써서 유실 수 측정"""
+    command_file = os.path.join(directory, "command.txt")
+    for i in range(count):
+        with open(command_file, 'w', encoding='utf-8') as f:
+            f.write(f"1P:{1 + i % MAX_MOVE_ID}")
+        time.sleep(interval)
+    time.sleep(POLLING_INTERVAL / max(endpoint.fps, 1) * 2)
+    return {"sent": count, "executed": len(endpoint.legacy_executed),
+            "lost": count - len(endpoint.legacy_executed)}
+
+
+def run_detect(endpoint, directory, count):
+    """슬롯마다 다른 기술로 바꾸고 전투에서 사용 (PP 감소), USED 알림이 빠짐없이 오는지 확인"""
+    endpoint.place_battler(endpoint.address + PLAYER2_OFFSET, [84, 0, 0, 0], species=26)
+    channel = core.LuaCommandChannel(directory=directory, resend_timeout=2.0)
+    events = []
+    channel.on_event = lambda kind, payload: kind == "USED" and events.append(payload)
+    remaining_pp = {}
+    latencies, wrong, failed = [], 0, 0
+    start = time.perf_counter()
+
+    for i in range(count):
+        player, slot = 1 + i % 2, (i // 2) % 4
+        move_id = endpoint.random.randint(1, MAX_MOVE_ID)
+        done = []
+        channel.send(core.format_move_command([(player, slot, move_id)]),
+                     callback=lambda seq, kind, payload: done.append(kind))
+        if not wait_for(channel, lambda: done, 5):
+            failed += 1
+            continue
+
+        # PP가 없으면 회복하고 감지 쪽 기준값이 갱신될 때까지 대기
+        if not remaining_pp.get((player, slot)):
+            endpoint.battle_turns.put(("restore", player, slot))
+            target = endpoint.frame + AUTO_DETECT_INTERVAL * 2
+            wait_for(channel, lambda: endpoint.frame >= target, 5)
+            remaining_pp[(player, slot)] = MOVE_PP
+        remaining_pp[(player, slot)] -= 1
+
+        received = len(events)
+        used_at = time.perf_counter()
+        endpoint.battle_turns.put(("use", player, slot))
+        if not wait_for(channel, lambda: len(events) > received, 5):
+            failed += 1
+            continue
+        latencies.append((time.perf_counter() - used_at) * 1000)
+        if events[received:] != [f"{player}P:{slot}={move_id}"]:
+            wrong += 1
+
+    elapsed = time.perf_counter() - start
+    channel.stop()
+    return {
+        "uses": count,
+        "detected": len(latencies),
+        "wrong_event": wrong,
+        "lost": failed,
+        "uses_per_sec": count / elapsed if elapsed else 0.0,
+        "latency": summarize_latency(latencies),
+    }
+
+
+def run_battles(endpoint, directory, count):
+    """처음 한 번만 스캔하고 대전 count번 (매번 전투 구조체 이동), 포인터 경로로 현재 기술을 읽는지 확인"""
+    channel = core.LuaCommandChannel(directory=directory, resend_timeout=2.0)
+    result = []
+    channel.send("SCAN:" + ",".join(map(str, endpoint.battle_moves)), callback=lambda seq, kind, payload:
+                 kind != "PROGRESS" and result.append(kind))
+    calibrated = wait_for(channel, lambda: result and endpoint.pointer_paths and endpoint.pointer_search is None, 60)
+    scans = len(endpoint.executed)
+
+    latencies, wrong, failed = [], 0, 0
+    for _ in range(count if calibrated else 0):
+        battles = endpoint.battles
+        endpoint.battle_turns.put(("battle", 0, 0))
+        wait_for(channel, lambda: endpoint.battles > battles, 5)
+        moves = list(endpoint.battle_moves)
+
+        # 대전이 바뀐 직후 바로 읽어도 명령 처리 전에 포인터 경로를 따라감
+        response = []
+        sent = time.perf_counter()
+        channel.send("READMOVES", callback=lambda seq, kind, payload: response.append((kind, payload)))
+        if not wait_for(channel, lambda: response, 5):
+            failed += 1
+            continue
+        latencies.append((time.perf_counter() - sent) * 1000)
+        if response[0] != ("RESULT", ",".join(map(str, moves))):
+            wrong += 1
+
+    channel.stop()
+    return {
+        "battles": count,
+        "calibrated": bool(calibrated),
+        "pointer_paths": [endpoint.format_pointer_path(path) for path in endpoint.pointer_paths],
+        "scans": scans,
+        "address_switches": endpoint.pointer_switches,
+        "wrong_moves": wrong,
+        "lost": failed if calibrated else count,
+        "latency": summarize_latency(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="가짜 Lua 엔드포인트 / 통신 부하 시험")
+    parser.add_argument("mode", choices=["serve", "moves", "scans", "legacy", "detect", "battles"])
+    parser.add_argument("--dir", default=None, help="lua_interface 폴더 (serve 기본값: lua_interface)")
+    parser.add_argument("--fps", type=float, default=60.0, help="프레임 속도 (0 = 최대 속도)")
+    parser.add_argument("--count", type=int, default=1000, help="명령/스캔 수")
+    parser.add_argument("--rate", type=float, default=0.0, help="moves: 초당 명령 수 (0 = 한꺼번에)")
+    parser.add_argument("--batch", type=int, default=1, help="moves: 명령 하나에 넣을 기술 수")
+    parser.add_argument("--wide", action="store_true", help="scans: Main RAM 전체 스캔")
+    parser.add_argument("--interval", type=float, default=0.1, help="legacy: 명령 간격(초)")
+    parser.add_argument("--battle", type=float, default=0.0, help="serve: 1P가 전투에서 기술을 쓰는 간격(초)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.mode == "serve":
+        endpoint = MockLuaEndpoint(args.dir or "lua_interface", args.fps, args.seed)
+        endpoint.battle_every = int(args.battle * args.fps)
+        print(f"가짜 Lua 엔드포인트 실행 중 ({endpoint.directory}, {args.fps} fps) - Ctrl+C로 종료")
+        try:
+            endpoint.run()
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    directory = args.dir or tempfile.mkdtemp(prefix="mock_lua_")
+    endpoint = MockLuaEndpoint(directory, args.fps, args.seed)
+    endpoint.start()
+    try:
+        if args.mode == "moves":
+            report = run_moves(endpoint, directory, args.count, args.rate, args.batch)
+            ok = report["lost"] == 0 and report["duplicates"] == 0 and report["errors"] == 0
+        elif args.mode == "scans":
+            report = run_scans(endpoint, directory, args.count, args.wide)
+            ok = report["lost"] == 0 and report["wrong_result"] == 0
+        elif args.mode == "detect":
+            report = run_detect(endpoint, directory, args.count)
+            ok = report["lost"] == 0 and report["wrong_event"] == 0
+        elif args.mode == "battles":
+            report = run_battles(endpoint, directory, args.count)
+            ok = report["lost"] == 0 and report["wrong_moves"] == 0
+        else:
+            report = run_legacy(endpoint, directory, args.count, args.interval)
+            ok = report["lost"] == 0
+    finally:
+        endpoint.stop()
+        if args.dir is None:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    report["mode"] = args.mode
+    report["fps"] = args.fps
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,29 +1,187 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-import pandas as pd
-import json
+import tkinter.font as tkfont
 import os
+import queue
 import time
 from datetime import datetime
-import configparser
-import threading
+
+from challenge_core import (
+    EMPTY_SLOT_LABEL, ActionTracer, ChallengeSession, JournalLockedError, SaveWorker, load_settings
+)
+
+
+class SearchScheduler:
+    """연속 입력 이벤트를 묶어서 마지막 입력 후 한 번만 callback 실행
+
+    계속 입력 중이어도 첫 입력 후 max_wait_ms 안에는 반드시 한 번 실행됩니다.
+    """
+    def __init__(self, widget, delay_ms, callback, max_wait_ms=None):
+        self.widget = widget
+        self.delay_ms = max(0, delay_ms)
+        self.max_wait_ms = max_wait_ms if max_wait_ms is not None else self.delay_ms * 3
+        self.callback = callback
+        self._job = None
+        self._first_request = None
+
+    def schedule(self):
+        """실행 예약 (대기 중인 예약은 취소 후 다시 예약)"""
+        now = time.perf_counter()
+        if self._job is not None:
+            waited_ms = (now - self._first_request) * 1000
+            if waited_ms + self.delay_ms > self.max_wait_ms:
+                return  # 기존 예약이 최대 대기 시간 안에 실행되도록 유지
+            self.widget.after_cancel(self._job)
+        else:
+            self._first_request = now
+        self._job = self.widget.after(self.delay_ms, self._run)
+
+    def cancel(self):
+        """대기 중인 예약 취소"""
+        if self._job is not None:
+            self.widget.after_cancel(self._job)
+            self._job = None
+
+    def _run(self):
+        self._job = None
+        self.callback()
+
+
+class HistoryView:
+    """사용 기록 리스트 (최신이 위, 화면에 보이는 줄만 Listbox에 채우는 가상 리스트)
+
+    Listbox에는 보이는 줄 수만큼만 넣고, 스크롤바/마우스 휠은 전체 기록 기준 위치(offset)를 바꿉니다.
+    번호와 표시 문자열은 화면에 그릴 때만 만듭니다.
+    """
+    def __init__(self, parent, **listbox_options):
+        self.history = []
+        self.offset = 0      # 화면 맨 위 줄의 표시 순서 (0 = 가장 최근 기록)
+        self.rows = int(listbox_options.get("height", 10))
+
+        self.listbox = tk.Listbox(parent, **listbox_options)
+        self.listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        self.scrollbar = ttk.Scrollbar(parent, orient=tk.VERTICAL, command=self.on_scroll)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.line_height = tkfont.Font(font=self.listbox.cget("font")).metrics("linespace")
+        self.listbox.bind("<Configure>", self.on_resize)
+        self.listbox.bind("<MouseWheel>", self.on_mousewheel)
+        self.listbox.bind("<Button-4>", lambda e: self.scroll_by(-3))
+        self.listbox.bind("<Button-5>", lambda e: self.scroll_by(3))
+
+    def set_history(self, history):
+        """기록 리스트 교체 후 처음부터 다시 그리기"""
+        self.history = history
+        self.offset = 0
+        self.render()
+
+    def notify_append(self):
+        """history 끝에 기록이 하나 추가된 뒤 호출 (맨 위에 한 줄만 추가)"""
+        if self.offset > 0:
+            # 아래쪽을 보고 있으면 보던 위치 유지
+            self.offset += 1
+        else:
+            self.listbox.insert(0, self.row_text(0))
+            if self.listbox.size() > self.rows:
+                self.listbox.delete(self.rows, tk.END)
+        self.update_scrollbar()
+
+    def row_text(self, display_index):
+        """표시 순서의 줄 문자열 (최신이 위에 오도록 번호 계산)"""
+        order_num = len(self.history) - display_index
+        return f"{order_num}. {self.history[order_num - 1]['name']}"
+
+    def render(self):
+        """현재 offset부터 보이는 줄만 다시 채우기"""
+        self.listbox.delete(0, tk.END)
+        end = min(len(self.history), self.offset + self.rows)
+        if end > self.offset:
+            self.listbox.insert(tk.END, *(self.row_text(i) for i in range(self.offset, end)))
+        self.update_scrollbar()
+
+    def update_scrollbar(self):
+        total = len(self.history)
+        if total <= self.rows:
+            self.scrollbar.set(0.0, 1.0)
+        else:
+            self.scrollbar.set(self.offset / total, min(1.0, (self.offset + self.rows) / total))
+
+    def scroll_to(self, offset):
+        offset = max(0, min(offset, len(self.history) - self.rows))
+        if offset != self.offset:
+            self.offset = offset
+            self.render()
+
+    def scroll_by(self, rows):
+        self.scroll_to(self.offset + rows)
+        return "break"
+
+    def on_scroll(self, action, value, unit=None):
+        """스크롤바 명령 처리 ("moveto", 비율) / ("scroll", n, "units"|"pages")"""
+        if action == "moveto":
+            self.scroll_to(int(float(value) * len(self.history)))
+        elif action == "scroll":
+            step = self.rows if unit == "pages" else 1
+            self.scroll_by(int(value) * step)
+
+    def on_mousewheel(self, event):
+        return self.scroll_by(-3 if event.delta > 0 else 3)
+
+    def on_resize(self, event):
+        """창 크기에 맞춰 보이는 줄 수 재계산"""
+        rows = max(1, event.height // max(1, self.line_height))
+        if rows != self.rows:
+            self.rows = rows
+            self.offset = max(0, min(self.offset, len(self.history) - self.rows))
+            self.render()
+
+
+def _session_attribute(name, read_only=False):
+    """ChallengeSession 속성을 GUI 속성처럼 읽고 쓰기 (read_only면 읽기만)"""
+    getter = lambda self: getattr(self.session, name)
+    if read_only:
+        return property(getter)
+    return property(getter, lambda self, value: setattr(self.session, name, value))
+
 
 class PokemonChallengeGUI:
+    """ChallengeSession 위의 Tk 화면 (상태/저장/Lua 명령은 세션이 처리하고 여기서는 위젯만 갱신)"""
+    move_table = _session_attribute("move_table")
+    move_index = _session_attribute("move_index")
+    used_moves = _session_attribute("used_moves")
+    move_history = _session_attribute("move_history")
+    current_save_file = _session_attribute("current_save_file")
+    game_version = _session_attribute("game_version")
+    journal = _session_attribute("journal")
+    dirty = _session_attribute("dirty")
+    saves_in_flight = _session_attribute("saves_in_flight")
+    save_worker = _session_attribute("save_worker")
+    lua_channel = _session_attribute("lua_channel", read_only=True)  # 처음 사용할 때 세션이 만듦
+
     def __init__(self, root):
         self.root = root
         self.root.title("포켓몬 4세대 - 원샷 올무브 챌린지")
 
-        # 데이터 초기화
-        self.moves_df = None
-        self.used_moves = [False] * 467
-        self.move_history = []  # 사용한 기술 히스토리 [{"id": 1, "name": "몸통박치기", "timestamp": "2025-01-15 10:30:00"}, ...]
-        self.current_save_file = None
+        # 설정 로드 및 챌린지 세션 (저장은 백그라운드 스레드에서)
+        self.config = load_settings()
+        self.session = ChallengeSession(self.config, save_worker=SaveWorker())
+
         self.filtered_moves = None
         self.sort_column = None
         self.sort_reverse = False
+        self.visible_move_ids = []  # Treeview에 현재 표시된 기술 ID (표시 순서)
+        self.row_used_tags = {}     # 기술 ID -> 현재 Treeview에 반영된 사용 여부
+
+        # 자동 저장 간격 (초, 0이면 사용 안 함)
+        self.auto_save_interval = self.config.getint('General', 'auto_save_interval', fallback=600)
 
-        # 설정 로드
-        self.load_settings()
+        # 검색 입력 디바운스 (IME 입력처럼 이벤트가 몰려도 한 번만 필터링)
+        debounce_ms = self.config.getint('General', 'search_debounce_ms', fallback=150)
+        self.search_scheduler = SearchScheduler(self.root, debounce_ms, self.refresh_treeview)
+        self.combo_search_scheduler = SearchScheduler(self.root, debounce_ms, self.apply_move_combo_search)
+        self.last_combo_search = None
+        self.combo_values_stale = True  # 콤보박스 목록을 펼칠 때 사용 가능 목록으로 다시 채울지
 
         # 창 크기 설정 적용
         width = self.config.get('General', 'window_width', fallback='800')
@@ -33,8 +191,16 @@ class PokemonChallengeGUI:
         # 창 닫을 때 설정 저장
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
 
-        # 통신 파일 경로
-        self.command_file = "lua_interface/command.txt"
+        # 기술 사용 단계별 지연 시간 기록 (진단 창에서도 켜고 끌 수 있음)
+        self.tracer = ActionTracer(os.path.join(self.lua_channel.directory, "trace.txt"),
+                                   self.lua_channel.session)
+        self.lua_channel.on_write = lambda seq, timestamp: self.tracer.mark_seq(seq, "written", timestamp)
+        self.diagnostics_window = None
+        if self.config.getboolean('Diagnostics', 'trace_enabled', fallback=False):
+            self.set_tracing(True)
+
+        # 전투 중 기술 사용 자동 감지 알림
+        self.lua_channel.on_event = self.on_lua_event
 
         # UI 초기화
         self.setup_ui()
@@ -45,19 +211,13 @@ class PokemonChallengeGUI:
         # 사용 가능한 기술 콤보박스 초기화
         self.update_available_moves_combo()
 
-    def load_settings(self):
-        """설정 파일 로드"""
-        self.config = configparser.ConfigParser()
-        if os.path.exists("settings.ini"):
-            self.config.read("settings.ini", encoding='utf-8')
-        else:
-            # 기본 설정
-            self.config['General'] = {
-                'auto_save_interval': '600',
-                'theme': 'default',
-                'window_width': '800',
-                'window_height': '600'
-            }
+        # 저장 결과/Lua 응답 처리 및 자동 저장 타이머
+        self.root.after(200, self.poll_save_results)
+        self.root.after(100, self.poll_lua_acks)
+        self.root.after(20, self.poll_lua_responses)
+        self.poll_game_info()
+        if self.auto_save_interval > 0:
+            self.root.after(self.auto_save_interval * 1000, self.auto_save_tick)
 
     def setup_ui(self):
         """UI 구성 요소 설정"""
@@ -92,6 +252,14 @@ class PokemonChallengeGUI:
         tools_menu = tk.Menu(menubar, tearoff=0)
         menubar.add_cascade(label="도구", menu=tools_menu)
         tools_menu.add_command(label="메모리 주소 자동 찾기", command=self.open_memory_scanner)
+        self.overlay_var = tk.BooleanVar(value=True)
+        tools_menu.add_checkbutton(label="에뮬레이터 화면 정보 표시", variable=self.overlay_var,
+                                   command=self.toggle_lua_overlay)
+        self.auto_detect_var = tk.BooleanVar(
+            value=self.config.getboolean('Detection', 'auto_detect', fallback=True))
+        tools_menu.add_checkbutton(label="전투 중 기술 사용 자동 감지", variable=self.auto_detect_var,
+                                   command=self.toggle_auto_detect)
+        tools_menu.add_command(label="지연 시간 진단", command=self.open_diagnostics)
         tools_menu.add_separator()
         tools_menu.add_command(label="모든 기술 초기화", command=self.reset_all_moves)
 
@@ -197,11 +365,20 @@ class PokemonChallengeGUI:
         ttk.Label(main_panel, text="기술:").pack(anchor=tk.W)
         self.move_selection_var = tk.StringVar()
         self.move_combo = ttk.Combobox(main_panel, textvariable=self.move_selection_var,
-                                      width=20, font=("맑은 고딕", 9))
+                                      width=20, font=("맑은 고딕", 9),
+                                      postcommand=self.on_move_combo_post)
         self.move_combo.pack(fill=tk.X, pady=(2, 5))
         self.move_combo.bind('<<ComboboxSelected>>', self.on_move_combo_select)
         self.move_combo.bind('<KeyRelease>', self.on_move_combo_search)
 
+        # 바꿀 기술 슬롯 (1~4)
+        slot_frame = ttk.Frame(main_panel)
+        slot_frame.pack(fill=tk.X, pady=(0, 5))
+        ttk.Label(slot_frame, text="슬롯:").pack(side=tk.LEFT)
+        self.slot_var = tk.StringVar(value="1")
+        ttk.Combobox(slot_frame, textvariable=self.slot_var, values=["1", "2", "3", "4"],
+                     state="readonly", width=4).pack(side=tk.LEFT, padx=(5, 0))
+
         # 기술 사용 버튼들 (1P, 2P)
         button_frame = ttk.Frame(main_panel)
         button_frame.pack(pady=(0, 10))
@@ -221,13 +398,10 @@ class PokemonChallengeGUI:
         history_frame = ttk.Frame(main_panel)
         history_frame.pack(fill=tk.BOTH, expand=True)
 
-        self.history_listbox = tk.Listbox(history_frame, width=25, height=12, font=("맑은 고딕", 9))
-        self.history_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-
-        # 히스토리 스크롤바
-        history_scroll = ttk.Scrollbar(history_frame, orient=tk.VERTICAL, command=self.history_listbox.yview)
-        self.history_listbox.configure(yscrollcommand=history_scroll.set)
-        history_scroll.pack(side=tk.RIGHT, fill=tk.Y)
+        # 보이는 줄만 그리는 가상 리스트 (스크롤바 포함)
+        self.history_view = HistoryView(history_frame, width=25, height=12, font=("맑은 고딕", 9))
+        self.history_listbox = self.history_view.listbox
+        self.history_view.set_history(self.move_history)
 
     def setup_stats_panel(self):
         """통계 패널 설정"""
@@ -238,25 +412,31 @@ class PokemonChallengeGUI:
         self.save_file_var = tk.StringVar(value="세이브 파일: 없음")
         ttk.Label(stats_frame, textvariable=self.save_file_var).pack(side=tk.LEFT)
 
+        # 마지막 저장 시각/소요 시간 표시
+        self.save_status_var = tk.StringVar(value="")
+        ttk.Label(stats_frame, textvariable=self.save_status_var, foreground="gray").pack(side=tk.LEFT, padx=(10, 0))
+
         # 사용한 기술 수 표시
-        self.progress_var = tk.StringVar(value="사용한 기술: 0/467 (0.0%)")
+        self.progress_var = tk.StringVar(value="사용한 기술: 0/0 (0.0%)")
+        self.progress_bar = ttk.Progressbar(stats_frame, length=120, mode="determinate")
+        self.progress_bar.pack(side=tk.RIGHT, padx=(5, 0))
         ttk.Label(stats_frame, textvariable=self.progress_var).pack(side=tk.RIGHT)
 
+        # 감지한 게임 및 기술 슬롯 주소 표시
+        self.game_info_var = tk.StringVar(value="")
+        ttk.Label(stats_frame, textvariable=self.game_info_var, foreground="gray").pack(side=tk.RIGHT, padx=(10, 0))
+
+        # Lua 명령 대기 상태 표시
+        self.lua_status_var = tk.StringVar(value="")
+        ttk.Label(stats_frame, textvariable=self.lua_status_var, foreground="gray").pack(side=tk.RIGHT, padx=(10, 0))
+
     def load_moves_data(self):
         """포켓몬 기술 데이터 로드"""
         try:
-            # CSV 로드
-            self.moves_df = pd.read_csv("pokemon_moves.csv", dtype=str)
-
-            # 숫자 컬럼들을 적절히 처리 (특수문자는 원본 유지)
-            for col in ['power', 'pp']:
-                # 숫자로 변환 가능한 것만 변환, 나머지는 원본 유지
-                self.moves_df[col] = self.moves_df[col].apply(self.convert_to_numeric_if_possible)
-
-            # accuracy는 %를 제거하고 숫자만 추출
-            self.moves_df['accuracy_display'] = self.moves_df['accuracy']  # 원본 보관
-            self.moves_df['accuracy'] = self.moves_df['accuracy'].apply(self.extract_accuracy_number)
+            # 기술 테이블 + 필터/정렬/검색 인덱스 (CSV가 바뀌지 않았으면 캐시에서 로드)
+            self.session.load_moves("pokemon_moves.csv")
 
+            self.build_treeview_items()
             self.refresh_treeview()
             self.update_stats()
         except FileNotFoundError:
@@ -264,101 +444,85 @@ class PokemonChallengeGUI:
         except Exception as e:
             messagebox.showerror("오류", f"데이터 로드 중 오류 발생: {str(e)}")
 
-    def convert_to_numeric_if_possible(self, value):
-        """가능하면 숫자로 변환, 불가능하면 원본 문자열 반환"""
-        try:
-            # 숫자만 있는 경우 int로 변환
-            if str(value).isdigit():
-                return int(value)
-            else:
-                return value  # "—", "∞" 등은 원본 유지
-        except:
-            return value
-
-    def extract_accuracy_number(self, value):
-        """명중률에서 숫자만 추출 (정렬용)"""
-        try:
-            if '%' in str(value):
-                # "100%", "85%" 등에서 숫자만 추출
-                num_str = str(value).replace('%', '')
-                if num_str.isdigit():
-                    return int(num_str)
-            elif str(value) == '∞':
-                return 999  # 무한대는 가장 큰 값으로
-            elif str(value) == '—':
-                return -1   # 없음은 가장 작은 값으로
-            return value
-        except:
-            return value
-
-    def refresh_treeview(self):
-        """Treeview 새로고침"""
-        if self.moves_df is None:
-            return
-
-        # 기존 항목 삭제
+    def build_treeview_items(self):
+        """기술마다 고정 Treeview 항목 생성 (iid = 기술 ID, 이후 분리/재배치만 수행)"""
         for item in self.tree.get_children():
             self.tree.delete(item)
 
-        # 필터링된 데이터 가져오기
-        filtered_df = self.get_filtered_moves()
-
-        # 데이터 추가
-        for _, row in filtered_df.iterrows():
-            move_id = int(row['id'])
-
-            item = self.tree.insert("", tk.END, values=(
-                row['id'], row['name'], row['type'], row['category'],
-                row['power'], row['accuracy_display'], row['pp']
-            ))
-
-            # 사용된 기술은 회색으로 표시
-            if self.used_moves[move_id - 1]:
-                self.tree.item(item, tags="used")
-
-    def get_filtered_moves(self):
-        """필터링된 기술 목록 반환"""
-        if self.moves_df is None:
-            return pd.DataFrame()
-
-        df = self.moves_df.copy()
+        for move_id in self.move_index.ids:
+            self.tree.insert("", tk.END, iid=str(move_id), values=self.move_index.rows[move_id])
+            self.row_used_tags[move_id] = False
 
-        # 검색어 필터
-        search_text = self.search_var.get().strip()
-        if search_text:
-            df = df[df['name'].str.contains(search_text, case=False, na=False)]
+        # 처음에는 모두 분리해두고 refresh_treeview에서 필요한 것만 붙임
+        self.tree.detach(*self.tree.get_children())
+        self.visible_move_ids = []
 
-        # 타입 필터
-        if self.type_var.get() != "전체":
-            df = df[df['type'] == self.type_var.get()]
+    def refresh_treeview(self):
+        """Treeview 새로고침 (이전 표시 상태와 비교해 바뀐 항목만 반영)"""
+        if self.move_index is None:
+            return
 
-        # 카테고리 필터
-        if self.category_var.get() != "전체":
-            df = df[df['category'] == self.category_var.get()]
+        new_order = self.get_filtered_moves()
+        new_set = set(new_order)
+
+        # 목록에서 빠지는 항목 분리
+        removed = [str(move_id) for move_id in self.visible_move_ids if move_id not in new_set]
+        if removed:
+            self.tree.detach(*removed)
+        current = [move_id for move_id in self.visible_move_ids if move_id in new_set]
+        current_set = set(current)
+
+        # 순서가 다른 위치만 이동 (분리된 항목은 move로 다시 붙음)
+        for index, move_id in enumerate(new_order):
+            if index < len(current) and current[index] == move_id:
+                continue
+            self.tree.move(str(move_id), "", index)
+            if move_id in current_set:
+                current.remove(move_id)
+            else:
+                current_set.add(move_id)
+            current.insert(index, move_id)
 
-        # 상태 필터
-        if self.status_var.get() == "사용됨":
-            df = df[df['id'].apply(lambda x: self.used_moves[int(x) - 1])]
-        elif self.status_var.get() == "사용안됨":
-            df = df[df['id'].apply(lambda x: not self.used_moves[int(x) - 1])]
+        self.visible_move_ids = new_order
 
-        # 정렬 적용
-        if self.sort_column:
-            # 숫자 컬럼들은 이미 적절히 변환되어 있음
-            if self.sort_column in ['id', 'power', 'accuracy', 'pp']:
-                df[self.sort_column] = pd.to_numeric(df[self.sort_column], errors='coerce')
+        # 사용 여부가 바뀐 행만 태그 갱신
+        for move_id in self.move_index.ids:
+            self.update_move_row(move_id)
 
-            df = df.sort_values(by=self.sort_column, ascending=not self.sort_reverse)
+    def update_move_row(self, move_id):
+        """한 행의 태그를 사용 여부에 맞게 갱신 (사용된 기술은 회색)"""
+        used = self.move_index.is_used(move_id)
+        if self.row_used_tags.get(move_id) != used:
+            self.tree.item(str(move_id), tags=("used",) if used else ())
+            self.row_used_tags[move_id] = used
 
-        return df
+    def get_filtered_moves(self):
+        """필터링/정렬된 기술 ID 목록 반환"""
+        if self.move_index is None:
+            return []
+
+        move_type = self.type_var.get()
+        category = self.category_var.get()
+        status = {"사용됨": "used", "사용안됨": "unused"}.get(self.status_var.get())
+
+        return self.move_index.filter(
+            search_text=self.search_var.get().strip(),
+            move_type=None if move_type == "전체" else move_type,
+            category=None if category == "전체" else category,
+            status=status,
+            sort_column=self.sort_column,
+            sort_reverse=self.sort_reverse
+        )
 
     def on_search_change(self, *args):
-        """검색어 변경 시 호출"""
-        self.refresh_treeview()
+        """검색어 변경 시 호출 (디바운스 후 새로고침)"""
+        self.search_scheduler.schedule()
 
     def on_filter_change(self, event):
         """필터 변경 시 호출"""
+        self.search_scheduler.cancel()
         self.refresh_treeview()
+        self.update_stats()
 
     def sort_treeview(self, column):
         """Treeview 정렬"""
@@ -399,89 +563,175 @@ class PokemonChallengeGUI:
             return
 
         # 이미 사용된 기술인지 확인
-        if self.used_moves[move_id - 1]:
+        if move_id in self.used_moves:
             messagebox.showwarning("경고", "이미 사용된 기술입니다.")
             return
 
         # 바로 사용 (확인창 없음)
-        self.use_move(move_id, player)
-
-    def use_move(self, move_id, player=1):
-        """기술 사용 처리"""
-        # 기술명 가져오기
-        move_name = self.moves_df[self.moves_df['id'] == str(move_id)]['name'].iloc[0]
-
-        # 기술 사용 표시
-        self.used_moves[move_id - 1] = True
-
-        # 히스토리에 추가
-        self.add_to_history(move_id, move_name, player)
-
-        # 루아 스크립트에 기술 ID와 플레이어 정보 전송
-        self.send_command_to_lua(str(move_id), player)
-
-        # UI 업데이트
-        self.refresh_treeview()
+        self.tracer.begin(f"{player}P 기술 사용")
+        self.use_move(move_id, player, int(self.slot_var.get()) - 1)
+        self.tracer.end()
+
+    def use_move(self, move_id, player=1, slot=0):
+        """기술 사용 처리 (slot: 0~3, 기술 슬롯 번호)"""
+        self.use_moves([(player, slot, move_id)])
+
+    def use_moves(self, writes):
+        """여러 기술을 한 번에 사용 처리 (Lua에는 명령 하나로 전송, 화면 갱신도 한 번)
+
+        writes: [(플레이어, 슬롯(0~3), 기술 ID), ...]
+        """
+        # 사용 표시, 히스토리, 저널 기록
+        for _ in self.session.use_moves(writes):
+            self.history_view.notify_append()
+
+        # 루아 스크립트에 기술 ID와 플레이어/슬롯 정보 전송
+        self.tracer.mark("state")
+        self.send_batch_to_lua(writes)
+        self.tracer.mark("send")
+
+        # UI 업데이트 (상태 필터가 걸려 있을 때만 목록 구성이 바뀜)
+        for _, _, move_id in writes:
+            self.update_move_row(move_id)
+        if self.status_var.get() != "전체":
+            self.refresh_treeview()
         self.update_stats()
         self.update_available_moves_combo()  # 콤보박스 업데이트
         self.move_selection_var.set("")  # 선택 초기화
+        self.tracer.mark("ui")
+
+    def send_command_to_lua(self, move_id, player=1, slot=0):
+        """루아 스크립트에 기술 ID와 플레이어/슬롯 정보 전송 (명령 큐에 추가, 바로 반환)"""
+        return self.send_batch_to_lua([(player, slot, int(move_id))])
+
+    def send_batch_to_lua(self, writes):
+        """기술 여러 개를 명령 하나로 전송 (Lua가 같은 프레임에 모두 쓰고 터치 입력은 한 번)"""
+        seq = self.session.send_moves(writes, callback=self.on_lua_response)
+        self.tracer.bind(seq)
+        return seq
+
+    def toggle_lua_overlay(self):
+        """Lua 스크립트의 에뮬레이터 화면 표시 켜기/끄기"""
+        self.lua_channel.send("OVERLAY:ON" if self.overlay_var.get() else "OVERLAY:OFF")
+
+    def toggle_auto_detect(self):
+        """Lua 스크립트의 기술 사용 감지 켜기/끄기 (PP가 줄어든 기술을 자동으로 사용 처리)
+
+        메뉴에서 바꿨을 때만 보내고, 시작할 때는 Lua가 game_info.txt에 기록한 상태가
+        설정과 다를 때 poll_game_info에서 보냅니다 (Lua 스크립트가 없으면 명령이 쌓이지 않게).
+        """
+        enabled = self.auto_detect_var.get()
+        if not self.config.has_section('Detection'):
+            self.config.add_section('Detection')
+        self.config.set('Detection', 'auto_detect', str(enabled).lower())
+        self.lua_channel.send("AUTODETECT:ON" if enabled else "AUTODETECT:OFF")
+
+    def on_lua_event(self, kind, payload):
+        """Lua 알림 처리 (USED: 전투에서 사용한 기술 감지)"""
+        if kind != "USED":
+            return
+        record = self.session.record_detected(payload)
+        if record is None:
+            return  # 이미 사용 처리된 기술
+        print(f"기술 사용 감지: {payload} ({record['name']})")
+
+        self.history_view.notify_append()
+        self.update_move_row(record["id"])
+        if self.status_var.get() != "전체":
+            self.refresh_treeview()
+        self.update_stats()
+        self.update_available_moves_combo()
 
-    def send_command_to_lua(self, move_id, player=1):
-        """루아 스크립트에 기술 ID와 플레이어 정보 전송"""
-        try:
-            os.makedirs("lua_interface", exist_ok=True)
-            with open(self.command_file, 'w', encoding='utf-8') as f:
-                f.write(f"{player}P:{move_id}")
-            print(f"루아에 기술 ID 전송: {player}P:{move_id}")
-        except Exception as e:
-            print(f"명령 전송 오류: {e}")
-
-    def update_stats(self):
-        """통계 정보 업데이트"""
-        used_count = sum(self.used_moves)
-        percentage = (used_count / 467) * 100
-        self.progress_var.set(f"사용한 기술: {used_count}/467 ({percentage:.1f}%)")
-
-    def update_history_display(self):
-        """히스토리 리스트박스 업데이트"""
-        self.history_listbox.delete(0, tk.END)
+    def set_tracing(self, enabled):
+        """단계별 지연 시간 기록 켜기/끄기 (Lua 쪽 trace.txt 기록도 같이)"""
+        self.tracer.enabled = enabled
+        self.lua_channel.send("TRACE:ON" if enabled else "TRACE:OFF")
 
-        # 최신 순으로 표시 (최근 것이 위에) - 모든 기록 표시
-        total_count = len(self.move_history)
+    def open_diagnostics(self):
+        """지연 시간 진단 창 열기 (이미 열려 있으면 앞으로)"""
+        if self.diagnostics_window is not None and self.diagnostics_window.window.winfo_exists():
+            self.diagnostics_window.window.lift()
+            return
+        self.diagnostics_window = DiagnosticsWindow(self.root, self.tracer, self.set_tracing)
 
-        for i, record in enumerate(reversed(self.move_history)):
-            # 전체 순서에서의 번호 계산 (최신이 위에 오도록)
-            order_num = total_count - i
-            display_text = f"{order_num}. {record['name']}"
-            self.history_listbox.insert(tk.END, display_text)
+    def on_lua_response(self, seq, kind, payload):
+        """기술 변경 명령 응답"""
+        self.tracer.mark_seq(seq, "response")
+        if kind == "ERROR":
+            self.lua_channel.last_error = f"명령 실패: #{seq} ({payload})"
+        else:
+            self.lua_channel.last_error = None
+
+    def poll_lua_responses(self):
+        """Lua 응답 전달 (감시 스레드가 읽어 둔 응답을 Tk 스레드에서 처리)"""
+        self.lua_channel.dispatch_responses()
+        self.root.after(20, self.poll_lua_responses)
+
+    def poll_lua_acks(self):
+        """Lua 명령 처리 확인 및 대기 상태 표시"""
+        self.lua_channel.poll_acks()
+
+        pending = len(self.lua_channel.pending)
+        if not pending:
+            # 대기 중인 명령이 없으면 마지막 오류(전송 실패/포기, 명령 실패)를 표시
+            error = self.lua_channel.last_error
+            self.lua_status_var.set(f"Lua {error}" if error else "")
+        elif self.lua_channel.oldest_pending_age() > self.lua_channel.resend_timeout:
+            self.lua_status_var.set(f"Lua 응답 없음 (대기 {pending})")
+        else:
+            self.lua_status_var.set(f"Lua 처리 중 (대기 {pending})")
+        self.root.after(100, self.poll_lua_acks)
+
+    def poll_game_info(self):
+        """Lua 스크립트가 감지한 게임/주소 상태 표시 (game_info.txt가 바뀌었을 때만)"""
+        info = self.session.update_game_info()
+        if info:
+            state = "검증됨" if info.get("verified") == "1" else "미검증"
+            if info.get("source") == "pointer":
+                state += ", 포인터 추적"
+            self.game_info_var.set(f"{self.game_version} {info.get('address', '')} ({state})")
+            # Lua 스크립트가 (다시) 시작되면 기본값으로 돌아가므로 설정과 다를 때만 보냄
+            if "autodetect" in info and (info["autodetect"] == "1") != self.auto_detect_var.get():
+                self.toggle_auto_detect()
+        self.root.after(2000, self.poll_game_info)
 
-    def add_to_history(self, move_id, move_name, player=1):
-        """히스토리에 기술 사용 기록 추가"""
-        from datetime import datetime
+    def update_stats(self):
+        """통계 정보 업데이트 (사용 수는 UsedMoveState가 유지하므로 다시 세지 않음)"""
+        used_count = len(self.used_moves)
+        total = self.used_moves.move_count
+        percentage = used_count / total * 100 if total else 0.0
+        text = f"사용한 기술: {used_count}/{total} ({percentage:.1f}%)"
+
+        # 타입/카테고리 필터가 선택되어 있으면 그 안에서의 진행률도 표시
+        for value, progress in ((self.type_var.get(), self.used_moves.type_progress),
+                                (self.category_var.get(), self.used_moves.category_progress)):
+            if value != "전체":
+                used, subtotal = progress(value)
+                text += f" · {value} {used}/{subtotal}"
+
+        self.progress_var.set(text)
+        self.progress_bar.configure(maximum=max(total, 1), value=used_count)
 
-        record = {
-            "id": move_id,
-            "name": move_name,
-            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        }
+    def update_history_display(self):
+        """히스토리 리스트박스 전체 다시 그리기 (로드/초기화 시)"""
+        self.history_view.set_history(self.move_history)
 
-        self.move_history.append(record)
-        self.update_history_display()
+    def close_journal(self):
+        self.session.close_journal()
 
     def update_available_moves_combo(self):
-        """사용 가능한 기술들로 콤보박스 업데이트"""
-        if self.moves_df is None:
-            return
+        """콤보박스를 사용 가능한 기술 전체 목록으로 되돌림
 
-        # 사용 가능한 기술들만 필터링
-        available_moves = []
-        for _, row in self.moves_df.iterrows():
-            move_id = int(row['id'])
-            if not self.used_moves[move_id - 1]:  # 사용되지 않은 기술만
-                move_text = f"{row['id']}. {row['name']}"
-                available_moves.append(move_text)
+        목록은 MoveIndex가 유지하고, 실제 values 설정은 목록을 펼칠 때(on_move_combo_post) 합니다.
+        """
+        self.last_combo_search = None
+        self.combo_values_stale = True
 
-        self.move_combo['values'] = available_moves
+    def on_move_combo_post(self):
+        """콤보박스 목록을 펼치기 직전 호출 - 사용 가능 목록이 바뀌었으면 반영"""
+        if self.combo_values_stale and self.move_index is not None:
+            self.move_combo['values'] = self.move_index.available_values()
+            self.combo_values_stale = False
 
     def on_tree_select(self, event):
         """트리뷰에서 기술 선택 시 콤보박스에 반영"""
@@ -495,7 +745,7 @@ class PokemonChallengeGUI:
         move_name = values[1]
 
         # 사용 가능한 기술인지 확인
-        if not self.used_moves[move_id - 1]:
+        if move_id not in self.used_moves:
             move_text = f"{move_id}. {move_name}"
             self.move_selection_var.set(move_text)
 
@@ -504,33 +754,39 @@ class PokemonChallengeGUI:
         pass  # 선택만 하면 됨
 
     def on_move_combo_search(self, event):
-        """콤보박스에서 검색 입력 시"""
-        if self.moves_df is None:
+        """콤보박스에서 검색 입력 시 (디바운스 후 필터링)"""
+        self.combo_search_scheduler.schedule()
+
+    def apply_move_combo_search(self):
+        """콤보박스 검색어로 사용 가능한 기술 필터링"""
+        if self.move_index is None:
             return
 
         search_text = self.move_selection_var.get().lower()
+        if search_text == self.last_combo_search:
+            return  # 방향키 등 검색어가 바뀌지 않은 입력
+
         if not search_text:
             self.update_available_moves_combo()
+            self.last_combo_search = search_text
             return
+        self.last_combo_search = search_text
 
-        # 검색어로 필터링
-        filtered_moves = []
-        for _, row in self.moves_df.iterrows():
-            move_id = int(row['id'])
-            if not self.used_moves[move_id - 1]:  # 사용되지 않은 기술만
-                move_name = row['name'].lower()
-                if search_text in move_name or search_text in str(move_id):
-                    move_text = f"{row['id']}. {row['name']}"
-                    filtered_moves.append(move_text)
+        # 검색어로 필터링 (사용되지 않은 기술만, ID로도 검색, 관련도 순)
+        unused_bits = self.move_index.all_bits & ~self.move_index.used_bits
+        labels = self.move_index.labels
+        filtered_moves = [
+            labels[move_id]
+            for move_id in self.move_index.search.search(search_text, unused_bits, match_ids=True)
+        ]
 
         self.move_combo['values'] = filtered_moves
+        self.combo_values_stale = False  # 펼쳐도 검색 결과 유지
 
     def new_challenge(self):
         """새 챌린지 시작"""
         if messagebox.askyesno("새 챌린지", "현재 진행 상황이 초기화됩니다. 계속하시겠습니까?"):
-            self.used_moves = [False] * 467
-            self.move_history.clear()
-            self.current_save_file = None
+            self.session.new()
             self.refresh_treeview()
             self.update_stats()
             self.update_history_display()
@@ -549,12 +805,7 @@ class PokemonChallengeGUI:
 
         if file_path:
             try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-
-                self.used_moves = data.get('used_moves', [False] * 467)
-                self.move_history = data.get('move_history', [])
-                self.current_save_file = file_path
+                self._load_from_file(file_path)
 
                 self.refresh_treeview()
                 self.update_stats()
@@ -567,6 +818,10 @@ class PokemonChallengeGUI:
             except Exception as e:
                 messagebox.showerror("오류", f"파일 로드 중 오류 발생: {str(e)}")
 
+    def _load_from_file(self, file_path):
+        """세이브 파일(스냅샷) 로드 후 저널에 남은 기록 적용"""
+        self.session.load(file_path)
+
     def save_challenge(self):
         """챌린지 저장"""
         if not self.current_save_file:
@@ -583,41 +838,60 @@ class PokemonChallengeGUI:
             initialdir="saves"
         )
 
-        if file_path:
+        if file_path and self._save_to_file(file_path):
             self.current_save_file = file_path
-            self._save_to_file(file_path)
 
-    def _save_to_file(self, file_path):
-        """파일에 저장"""
+    def _save_to_file(self, file_path, manual=True):
+        """파일에 저장 요청 (직렬화/디스크 쓰기는 SaveWorker 스레드에서 처리), 요청하지 못했으면 False"""
         try:
-            os.makedirs("saves", exist_ok=True)
-
-            save_data = {
-                "save_name": os.path.basename(file_path),
-                "created_date": datetime.now().isoformat(),
-                "used_moves": self.used_moves,
-                "move_history": self.move_history,
-                "metadata": {
-                    "game_version": "Platinum",
-                    "challenge_type": "Single Use",
-                    "total_moves": 467,
-                    "used_count": sum(self.used_moves)
-                }
-            }
-
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(save_data, f, ensure_ascii=False, indent=2)
-
-            self.save_file_var.set(f"세이브 파일: {os.path.basename(file_path)}")
+            self.session.save(file_path, manual)
+        except JournalLockedError as e:
+            # CLI 등 다른 프로그램이 그 세이브 파일의 저널을 쓰는 중
+            self.save_status_var.set("저장 실패")
+            if manual:
+                messagebox.showerror("오류", f"파일 저장 중 오류 발생: {str(e)}")
+            else:
+                print(f"자동 저장 오류: {e}")
+            return False
+        return True
+
+    def poll_save_results(self):
+        """SaveWorker 완료 결과 처리 (Tk 스레드)"""
+        while True:
+            try:
+                file_path, journal_seq, elapsed_ms, error, manual = self.save_worker.results.get_nowait()
+            except queue.Empty:
+                break
+            self.saves_in_flight = max(0, self.saves_in_flight - 1)
+
+            if error is not None:
+                self.dirty = True
+                self.save_status_var.set("저장 실패")
+                if manual:
+                    messagebox.showerror("오류", f"파일 저장 중 오류 발생: {str(error)}")
+                else:
+                    print(f"자동 저장 오류: {error}")
+                continue
+
+            self.session.finish_save(file_path, journal_seq)
+
+            if file_path == self.current_save_file:
+                self.save_file_var.set(f"세이브 파일: {os.path.basename(file_path)}")
+            self.save_status_var.set(f"저장: {datetime.now().strftime('%H:%M:%S')} ({elapsed_ms:.1f} ms)")
             print(f"챌린지 저장 완료: {file_path}")
-        except Exception as e:
-            messagebox.showerror("오류", f"파일 저장 중 오류 발생: {str(e)}")
+
+        self.root.after(200, self.poll_save_results)
+
+    def auto_save_tick(self):
+        """자동 저장 (변경 사항이 있을 때만)"""
+        if self.dirty and self.current_save_file and not self.saves_in_flight:
+            self._save_to_file(self.current_save_file, manual=False)
+        self.root.after(self.auto_save_interval * 1000, self.auto_save_tick)
 
     def reset_all_moves(self):
         """모든 기술 초기화"""
         if messagebox.askyesno("초기화", "모든 기술을 사용 안함 상태로 초기화하시겠습니까?"):
-            self.used_moves = [False] * 467
-            self.move_history.clear()
+            self.session.reset()
             self.refresh_treeview()
             self.update_stats()
             self.update_history_display()
@@ -641,33 +915,56 @@ class PokemonChallengeGUI:
         except Exception as e:
             print(f"설정 저장 오류: {e}")
 
+        # 진행 중인 저장/명령 전송 완료 대기
+        self.session.close()
+
         # 창 닫기
         self.root.destroy()
 
     def open_memory_scanner(self):
         """메모리 주소 자동 찾기 다이얼로그 열기"""
-        MemoryScannerDialog(self.root, self.moves_df)
+        MemoryScannerDialog(self.root, self.move_index, self.lua_channel)
 
 
 class MemoryScannerDialog:
     """메모리 주소 자동 찾기 다이얼로그"""
-    def __init__(self, parent, moves_df):
+    def __init__(self, parent, move_index, lua_channel):
         self.parent = parent
-        self.moves_df = moves_df
-        self.result_file = "lua_interface/result.txt"
-        self.command_file = "lua_interface/command.txt"
+        self.move_index = move_index
+        self.lua_channel = lua_channel
+        self.candidates = []  # 마지막 스캔에서 패턴이 일치한 주소 목록
+        self.active_seq = None  # 응답을 기다리는 스캔 명령 seq
+        self.read_seq = None  # 응답을 기다리는 현재 기술 읽기(READMOVES) seq
+        self.last_activity = 0.0  # 마지막 전송/진행 응답 시각
+        self.timeout = 10.0  # 응답(진행률 포함)이 이 시간(초) 넘게 없으면 실패 처리
 
         # 다이얼로그 창 생성
         self.dialog = tk.Toplevel(parent)
         self.dialog.title("메모리 주소 자동 찾기")
-        self.dialog.geometry("400x350")
+        self.dialog.geometry("460x380")
         self.dialog.resizable(False, False)
 
         # 모달 설정
         self.dialog.transient(parent)
         self.dialog.grab_set()
 
+        # 닫힌 뒤 도착한 응답은 무시
+        self.dialog.bind("<Destroy>", self.on_destroy)
+
         self.setup_ui()
+        self.fit_size(460, 380)
+
+        # 현재 주소가 맞으면 Lua가 읽은 기술로 슬롯을 미리 채움
+        self.request_current_moves(overwrite=False)
+
+    def on_destroy(self, event):
+        if event.widget is not self.dialog:
+            return
+        for seq in (self.active_seq, self.read_seq):
+            if seq is not None:
+                self.lua_channel.cancel(seq)
+        self.active_seq = None
+        self.read_seq = None
 
     def setup_ui(self):
         """UI 구성"""
@@ -683,17 +980,13 @@ class MemoryScannerDialog:
         # 기술 선택 프레임
         moves_frame = ttk.Frame(self.dialog, padding=10)
         moves_frame.pack(fill=tk.BOTH, expand=True)
+        self.moves_frame = moves_frame
 
-        # 기술 리스트 준비 (0. 빈 슬롯 포함)
-        move_list = ["0. (빈 슬롯)"]
-        for _, row in self.moves_df.iterrows():
-            move_text = f"{row['id']}. {row['name']}"
-            move_list.append(move_text)
-
-        # 기술 1~4 콤보박스
+        # 기술 1~4 콤보박스 (목록은 MoveIndex가 한 번 만든 것을 공유하고, 펼칠 때 넣음)
         self.move_vars = []
         self.move_combos = []
-        self.move_list = move_list  # 전체 기술 리스트 저장
+        self.move_list = self.move_index.slot_values()
+        self.combo_values_set = [False] * 4  # 콤보박스에 현재 검색어에 맞는 목록이 들어 있는지
 
         for i in range(4):
             # 레이블
@@ -701,9 +994,10 @@ class MemoryScannerDialog:
 
             # 콤보박스
             var = tk.StringVar()
-            combo = ttk.Combobox(moves_frame, textvariable=var, values=move_list, width=30)
+            combo = ttk.Combobox(moves_frame, textvariable=var, width=30,
+                                 postcommand=lambda idx=i: self.on_combo_post(idx))
             combo.grid(row=i, column=1, sticky=tk.EW, pady=5, padx=(5, 0))
-            combo.set("0. (빈 슬롯)")  # 기본값
+            combo.set(EMPTY_SLOT_LABEL)  # 기본값
 
             # 검색 기능 바인딩
             combo.bind('<KeyRelease>', lambda e, idx=i: self.filter_moves(idx))
@@ -713,6 +1007,19 @@ class MemoryScannerDialog:
 
         moves_frame.columnconfigure(1, weight=1)
 
+        # 넓은 범위 스캔 (기본 범위에서 못 찾는 롬/지역판용)
+        self.wide_scan_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(moves_frame, text="넓은 범위 스캔 (Main RAM 전체, 몇 초 걸림)",
+                        variable=self.wide_scan_var).grid(row=4, column=0, columnspan=2, sticky=tk.W, pady=(5, 0))
+
+        # 후보 주소 목록 (여러 개 발견 시 표시)
+        self.candidate_frame = ttk.Frame(self.dialog, padding=(10, 0))
+        ttk.Label(self.candidate_frame,
+                  text="후보가 여러 개입니다. 게임에서 기술이 바뀐 뒤 '다시 검색'으로 좁히거나 주소를 선택하세요",
+                  font=("맑은 고딕", 8), foreground="gray", wraplength=430).pack(anchor=tk.W)
+        self.candidate_listbox = tk.Listbox(self.candidate_frame, height=4, font=("맑은 고딕", 9))
+        self.candidate_listbox.pack(fill=tk.X, pady=(2, 0))
+
         # 상태 표시 프레임
         status_frame = ttk.Frame(self.dialog, padding=10)
         status_frame.pack(fill=tk.X)
@@ -730,11 +1037,22 @@ class MemoryScannerDialog:
                                      command=self.start_scan, width=12)
         self.scan_button.pack(side=tk.LEFT, padx=(0, 5))
 
+        self.rescan_button = ttk.Button(button_frame, text="다시 검색",
+                                       command=lambda: self.start_scan(rescan=True), width=10, state="disabled")
+        self.rescan_button.pack(side=tk.LEFT, padx=(0, 5))
+
+        self.select_button = ttk.Button(button_frame, text="선택 주소 사용",
+                                       command=self.use_selected_candidate, width=12, state="disabled")
+        self.select_button.pack(side=tk.LEFT, padx=(0, 5))
+
+        ttk.Button(button_frame, text="현재 기술",
+                   command=self.request_current_moves, width=9).pack(side=tk.LEFT, padx=(0, 5))
+
         ttk.Button(button_frame, text="취소",
                   command=self.dialog.destroy, width=12).pack(side=tk.LEFT)
 
-    def start_scan(self):
-        """메모리 스캔 시작"""
+    def start_scan(self, rescan=False):
+        """메모리 스캔 시작 (rescan이면 이전 후보 주소만 다시 확인)"""
         # 기술 ID 추출
         move_ids = []
         for var in self.move_vars:
@@ -750,99 +1068,252 @@ class MemoryScannerDialog:
                 messagebox.showerror("오류", f"잘못된 기술 선택: {selected}")
                 return
 
+        # SCAN / RESCAN 명령 (넓은 범위도 진행률 응답이 오므로 같은 시간 제한 사용)
+        id_text = ",".join(str(move_id) for move_id in move_ids)
+        if rescan:
+            self.send_scan_command(f"RESCAN:{id_text}", "재검색 중...")
+        elif self.wide_scan_var.get():
+            self.send_scan_command(f"SCAN:{id_text}:WIDE", "넓은 범위 스캔 중...")
+        else:
+            self.send_scan_command(f"SCAN:{id_text}", "스캔 중...")
+
+    def send_scan_command(self, command, status_text):
+        """스캔 관련 명령 전송 (결과는 on_response로 전달됨)"""
         # 상태 업데이트
-        self.status_var.set("스캔 중... (Lua 스크립트 응답 대기)")
-        self.scan_button.config(state="disabled")
-        self.dialog.update()
+        self.status_var.set(f"{status_text} (Lua 스크립트 응답 대기)")
+        self.set_buttons_state("disabled")
 
-        # result.txt 삭제 (이전 결과 제거)
-        if os.path.exists(self.result_file):
-            try:
-                os.remove(self.result_file)
-            except:
-                pass
+        # 이전 요청의 늦은 응답은 무시
+        if self.active_seq is not None:
+            self.lua_channel.cancel(self.active_seq)
+        self.active_seq = self.lua_channel.send(command, callback=self.on_response)
+        self.last_activity = time.perf_counter()
+        print(f"스캔 명령 전송: {command} (#{self.active_seq})")
 
-        # SCAN 명령 전송
-        scan_command = f"SCAN:{move_ids[0]},{move_ids[1]},{move_ids[2]},{move_ids[3]}"
-        try:
-            os.makedirs("lua_interface", exist_ok=True)
-            with open(self.command_file, 'w', encoding='utf-8') as f:
-                f.write(scan_command)
-            print(f"스캔 명령 전송: {scan_command}")
-        except Exception as e:
-            messagebox.showerror("오류", f"명령 전송 실패: {e}")
-            self.scan_button.config(state="normal")
-            self.status_var.set("대기 중")
+        self.dialog.after(500, self.check_timeout, self.active_seq)
+
+    def check_timeout(self, seq):
+        """응답 대기 시간 확인 (진행률 응답이 오는 동안은 계속 대기)"""
+        if seq != self.active_seq:
+            return
+        if time.perf_counter() - self.last_activity < self.timeout:
+            self.dialog.after(500, self.check_timeout, seq)
             return
 
-        # 결과 폴링 시작
-        self.poll_result()
-
-    def poll_result(self, attempts=0, max_attempts=20):
-        """result.txt 폴링 (최대 10초, 0.5초 간격)"""
-        if attempts >= max_attempts:
-            self.status_var.set("시간 초과 - Lua 스크립트 응답 없음")
-            self.scan_button.config(state="normal")
-            messagebox.showerror("오류",
-                               "스캔 응답이 없습니다.\n\n"
-                               "Lua 스크립트가 실행 중인지 확인해주세요.")
+        self.lua_channel.cancel(seq)
+        self.active_seq = None
+        self.status_var.set("시간 초과 - Lua 스크립트 응답 없음")
+        self.set_buttons_state("normal")
+        messagebox.showerror("오류",
+                           "스캔 응답이 없습니다.\n\n"
+                           "Lua 스크립트가 실행 중인지 확인해주세요.")
+
+    def set_buttons_state(self, state):
+        """스캔 버튼 상태 변경 (후보 관련 버튼은 후보가 있을 때만 활성화)"""
+        self.scan_button.config(state=state)
+        candidate_state = state if self.candidates else "disabled"
+        self.rescan_button.config(state=candidate_state)
+        self.select_button.config(state=candidate_state)
+
+    def show_candidates(self, candidates):
+        """후보 주소 목록 표시"""
+        self.candidates = candidates
+        self.candidate_listbox.delete(0, tk.END)
+        for i, address in enumerate(candidates):
+            self.candidate_listbox.insert(tk.END, f"{address}  (사용 중)" if i == 0 else address)
+        self.candidate_listbox.selection_set(0)
+        if not self.candidate_frame.winfo_ismapped():
+            self.candidate_frame.pack(fill=tk.X, after=self.moves_frame)
+            self.fit_size(460, 500)
+
+    def fit_size(self, width, height):
+        """창 크기를 width x height 이상으로 (크기 조절이 안 되는 창이라 위젯이 요구하는 크기보다 작으면 잘림)"""
+        self.dialog.update_idletasks()
+        width = max(width, self.dialog.winfo_width(), self.dialog.winfo_reqwidth())
+        height = max(height, self.dialog.winfo_reqheight())
+        self.dialog.geometry(f"{width}x{height}")
+
+    def use_selected_candidate(self):
+        """선택한 후보 주소를 Lua에 지정"""
+        selection = self.candidate_listbox.curselection()
+        if not selection:
             return
+        self.send_scan_command(f"SETADDR:{self.candidates[selection[0]]}", "주소 설정 중...")
 
-        if os.path.exists(self.result_file):
-            try:
-                with open(self.result_file, 'r', encoding='utf-8') as f:
-                    result = f.read().strip()
-
-                # 오류 확인
-                if result.startswith("ERROR:"):
-                    error_type = result.split(":")[1]
-                    if error_type == "NOT_FOUND":
-                        self.status_var.set("주소를 찾을 수 없음")
-                        messagebox.showerror("오류",
-                                           "일치하는 메모리 패턴을 찾을 수 없습니다.\n\n"
-                                           "- 대전 중인지 확인해주세요\n"
-                                           "- 선택한 기술이 정확한지 확인해주세요")
-                    else:
-                        self.status_var.set(f"오류: {error_type}")
-                        messagebox.showerror("오류", f"스캔 실패: {error_type}")
-
-                    self.scan_button.config(state="normal")
-                    return
-
-                # 성공
-                self.status_var.set(f"주소 발견: {result}")
-                messagebox.showinfo("성공",
-                                  f"메모리 주소를 찾았습니다!\n\n"
-                                  f"주소: {result}\n\n"
-                                  f"설정이 자동으로 저장되었습니다.")
-
-                print(f"메모리 주소 발견: {result}")
-                self.dialog.destroy()
+    def on_response(self, seq, kind, payload):
+        """스캔 명령 응답 처리 (Tk 스레드)"""
+        if seq != self.active_seq:
+            return
+        self.last_activity = time.perf_counter()
 
-            except Exception as e:
-                self.status_var.set(f"오류: {e}")
-                messagebox.showerror("오류", f"결과 읽기 실패: {e}")
-                self.scan_button.config(state="normal")
-        else:
-            # 0.5초 후 재시도
-            self.dialog.after(500, lambda: self.poll_result(attempts + 1, max_attempts))
+        if kind == "PROGRESS":
+            self.status_var.set(f"스캔 중... {payload}%")
+            return
+
+        self.active_seq = None
+
+        # 오류 확인
+        if kind == "ERROR":
+            if payload == "NOT_FOUND":
+                self.candidates = []
+                self.status_var.set("주소를 찾을 수 없음")
+                messagebox.showerror("오류",
+                                   "일치하는 메모리 패턴을 찾을 수 없습니다.\n\n"
+                                   "- 대전 중인지 확인해주세요\n"
+                                   "- 선택한 기술이 정확한지 확인해주세요")
+            elif payload == "NO_CANDIDATES":
+                self.candidates = []
+                self.status_var.set("남은 후보 없음 - 처음부터 다시 스캔해주세요")
+            elif payload == "CANCELLED":
+                self.status_var.set("스캔이 취소됨 (다른 스캔 시작)")
+            else:
+                self.status_var.set(f"오류: {payload}")
+                messagebox.showerror("오류", f"스캔 실패: {payload}")
+            self.set_buttons_state("normal")
+            return
+
+        # 후보가 여러 개면 목록을 보여주고 좁히기/선택 대기 (첫 후보가 우선 적용됨)
+        candidates = payload.split(",")
+        if len(candidates) > 1:
+            self.show_candidates(candidates)
+            self.status_var.set(f"후보 {len(candidates)}개 발견 (첫 번째 주소 적용됨)")
+            self.set_buttons_state("normal")
+            return
+        result = candidates[0]
+
+        # 성공
+        self.status_var.set(f"주소 발견: {result}")
+        messagebox.showinfo("성공",
+                          f"메모리 주소를 찾았습니다!\n\n"
+                          f"주소: {result}\n\n"
+                          f"설정이 자동으로 저장되었습니다.\n"
+                          f"Lua 스크립트가 이 주소로 가는 포인터 경로를 찾으면\n"
+                          f"다음 대전부터는 다시 스캔하지 않아도 됩니다.")
+
+        print(f"메모리 주소 발견: {result}")
+        self.dialog.destroy()
+
+    def request_current_moves(self, overwrite=True):
+        """Lua에 현재 1P 기술 4개를 요청 (overwrite가 False면 슬롯이 모두 기본값일 때만 채움)
+
+        다이얼로그에서만 쓰는 요청이므로 timeout이 지나면 Lua가 나중에 켜져도 실행하지 않게 기한을 붙임
+        """
+        if self.read_seq is not None:
+            self.lua_channel.cancel(self.read_seq)
+        self.read_seq = self.lua_channel.send(
+            "READMOVES", callback=lambda seq, kind, payload: self.on_current_moves(seq, kind, payload, overwrite),
+            ttl=self.timeout)
+
+    def on_current_moves(self, seq, kind, payload, overwrite):
+        """READMOVES 응답: 현재 기술로 슬롯 채우기"""
+        if seq != self.read_seq:
+            return
+        self.read_seq = None
+        if self.active_seq is not None:
+            return  # 스캔 중이면 상태 표시를 덮어쓰지 않음
+
+        if kind != "RESULT":
+            if overwrite:
+                self.status_var.set("현재 기술을 읽지 못했습니다 (주소 미확인) - 직접 선택해주세요")
+            return
+        if not overwrite and any(var.get() != EMPTY_SLOT_LABEL for var in self.move_vars):
+            return
+
+        move_ids = [int(part) for part in payload.split(",") if part.isdigit()]
+        for var, move_id in zip(self.move_vars, move_ids):
+            var.set(self.move_index.slot_label(move_id))
+        self.combo_values_set = [False] * 4
+        self.status_var.set("Lua에서 현재 기술을 불러왔습니다 (맞으면 바로 '주소 찾기')")
+
+    def on_combo_post(self, combo_index):
+        """콤보박스를 펼치기 직전 호출 - 검색어가 없으면 전체 목록 넣기"""
+        if not self.combo_values_set[combo_index]:
+            self.move_combos[combo_index]['values'] = self.move_list
+            self.combo_values_set[combo_index] = True
 
     def filter_moves(self, combo_index):
-        """콤보박스 검색 필터링 (메인 UI 로직과 동일)"""
-        search_text = self.move_vars[combo_index].get().lower()
+        """콤보박스 검색 필터링 (메인 UI와 같은 검색 인덱스, 관련도 순)"""
+        search_text = self.move_vars[combo_index].get().strip().lower()
         if not search_text:
-            self.move_combos[combo_index]['values'] = self.move_list
+            self.combo_values_set[combo_index] = False  # 펼칠 때 전체 목록으로
             return
 
-        # 검색어로 필터링
-        filtered_moves = []
-        for move_text in self.move_list:
-            move_name_lower = move_text.lower()
-            # ID나 이름에 검색어가 포함되면 추가
-            if search_text in move_name_lower or search_text in move_text.split('.')[0]:
-                filtered_moves.append(move_text)
+        # 빈 슬롯 항목은 인덱스에 없으므로 따로 비교
+        filtered_moves = [EMPTY_SLOT_LABEL] if search_text in EMPTY_SLOT_LABEL else []
+        labels = self.move_index.labels
+        filtered_moves += [labels[move_id] for move_id in self.move_index.search.search(search_text, match_ids=True)]
 
         self.move_combos[combo_index]['values'] = filtered_moves
+        self.combo_values_set[combo_index] = True
+
+
+class DiagnosticsWindow:
+    """기술 사용 단계별 지연 시간 (p50/p95/p99) 표시 및 내보내기 창"""
+    COLUMNS = ("단계", "횟수", "p50", "p95", "p99", "최대")
+
+    def __init__(self, parent, tracer, set_tracing):
+        self.tracer = tracer
+        self.set_tracing = set_tracing
+
+        self.window = tk.Toplevel(parent)
+        self.window.title("지연 시간 진단")
+        self.window.geometry("560x330")
+
+        top_frame = ttk.Frame(self.window, padding=(10, 10, 10, 0))
+        top_frame.pack(fill=tk.X)
+        self.enabled_var = tk.BooleanVar(value=tracer.enabled)
+        ttk.Checkbutton(top_frame, text="기록 켜기", variable=self.enabled_var,
+                        command=lambda: self.set_tracing(self.enabled_var.get())).pack(side=tk.LEFT)
+        self.count_var = tk.StringVar(value="")
+        ttk.Label(top_frame, textvariable=self.count_var, foreground="gray").pack(side=tk.RIGHT)
+
+        # 단계별 통계 (ms)
+        self.tree = ttk.Treeview(self.window, columns=self.COLUMNS, show="headings", height=8)
+        for column in self.COLUMNS:
+            self.tree.heading(column, text=column)
+            self.tree.column(column, width=180 if column == "단계" else 65,
+                             anchor=tk.W if column == "단계" else tk.E)
+        self.tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+
+        button_frame = ttk.Frame(self.window, padding=(10, 0, 10, 10))
+        button_frame.pack(fill=tk.X)
+        ttk.Button(button_frame, text="새로고침", command=self.refresh).pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Button(button_frame, text="CSV 내보내기", command=self.export_csv).pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Button(button_frame, text="Chrome trace 내보내기",
+                   command=self.export_chrome_trace).pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Button(button_frame, text="기록 지우기", command=self.clear).pack(side=tk.LEFT)
+
+        self.refresh()
+
+    def refresh(self):
+        """Lua 기록을 다시 읽고 통계 갱신"""
+        self.tracer.load_lua_trace()
+        self.tree.delete(*self.tree.get_children())
+        for label, count, *values in self.tracer.summary():
+            self.tree.insert("", tk.END, values=(label, count) + tuple(
+                f"{value:.1f}" if value is not None else "-" for value in values))
+        self.count_var.set(f"기록된 동작: {len(self.tracer.actions)} (단위: ms)")
+
+    def clear(self):
+        self.tracer.clear()
+        self.refresh()
+
+    def export_csv(self):
+        self._export("CSV", ".csv", [("CSV files", "*.csv")], self.tracer.export_csv)
+
+    def export_chrome_trace(self):
+        self._export("Chrome trace", ".json", [("JSON files", "*.json")], self.tracer.export_chrome_trace)
+
+    def _export(self, title, extension, filetypes, writer):
+        self.tracer.load_lua_trace()
+        file_path = filedialog.asksaveasfilename(parent=self.window, title=f"{title} 내보내기",
+                                                 defaultextension=extension, filetypes=filetypes)
+        if not file_path:
+            return
+        try:
+            writer(file_path)
+        except OSError as e:
+            messagebox.showerror("오류", f"내보내기 실패: {e}", parent=self.window)
 
 
 def main():
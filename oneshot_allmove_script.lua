@@ -2,23 +2,121 @@
 -- BizHawk용 - 메모리 스캔 기능 포함
 
 -- 설정
-local POLLING_INTERVAL = 60  -- 폴링 간격 (프레임)
+local POLLING_INTERVAL = 60  -- 이전 방식 command.txt 폴링 간격 (프레임, 명령 큐 파일이 생기기 전까지만)
+local QUEUE_POLLING_INTERVAL = 2  -- 명령 큐 폴링 간격 (프레임)
+local QUEUE_ROTATE_SIZE = 4096  -- 명령 큐 파일이 이 크기를 넘고 모두 처리되면 비움 (바이트)
+local MAX_ACK_SESSIONS = 16  -- ack 파일에 유지할 세션 수 (넘으면 명령 큐를 비운 뒤 오래된 세션부터 정리)
+local MAX_ACK_EXTRAS = 32  -- 세션마다 기억할, 앞 seq가 빠진 채 처리한 seq 수 (넘치면 빠진 seq는 포기)
 local COMMAND_FILE = "lua_interface/command.txt"
-local RESULT_FILE = "lua_interface/result.txt"
-local MEMORY_CONFIG_FILE = "lua_interface/memory_config.txt"
+local COMMAND_QUEUE_FILE = "lua_interface/command_queue.txt"
+local ACK_FILE = "lua_interface/ack.txt"
+local RESULT_FILE = "lua_interface/result.txt"  -- 이전 방식 스캔 결과 (외부 도구 호환용)
+local RESPONSE_FILE = "lua_interface/response.txt"  -- 요청별 응답 로그 ("세션|seq|종류|내용")
+local RESPONSE_ROTATE_SIZE = 16384  -- 응답 로그가 이 크기를 넘으면 최근 줄만 남김 (바이트)
+local RESPONSE_KEEP_LINES = 32  -- 응답 로그를 줄일 때 남기는 줄 수
+local TRACE_FILE = "lua_interface/trace.txt"  -- 단계별 시각 기록 ("세션|seq|단계|프레임|os.clock ms")
+local TRACE_ENABLED = false  -- true면 처음부터 기록 ("TRACE:ON" / "TRACE:OFF" 명령으로도 변경)
+local MEMORY_CONFIG_FILE = "lua_interface/memory_config.txt"  -- 이전 버전 호환용 (롬 구분 없음)
+local ADDRESS_CACHE_FILE = "lua_interface/address_cache.txt"  -- 롬별 주소 캐시 ("롬키=0x주소")
+local POINTER_PATHS_FILE = "lua_interface/pointer_paths.txt"  -- 롬별 포인터 경로 ("롬키|0x기준주소|0x오프셋,...")
+local GAME_INFO_FILE = "lua_interface/game_info.txt"  -- 감지한 게임/주소 정보 (Python에서 읽음)
 local DISABLE_TOUCH = false  -- true로 설정하면 터치 입력을 비활성화
+local OVERLAY_ENABLED = true  -- false로 설정하면 화면 표시를 끔 ("OVERLAY:ON" / "OVERLAY:OFF" 명령으로도 변경)
+local OVERLAY_REFRESH_INTERVAL = 15  -- 화면 표시용 기술 값을 다시 읽는 간격 (프레임)
+local AUTO_DETECT_ENABLED = true  -- 전투 중 PP가 줄어든 기술을 Python에 알림 ("AUTODETECT:ON" / "AUTODETECT:OFF" 명령으로도 변경)
+local AUTO_DETECT_INTERVAL = 10  -- 메모리 쓰기 콜백을 쓸 수 없을 때 PP를 다시 읽는 간격 (프레임)
+local EVENT_SESSION = "*"  -- 명령 없이 보내는 알림의 세션 (응답 로그에 "*|0|종류|내용"으로 기록)
+local MAIN_RAM_BUS_BASE = 0x02000000  -- 시스템 버스에서 Main RAM 시작 주소 (포인터 값, 메모리 쓰기 콜백)
 
--- 메모리 스캔 범위
-local SCAN_RANGE_START = 0x2C6000  -- 스캔 시작 주소
-local SCAN_RANGE_END = 0x2C6B00    -- 스캔 종료 주소
+-- 기술 변경 후 화면 갱신용 터치 타이밍 (프레임, 60프레임 = 1초)
+local TOUCH_START_DELAY = 30  -- 기술 변경 후 첫 터치까지 대기
+local TOUCH_HOLD_FRAMES = 5  -- 한 번 터치할 때 누르고 있는 시간
+local TOUCH_RELEASE_FRAMES = 10  -- 터치를 뗀 뒤 대기
+local TOUCH_GAP_FRAMES = 30  -- 터치 사이 추가 대기
+local TOUCH_TAP_COUNT = 2  -- 터치 횟수
+local TOUCH_X = 50  -- 터치 위치 (좌측상단)
+local TOUCH_Y = 50
 
--- 메모리 주소 (초기값 - 설정 파일에서 로드됨)
+-- 메모리 스캔
+local MAIN_RAM_SIZE = 0x400000     -- "SCAN:...:WIDE"는 Main RAM 전체를 스캔
+local SCAN_CHUNK_SIZE = 0x8000     -- 프레임당 스캔 바이트 수 (넓은 범위도 프레임 끊김 없이)
+local MAX_SCAN_CANDIDATES = 32     -- 결과로 돌려줄 최대 후보 수
+local MAX_MOVE_ID = 467            -- 주소 검증용 최대 기술 번호
+local MAX_SPECIES_ID = 493         -- 주소 검증용 최대 포켓몬 번호
+local MAX_MOVE_PP = 64             -- 주소 검증용 최대 PP (포인트업 최대 적용)
+local VALIDATE_INTERVAL = 60       -- 검증되지 않은 주소를 다시 확인하는 간격 (프레임)
+local MAX_POINTER_OFFSET = 0x4000  -- 포인터가 가리키는 곳에서 다음 단계(기술 슬롯)까지 최대 거리
+local MAX_POINTER_DEPTH = 2        -- 기술 슬롯까지 따라갈 포인터 단계 수
+local MAX_POINTER_PATHS = 32       -- 단계별로 저장할 최대 포인터 경로 수
+
+-- ROM 헤더 (DS는 카트리지 헤더를 Main RAM 0x3FFE00에 복사해 둠)
+local ROM_HEADER_GAME_CODE = 0x3FFE0C  -- 게임 코드 4글자 (예: "CPUK")
+local ROM_HEADER_CRC = 0x3FFF5E        -- 헤더 CRC16 (같은 게임 코드의 다른 롬 구분용)
+
+-- 게임별 메모리 프로필 (게임 코드 앞 3글자로 선택, 4번째 글자는 지역)
+--   scanStart/scanEnd: 기본 스캔 범위
+--   defaultAddress: 스캔 전에 사용할 1P 첫 번째 기술 슬롯 주소 (nil이면 스캔 필요)
+--   battlerSize: 전투 포켓몬 구조체 크기, player2Battler: 2P 포켓몬의 전투 위치 번호
+--   movesOffset/ppOffset: 구조체 안의 기술 슬롯/PP 위치 (포켓몬 번호는 구조체 맨 앞)
+-- 4세대는 전투 구조체가 같으므로 범위와 기본 주소만 다름
+-- HGSS/DP 범위는 실측값이 아니라 Main RAM 후반부를 넓게 잡은 값
+local GAME_PROFILES = {
+	{
+		name = "Platinum", codes = { "CPU" }, romNames = { "platinum" },
+		scanStart = 0x2C6000, scanEnd = 0x2C6B00, defaultAddress = 0x2C6AEC,
+		battlerSize = 0xC0, player2Battler = 2, movesOffset = 0x0C, ppOffset = 0x2C,
+	},
+	{
+		name = "HeartGold/SoulSilver", codes = { "IPK", "IPG" }, romNames = { "heartgold", "soulsilver" },
+		scanStart = 0x200000, scanEnd = 0x300000, defaultAddress = nil,
+		battlerSize = 0xC0, player2Battler = 2, movesOffset = 0x0C, ppOffset = 0x2C,
+	},
+	{
+		name = "Diamond/Pearl", codes = { "ADA", "APA" }, romNames = { "diamond", "pearl" },
+		scanStart = 0x200000, scanEnd = 0x300000, defaultAddress = nil,
+		battlerSize = 0xC0, player2Battler = 2, movesOffset = 0x0C, ppOffset = 0x2C,
+	},
+}
+-- 감지 실패 시 (이전 버전과 같은 플래티넘 값에 Main RAM 전체 스캔)
+local UNKNOWN_PROFILE = {
+	name = "Unknown", codes = {}, romNames = {},
+	scanStart = 0, scanEnd = MAIN_RAM_SIZE, defaultAddress = 0x2C6AEC,
+	battlerSize = 0xC0, player2Battler = 2, movesOffset = 0x0C, ppOffset = 0x2C,
+}
+
+-- 메모리 주소 (초기값 - 게임 프로필/주소 캐시에서 결정됨)
 local FIRST_MOVE_SLOT_1P = 0x2C6AEC  -- 1P 첫 번째 기술 슬롯 주소
 local FIRST_MOVE_SLOT_2P = 0x2C6C6C  -- 2P 첫 번째 기술 슬롯 주소
 
 -- 전역 변수
 local frameCounter = 0
 local addressConfigLoaded = false
+local gameProfile = UNKNOWN_PROFILE
+local gameCode = "????"
+local romKey = "unknown"  -- 주소 캐시 키 (게임 코드-헤더 CRC)
+local addressSource = "default"  -- default / cache / legacy / scan / manual
+local addressVerified = false  -- 현재 주소가 전투 구조체 검증을 통과했는지
+local sessionSeqs = {}  -- 세션 -> 빠짐없이 처리한 마지막 seq
+local sessionExtras = {}  -- 세션 -> {seq = true} (그 이후 처리한 seq, 앞 seq가 빠진 경우)
+local sessionOrder = {}  -- 최근에 명령을 보낸 세션 순서 (앞쪽이 최근)
+local lastQueueSize = -1  -- 마지막으로 전부 읽은 명령 큐 파일 크기
+local scanCandidates = {}  -- 마지막 스캔/재검색에서 패턴이 일치한 주소 목록
+local activeScan = nil  -- 진행 중인 스캔 (프레임마다 SCAN_CHUNK_SIZE씩 진행)
+local pointerPaths = {}  -- 이 롬의 포인터 경로 { {base = 주소, offsets = {단계별 오프셋}}, ... }
+local pointerSearch = nil  -- 진행 중인 포인터 검색 (스캔처럼 프레임마다 SCAN_CHUNK_SIZE씩)
+local responseSize = 0  -- 응답 로그 크기 (줄이기 판단용)
+local touchJob = nil  -- 진행 중인 터치 입력 코루틴 (mainLoop에서 프레임마다 한 단계씩)
+local touchTapping = false  -- 첫 터치를 시작했는지 (시작 전이면 새 요청을 합침)
+local touchPending = false  -- 진행 중인 터치가 끝난 뒤 한 번 더 터치 필요
+local touchRequests = {}  -- 진행 중인 터치 입력을 기다리는 요청 (터치 완료 기록용)
+local nextTouchRequests = {}  -- 다음 터치 입력을 기다리는 요청
+local overlayValues = {}  -- 마지막으로 표시한 값 (바뀌었을 때만 표시 문자열을 다시 만듦)
+local overlayLines = {}  -- 표시할 줄 캐시 { {문자열, 색}, ... }
+local overlayRefresh = true  -- 다음 프레임에 기술 값을 바로 다시 읽음
+local detectSnapshots = {}  -- 플레이어 -> 마지막으로 읽은 전투 포켓몬 {addr, species, moves, pp}
+local ppWatchAddr = nil  -- PP 쓰기 콜백을 등록한 1P 주소 (nil이면 등록 안 함)
+local ppWatchActive = false  -- PP 쓰기 콜백 사용 중 (false면 AUTO_DETECT_INTERVAL마다 폴링)
+local ppWriteDirty = true  -- 콜백 등록 후 PP가 바뀌었을 수 있음
 
 -- ========================================
 -- 유틸리티 함수들
@@ -57,10 +155,86 @@ function deleteFile(filename)
 	os.remove(filename)
 end
 
+-- ========================================
+-- 응답 로그
+-- ========================================
+
+-- 요청에 대한 응답 기록
+--   request: 명령 큐의 {session, seq} (이전 방식 command.txt 명령이면 nil)
+--   kind: RESULT(스캔 결과), ERROR(오류 코드), PROGRESS(진행률 %), DONE(명령 완료)
+function respond(request, kind, payload)
+	if not request then
+		return
+	end
+	local line = string.format("%s|%d|%s|%s\n", request.session, request.seq, kind, payload)
+	local file = io.open(RESPONSE_FILE, "a")
+	if file then
+		file:write(line)
+		file:close()
+		responseSize = responseSize + #line
+	end
+end
+
+-- 스캔 관련 결과/오류는 이전 방식 result.txt에도 기록
+function respondScan(request, kind, payload)
+	if kind == "RESULT" then
+		writeFile(RESULT_FILE, payload)
+	elseif kind == "ERROR" then
+		writeFile(RESULT_FILE, "ERROR:" .. payload)
+	end
+	respond(request, kind, payload)
+end
+
+-- 응답 로그가 커지면 최근 줄만 남김 (프레임 시작 시 호출)
+-- 읽는 쪽은 파일이 줄어들면 마지막으로 읽은 줄을 찾아 그 다음부터 이어 읽음
+function rotateResponseLog()
+	if responseSize < RESPONSE_ROTATE_SIZE then
+		return
+	end
+	local content = readFile(RESPONSE_FILE) or ""
+	local lines = {}
+	for line in content:gmatch("([^\n]*)\n") do
+		table.insert(lines, line)
+		if #lines > RESPONSE_KEEP_LINES then
+			table.remove(lines, 1)
+		end
+	end
+	local kept = #lines > 0 and table.concat(lines, "\n") .. "\n" or ""
+	writeFile(RESPONSE_FILE, kept)
+	responseSize = #kept
+end
+
+-- 요청 처리 단계 시각 기록 (pickup / ram_write / touch_done)
+function traceEvent(request, stage)
+	if not TRACE_ENABLED or not request then
+		return
+	end
+	local file = io.open(TRACE_FILE, "a")
+	if file then
+		file:write(string.format("%s|%d|%s|%d|%.3f\n", request.session, request.seq, stage,
+			frameCounter, os.clock() * 1000))
+		file:close()
+	end
+end
+
 -- ========================================
 -- 메모리 설정 관리
 -- ========================================
 
+-- 1P 기술 슬롯 -> 2P 기술 슬롯 거리 (전투 위치 0 -> player2Battler)
+function player2Offset()
+	return gameProfile.battlerSize * gameProfile.player2Battler
+end
+
+function applyMoveSlotAddress(addr, source)
+	FIRST_MOVE_SLOT_1P = addr
+	FIRST_MOVE_SLOT_2P = addr + player2Offset()
+	addressSource = source
+	addressVerified = false
+	addressConfigLoaded = source ~= "default"
+end
+
+-- 이전 버전의 memory_config.txt (롬별 캐시가 없을 때만 사용)
 function loadMemoryConfig()
 	if fileExists(MEMORY_CONFIG_FILE) then
 		local config = readFile(MEMORY_CONFIG_FILE)
@@ -71,9 +245,7 @@ function loadMemoryConfig()
 			-- 16진수 문자열을 숫자로 변환
 			local addr = tonumber(config, 16)
 			if addr and addr > 0 then
-				FIRST_MOVE_SLOT_1P = addr
-				FIRST_MOVE_SLOT_2P = addr + 0x180  -- 2P는 1P에서 0x180 떨어진 위치
-				addressConfigLoaded = true
+				applyMoveSlotAddress(addr, "legacy")
 				print(string.format("메모리 설정 로드: 1P=0x%08X, 2P=0x%08X", FIRST_MOVE_SLOT_1P, FIRST_MOVE_SLOT_2P))
 				return true
 			end
@@ -92,55 +264,551 @@ function saveMemoryConfig(address)
 	return false
 end
 
+-- 롬별 주소 캐시: 롬키 -> 주소
+function loadAddressCache()
+	local cache = {}
+	local content = readFile(ADDRESS_CACHE_FILE)
+	if content then
+		for key, addr in content:gmatch("([%w%-]+)=0[xX](%x+)") do
+			cache[key] = tonumber(addr, 16)
+		end
+	end
+	return cache
+end
+
+function saveAddressCache(address)
+	local cache = loadAddressCache()
+	cache[romKey] = address
+	local keys = {}
+	for key in pairs(cache) do
+		table.insert(keys, key)
+	end
+	table.sort(keys)
+	local lines = {}
+	for _, key in ipairs(keys) do
+		table.insert(lines, string.format("%s=0x%08X", key, cache[key]))
+	end
+	writeFile(ADDRESS_CACHE_FILE, table.concat(lines, "\n") .. "\n")
+end
+
+-- 현재 상태를 game_info.txt에 기록 (Python 세이브 파일의 게임 버전 등에 사용)
+function writeGameInfo()
+	writeFile(GAME_INFO_FILE, string.format(
+		"game=%s\ncode=%s\nrom=%s\naddress=0x%08X\nsource=%s\nverified=%d\npointers=%d\nautodetect=%d\n",
+		gameProfile.name, gameCode, romKey, FIRST_MOVE_SLOT_1P, addressSource, addressVerified and 1 or 0,
+		#pointerPaths, AUTO_DETECT_ENABLED and 1 or 0))
+end
+
+-- ROM 헤더의 게임 코드로 프로필 선택 (읽을 수 없으면 롬 파일 이름으로)
+function detectGame()
+	local bytes, base = readBytes(ROM_HEADER_GAME_CODE, 4)
+	local chars = {}
+	for k = 0, 3 do
+		local b = bytes[base + k] or 0
+		if b < 0x30 or b > 0x5A then
+			chars = nil
+			break
+		end
+		chars[k + 1] = string.char(b)
+	end
+
+	gameProfile = UNKNOWN_PROFILE
+	if chars then
+		gameCode = table.concat(chars)
+		romKey = string.format("%s-%04X", gameCode, memory.read_u16_le(ROM_HEADER_CRC, "Main RAM"))
+		for _, profile in ipairs(GAME_PROFILES) do
+			for _, code in ipairs(profile.codes) do
+				if gameCode:sub(1, 3) == code then
+					gameProfile = profile
+				end
+			end
+		end
+	elseif gameinfo and gameinfo.getromname then
+		local romName = gameinfo.getromname():lower()
+		romKey = "name-" .. romName:gsub("[^%w]", "")
+		for _, profile in ipairs(GAME_PROFILES) do
+			for _, name in ipairs(profile.romNames) do
+				if romName:find(name, 1, true) then
+					gameProfile = profile
+				end
+			end
+		end
+	end
+	print(string.format("게임 감지: %s (코드 %s, 캐시 키 %s)", gameProfile.name, gameCode, romKey))
+end
+
+-- 주소 결정: 롬별 캐시 -> 이전 설정 파일 -> 프로필 기본값
+-- 대전 중인데 주소가 맞지 않으면 저장된 포인터 경로로 찾음
+function resolveAddress()
+	local cached = loadAddressCache()[romKey]
+	if cached then
+		applyMoveSlotAddress(cached, "cache")
+		print(string.format("주소 캐시 사용: 1P=0x%08X, 2P=0x%08X", FIRST_MOVE_SLOT_1P, FIRST_MOVE_SLOT_2P))
+	elseif not loadMemoryConfig() then
+		applyMoveSlotAddress(gameProfile.defaultAddress or UNKNOWN_PROFILE.defaultAddress, "default")
+	end
+	pointerPaths = loadPointerPaths()
+	addressVerified = validateMoveSlotAddress(FIRST_MOVE_SLOT_1P)
+	if not followPointerPaths() and addressVerified then
+		narrowPointerPaths()
+	end
+	writeGameInfo()
+end
+
+-- 주소가 전투 포켓몬 구조체의 기술 슬롯처럼 보이는지 확인 (구조체 한 번 읽기)
+-- 포켓몬 번호, 기술 번호 4개, PP 4개가 모두 정상 범위여야 통과 (대전 중이 아니면 실패)
+function validateMoveSlotAddress(addr)
+	local structStart = addr - gameProfile.movesOffset
+	if structStart < 0 or structStart + gameProfile.ppOffset + 4 > MAIN_RAM_SIZE then
+		return false
+	end
+	local bytes, base = readBytes(structStart, gameProfile.ppOffset + 4)
+	local species = bytes[base] + bytes[base + 1] * 256
+	if species == 0 or species > MAX_SPECIES_ID then
+		return false
+	end
+	for k = 0, 3 do
+		local index = base + gameProfile.movesOffset + k * 2
+		local moveId = bytes[index] + bytes[index + 1] * 256
+		local pp = bytes[base + gameProfile.ppOffset + k]
+		if moveId > MAX_MOVE_ID or (k == 0 and moveId == 0) or pp > MAX_MOVE_PP then
+			return false
+		end
+	end
+	return true
+end
+
+-- 검증되지 않은 주소를 주기적으로 확인 (mainLoop에서 호출)
+-- 포인터 경로가 있으면 대전이 바뀌어 구조체가 옮겨졌는지도 같이 확인
+function checkAddressValidation()
+	if frameCounter % VALIDATE_INTERVAL ~= 0 then
+		return
+	end
+	if followPointerPaths() or addressVerified then
+		return
+	end
+	if validateMoveSlotAddress(FIRST_MOVE_SLOT_1P) then
+		addressVerified = true
+		print(string.format("주소 검증 완료: 0x%08X (%s)", FIRST_MOVE_SLOT_1P, addressSource))
+		narrowPointerPaths()
+		writeGameInfo()
+	end
+end
+
 -- ========================================
 -- 메모리 스캔 함수
 -- ========================================
 
-function scanMemoryForMoves(move1, move2, move3, move4)
+-- 범위를 한 번에 읽기: (바이트 테이블, 첫 바이트 인덱스) 반환
+function readBytes(addr, length)
+	-- BizHawk 2.6+는 read_bytes_as_array(1부터), 이전 버전은 readbyterange(0부터)
+	if memory.read_bytes_as_array then
+		return memory.read_bytes_as_array(addr, length, "Main RAM"), 1
+	end
+	local bytes = memory.readbyterange(addr, length, "Main RAM")
+	if bytes[0] ~= nil then
+		return bytes, 0
+	end
+	return bytes, 1
+end
+
+-- 기술 ID 4개 -> 리틀엔디안 8바이트 패턴
+function buildMovePattern(moves)
+	local pattern = {}
+	for _, id in ipairs(moves) do
+		table.insert(pattern, id % 256)
+		table.insert(pattern, math.floor(id / 256) % 256)
+	end
+	return pattern
+end
+
+function matchesPattern(bytes, index, pattern)
+	for k = 1, 8 do
+		if bytes[index + k - 1] ~= pattern[k] then
+			return false
+		end
+	end
+	return true
+end
+
+-- 스캔/선택으로 찾은 주소 적용 및 롬별 캐시에 저장
+function setMoveSlotAddress(addr, source)
+	applyMoveSlotAddress(addr, source or "scan")
+	-- 패턴이 일치한 주소이므로 구조체 검증이 실패해도 사용은 가능
+	addressVerified = validateMoveSlotAddress(addr)
+	saveAddressCache(addr)
+	saveMemoryConfig(addr)
+	if addressVerified then
+		narrowPointerPaths()
+	end
+	writeGameInfo()
+end
+
+-- 후보 목록을 응답으로 기록 ("0x주소1,0x주소2,..."), 첫 후보를 사용
+function reportScanResults(request)
+	if #scanCandidates == 0 then
+		respondScan(request, "ERROR", "NOT_FOUND")
+		print("오류: 일치하는 패턴을 찾을 수 없습니다")
+		print("==============================================")
+		return false
+	end
+
+	local parts = {}
+	for i, addr in ipairs(scanCandidates) do
+		parts[i] = string.format("0x%08X", addr)
+	end
+	local result = table.concat(parts, ",")
+	respondScan(request, "RESULT", result)
+	print(string.format("주소 발견 완료: %s (총 %d개 발견)", parts[1], #scanCandidates))
+
+	-- 캐시와 같은 주소면 다시 저장하지 않음 (이전 설정/기본값은 롬별 캐시로 옮김)
+	if scanCandidates[1] ~= FIRST_MOVE_SLOT_1P or addressSource == "default" or addressSource == "legacy" then
+		setMoveSlotAddress(scanCandidates[1], "scan")
+	end
+	print("==============================================")
+	return true
+end
+
+function scanMemoryForMoves(moves, rangeStart, rangeEnd, request)
 	print("==============================================")
 	print("메모리 스캔 시작")
-	print(string.format("검색 패턴: %d, %d, %d, %d", move1, move2, move3, move4))
-	print(string.format("스캔 범위: 0x%08X - 0x%08X", SCAN_RANGE_START, SCAN_RANGE_END))
-
-	local foundCount = 0
-	local foundAddr = nil
-
-	-- 범위 스캔 (2바이트씩)
-	for addr = SCAN_RANGE_START, SCAN_RANGE_END - 8, 2 do
-		local m1 = memory.read_u16_le(addr, "Main RAM")
-		local m2 = memory.read_u16_le(addr + 2, "Main RAM")
-		local m3 = memory.read_u16_le(addr + 4, "Main RAM")
-		local m4 = memory.read_u16_le(addr + 6, "Main RAM")
-
-		if m1 == move1 and m2 == move2 and m3 == move3 and m4 == move4 then
-			foundCount = foundCount + 1
-			if foundAddr == nil then
-				foundAddr = addr
+	print(string.format("검색 패턴: %d, %d, %d, %d", moves[1], moves[2], moves[3], moves[4]))
+
+	-- 현재 주소(캐시)가 그대로 맞으면 전체 스캔 생략
+	local pattern = buildMovePattern(moves)
+	local bytes, base = readBytes(FIRST_MOVE_SLOT_1P, 8)
+	if matchesPattern(bytes, base, pattern) then
+		print(string.format("현재 주소가 일치함 - 스캔 생략 (%s)", addressSource))
+		cancelActiveScan()
+		scanCandidates = { FIRST_MOVE_SLOT_1P }
+		reportScanResults(request)
+		return
+	end
+
+	print(string.format("스캔 범위: 0x%08X - 0x%08X", rangeStart, rangeEnd))
+
+	-- 이전 스캔이 진행 중이면 새 스캔으로 교체
+	cancelActiveScan()
+	activeScan = {
+		pattern = pattern,
+		rangeStart = rangeStart,
+		nextAddr = rangeStart,
+		rangeEnd = rangeEnd,
+		found = {},
+		request = request,
+		lastProgress = 0,
+	}
+end
+
+-- 진행 중인 스캔 취소 (요청한 쪽에 CANCELLED 응답)
+function cancelActiveScan()
+	if activeScan then
+		respond(activeScan.request, "ERROR", "CANCELLED")
+		activeScan = nil
+	end
+end
+
+-- 스캔 한 조각 진행 (mainLoop에서 프레임마다 호출)
+-- 조각을 한 번에 읽고, 첫 2바이트가 맞는 위치만 나머지를 비교
+function stepScan()
+	local scan = activeScan
+	if not scan then
+		return
+	end
+
+	local chunkStart = scan.nextAddr
+	local chunkEnd = math.min(chunkStart + SCAN_CHUNK_SIZE, scan.rangeEnd)
+	-- 조각 경계에 걸친 패턴도 찾도록 6바이트 더 읽음
+	local readEnd = math.min(chunkEnd + 6, scan.rangeEnd)
+	local bytes, base = readBytes(chunkStart, readEnd - chunkStart)
+	local pattern = scan.pattern
+	local first, second = pattern[1], pattern[2]
+
+	for offset = 0, math.min(chunkEnd, readEnd - 8 + 1) - chunkStart - 1, 2 do
+		local index = base + offset
+		if bytes[index] == first and bytes[index + 1] == second and matchesPattern(bytes, index, pattern) then
+			if #scan.found < MAX_SCAN_CANDIDATES then
+				table.insert(scan.found, chunkStart + offset)
 			end
-			print(string.format("패턴 발견 #%d: 0x%08X", foundCount, addr))
+			print(string.format("패턴 발견 #%d: 0x%08X", #scan.found, chunkStart + offset))
 		end
 	end
 
-	-- 결과 처리
-	if foundAddr then
-		local result = string.format("0x%08X", foundAddr)
-		writeFile(RESULT_FILE, result)
-		print(string.format("주소 발견 완료: %s (총 %d개 발견)", result, foundCount))
+	scan.nextAddr = chunkEnd
+	if scan.nextAddr >= scan.rangeEnd then
+		activeScan = nil
+		scanCandidates = scan.found
+		reportScanResults(scan.request)
+	else
+		-- 진행률은 5% 단위로만 기록
+		local progress = math.floor((scan.nextAddr - scan.rangeStart) * 100 / (scan.rangeEnd - scan.rangeStart))
+		if progress >= scan.lastProgress + 5 then
+			scan.lastProgress = progress
+			respond(scan.request, "PROGRESS", tostring(progress))
+		end
+	end
+end
 
-		-- 설정 저장
-		saveMemoryConfig(foundAddr)
-		FIRST_MOVE_SLOT_1P = foundAddr
-		FIRST_MOVE_SLOT_2P = foundAddr + 0x180
-		addressConfigLoaded = true
+-- 이전 후보 중 새 패턴과 일치하는 주소만 남김 (전체 범위를 다시 스캔하지 않음)
+function rescanCandidates(moves, request)
+	print("==============================================")
+	print(string.format("후보 재검색: %d, %d, %d, %d (후보 %d개)", moves[1], moves[2], moves[3], moves[4], #scanCandidates))
 
-		print("==============================================")
-		return true
-	else
-		writeFile(RESULT_FILE, "ERROR:NOT_FOUND")
-		print("오류: 일치하는 패턴을 찾을 수 없습니다")
-		print("==============================================")
+	if #scanCandidates == 0 then
+		respondScan(request, "ERROR", "NO_CANDIDATES")
+		print("오류: 재검색할 후보가 없습니다 - 먼저 스캔하세요")
 		return false
 	end
+
+	local pattern = buildMovePattern(moves)
+	local kept = {}
+	for _, addr in ipairs(scanCandidates) do
+		local bytes, base = readBytes(addr, 8)
+		if matchesPattern(bytes, base, pattern) then
+			table.insert(kept, addr)
+		end
+	end
+	scanCandidates = kept
+	return reportScanResults(request)
+end
+
+-- ========================================
+-- 포인터 경로
+-- ========================================
+-- 전투 구조체는 대전마다 다른 곳에 할당되므로, 위치가 바뀌지 않는 곳(기준 주소)에서
+-- 포인터를 따라가 기술 슬롯에 닿는 경로를 찾아 두고 대전이 바뀌면 경로로 주소를 다시 구함
+--   경로: 기준 주소의 32비트 값(버스 주소)을 읽고 오프셋을 더하기를 단계 수만큼 반복
+-- 스캔으로 찾은 주소가 검증되면 경로를 찾고, 이후 검증될 때마다 다른 곳을 가리키는 경로는 버림
+
+function formatPointerPath(path)
+	local offsets = {}
+	for i, offset in ipairs(path.offsets) do
+		offsets[i] = string.format("0x%X", offset)
+	end
+	return string.format("0x%08X|%s", path.base, table.concat(offsets, ","))
+end
+
+-- 이 롬의 포인터 경로 로드
+function loadPointerPaths()
+	local paths = {}
+	local content = readFile(POINTER_PATHS_FILE)
+	if content then
+		for line in content:gmatch("[^\r\n]+") do
+			local key, base, offsetList = line:match("^([%w%-]+)|0[xX](%x+)|([%xxX,]+)$")
+			if key == romKey then
+				local path = { base = tonumber(base, 16), offsets = {} }
+				for offset in offsetList:gmatch("0[xX](%x+)") do
+					table.insert(path.offsets, tonumber(offset, 16))
+				end
+				table.insert(paths, path)
+			end
+		end
+	end
+	if #paths > 0 then
+		print(string.format("포인터 경로 %d개 로드", #paths))
+	end
+	return paths
+end
+
+-- 이 롬의 경로만 바꿔서 저장 (다른 롬 경로는 그대로)
+function savePointerPaths()
+	local lines = {}
+	local content = readFile(POINTER_PATHS_FILE)
+	if content then
+		for line in content:gmatch("[^\r\n]+") do
+			if line:match("^([%w%-]+)|") ~= romKey then
+				table.insert(lines, line)
+			end
+		end
+	end
+	for _, path in ipairs(pointerPaths) do
+		table.insert(lines, romKey .. "|" .. formatPointerPath(path))
+	end
+	writeFile(POINTER_PATHS_FILE, table.concat(lines, "\n") .. "\n")
+end
+
+-- 경로를 따라간 1P 기술 슬롯 주소 (중간에 Main RAM 밖을 가리키면 nil)
+function resolvePointerPath(path)
+	local addr = path.base
+	for _, offset in ipairs(path.offsets) do
+		if addr < 0 or addr + 4 > MAIN_RAM_SIZE then
+			return nil
+		end
+		local pointer = memory.read_u32_le(addr, "Main RAM")
+		if pointer < MAIN_RAM_BUS_BASE or pointer >= MAIN_RAM_BUS_BASE + MAIN_RAM_SIZE then
+			return nil
+		end
+		addr = pointer - MAIN_RAM_BUS_BASE + offset
+	end
+	return addr
+end
+
+-- 저장된 경로로 주소 찾기 (경로마다 결과가 다르면 검증을 통과한 주소 중 가장 많은 경로가 가리키는 곳)
+-- 현재 주소와 다르면 바꾸고 맞지 않는 경로는 버림, 찾았으면 true
+function followPointerPaths()
+	if #pointerPaths == 0 or pointerSearch then
+		return false
+	end
+	local votes = {}
+	local best, bestVotes = nil, 0
+	for _, path in ipairs(pointerPaths) do
+		local addr = resolvePointerPath(path)
+		if addr then
+			if votes[addr] == nil then
+				votes[addr] = validateMoveSlotAddress(addr) and 0 or false
+			end
+			if votes[addr] then
+				votes[addr] = votes[addr] + 1
+				if votes[addr] > bestVotes then
+					best, bestVotes = addr, votes[addr]
+				end
+			end
+		end
+	end
+	if not best then
+		return false
+	end
+	if best ~= FIRST_MOVE_SLOT_1P or not addressVerified then
+		if best ~= FIRST_MOVE_SLOT_1P then
+			applyMoveSlotAddress(best, "pointer")
+			overlayRefresh = true
+			print(string.format("포인터 경로로 주소 갱신: 1P=0x%08X, 2P=0x%08X", FIRST_MOVE_SLOT_1P, FIRST_MOVE_SLOT_2P))
+		end
+		addressVerified = true
+		narrowPointerPaths()
+		writeGameInfo()
+	end
+	return true
+end
+
+-- 검증된 현재 주소를 가리키지 않는 경로를 버림, 남은 경로가 없으면 새로 검색
+function narrowPointerPaths()
+	local kept = {}
+	for _, path in ipairs(pointerPaths) do
+		if resolvePointerPath(path) == FIRST_MOVE_SLOT_1P then
+			table.insert(kept, path)
+		end
+	end
+	if #kept ~= #pointerPaths then
+		print(string.format("포인터 경로 %d개 중 %d개 유지", #pointerPaths, #kept))
+		pointerPaths = kept
+		savePointerPaths()
+	end
+	if #pointerPaths == 0 then
+		startPointerSearch()
+	end
+end
+
+-- 포인터 검색 대상을 기준 주소 순으로 정렬 (포인터 값마다 이진 검색으로 가까운 대상만 확인)
+function sortPointerTargets(targets)
+	table.sort(targets, function(a, b)
+		return a.base < b.base
+	end)
+	return targets
+end
+
+-- 기준 주소가 value 이상인 첫 대상의 위치 (없으면 #targets + 1)
+function findPointerTarget(targets, value)
+	local low, high = 1, #targets + 1
+	while low < high do
+		local middle = math.floor((low + high) / 2)
+		if targets[middle].base < value then
+			low = middle + 1
+		else
+			high = middle
+		end
+	end
+	return low
+end
+
+-- 포인터 검색 시작: 1단계는 기술 슬롯을, 2단계는 1단계 경로의 기준 주소를 가리키는 값을 찾음
+function startPointerSearch()
+	pointerSearch = {
+		slotAddr = FIRST_MOVE_SLOT_1P,
+		targets = { { base = FIRST_MOVE_SLOT_1P, offsets = {} } },
+		depth = 1,
+		nextAddr = 0,
+		found = {},
+		paths = {},
+	}
+	print(string.format("포인터 경로 검색 시작: 0x%08X", FIRST_MOVE_SLOT_1P))
+end
+
+-- 포인터 검색 한 조각 진행 (mainLoop에서 프레임마다 호출, 메모리 스캔 중이면 대기)
+-- 대상 근처(같은 구조체 안)에 있는 포인터는 구조체와 같이 옮겨지므로 기준 주소로 쓰지 않음
+function stepPointerSearch()
+	local search = pointerSearch
+	if not search or activeScan then
+		return
+	end
+
+	local chunkStart = search.nextAddr
+	local chunkEnd = math.min(chunkStart + SCAN_CHUNK_SIZE, MAIN_RAM_SIZE)
+	local bytes, base = readBytes(chunkStart, chunkEnd - chunkStart)
+	local ramEnd = MAIN_RAM_BUS_BASE + MAIN_RAM_SIZE
+
+	for offset = 0, chunkEnd - chunkStart - 4, 4 do
+		local index = base + offset
+		local value = bytes[index] + bytes[index + 1] * 0x100 + bytes[index + 2] * 0x10000 + bytes[index + 3] * 0x1000000
+		if value >= MAIN_RAM_BUS_BASE and value < ramEnd then
+			local pointer = value - MAIN_RAM_BUS_BASE
+			local addr = chunkStart + offset
+			-- 포인터 바로 뒤 MAX_POINTER_OFFSET 안에 기준 주소가 있는 대상만 확인 (2단계 대상이 많아도 워드당 이진 검색 한 번)
+			local targets = search.targets
+			for i = findPointerTarget(targets, pointer), #targets do
+				local target = targets[i]
+				local distance = target.base - pointer
+				if distance > MAX_POINTER_OFFSET then
+					break
+				end
+				if math.abs(addr - target.base) > MAX_POINTER_OFFSET then
+					local offsets = { distance }
+					for _, nextOffset in ipairs(target.offsets) do
+						table.insert(offsets, nextOffset)
+					end
+					table.insert(search.found, { base = addr, offsets = offsets })
+					if #search.found >= MAX_POINTER_PATHS then
+						break
+					end
+				end
+			end
+			-- 이번 단계 경로가 가득 차면 남은 메모리는 볼 필요 없음
+			if #search.found >= MAX_POINTER_PATHS then
+				chunkEnd = MAIN_RAM_SIZE
+				break
+			end
+		end
+	end
+
+	search.nextAddr = chunkEnd
+	if search.nextAddr < MAIN_RAM_SIZE then
+		return
+	end
+
+	-- 검색하는 동안 값이 바뀌었을 수 있으므로 지금도 맞는 경로만 남김
+	for _, path in ipairs(search.found) do
+		if resolvePointerPath(path) == search.slotAddr then
+			table.insert(search.paths, path)
+		end
+	end
+	print(string.format("포인터 %d단계 경로 %d개 발견", search.depth, #search.found))
+
+	if search.depth < MAX_POINTER_DEPTH and #search.found > 0 then
+		search.targets = sortPointerTargets(search.found)
+		search.depth = search.depth + 1
+		search.nextAddr = 0
+		search.found = {}
+		return
+	end
+
+	pointerSearch = nil
+	if search.slotAddr ~= FIRST_MOVE_SLOT_1P then
+		return  -- 검색 중에 주소가 바뀜 (다음 검증 때 다시 검색)
+	end
+	pointerPaths = search.paths
+	savePointerPaths()
+	writeGameInfo()
+	print(string.format("포인터 경로 검색 완료: %d개 저장", #pointerPaths))
 end
 
 -- ========================================
@@ -155,30 +823,132 @@ function getFirstMoveSlotAddress(player)
 	end
 end
 
-function touchScreen(x, y, frames)
+-- 이번 프레임 터치 입력 설정 (누르고 있는 동안 매 프레임 호출)
+function setTouch(x, y)
+	local to_set = {}
+	local to_set_axes = {}
+
+	to_set["Touch"] = true
+	to_set_axes["Touch X"] = x
+	to_set_axes["Touch Y"] = y
+
+	joypad.set(to_set)
+	joypad.setanalog(to_set_axes)
+end
+
+function waitFrames(frames)
 	for i = 1, frames do
-		local to_set = {}
-		local to_set_axes = {}
+		coroutine.yield()
+	end
+end
 
-		to_set["Touch"] = true
-		to_set_axes["Touch X"] = x
-		to_set_axes["Touch Y"] = y
+-- 기술 변경 후 화면 갱신용 터치 (좌측상단 두 번), yield 한 번 = 1프레임
+function touchSequence()
+	waitFrames(TOUCH_START_DELAY)
+	touchTapping = true
+
+	for tap = 1, TOUCH_TAP_COUNT do
+		if tap > 1 then
+			waitFrames(TOUCH_GAP_FRAMES)
+		end
+		for i = 1, TOUCH_HOLD_FRAMES do
+			setTouch(TOUCH_X, TOUCH_Y)
+			coroutine.yield()
+		end
+
+		-- 터치 완전 해제
+		client.clearautohold()
+		waitFrames(TOUCH_RELEASE_FRAMES)
+	end
+	print("터치 입력 완료")
+end
 
-		joypad.set(to_set)
-		joypad.setanalog(to_set_axes)
-		emu.frameadvance()
+-- 터치 입력 예약 (바로 반환, 실제 입력은 stepTouch가 프레임마다 진행)
+-- 아직 첫 터치 전이면 진행 중인 입력에 합치고, 터치 중이면 끝난 뒤 한 번 더 실행
+-- request: 터치 완료를 기록할 요청 (없으면 nil)
+function requestTouch(request)
+	-- 터치 입력이 비활성화되지 않은 경우에만 실행
+	if DISABLE_TOUCH then
+		print("터치 입력 비활성화됨")
+		traceEvent(request, "touch_done")
+		return
 	end
+	if touchJob and not touchTapping then
+		table.insert(touchRequests, request)
+		return
+	end
+	if touchJob then
+		table.insert(nextTouchRequests, request)
+		touchPending = true
+		return
+	end
+	touchTapping = false
+	touchRequests = { request }
+	touchJob = coroutine.create(touchSequence)
+end
 
-	-- 터치 완전 해제
-	client.clearautohold()
-	for i = 1, 10 do
-		emu.frameadvance()
+-- 터치 입력 한 프레임 진행 (mainLoop에서 호출)
+function stepTouch()
+	if not touchJob then
+		return
+	end
+	local ok, err = coroutine.resume(touchJob)
+	if not ok then
+		print("터치 입력 오류: " .. tostring(err))
+		client.clearautohold()
+	end
+	if coroutine.status(touchJob) == "dead" then
+		touchJob = nil
+		for _, request in ipairs(touchRequests) do
+			traceEvent(request, "touch_done")
+		end
+		touchRequests = {}
+		if touchPending then
+			touchPending = false
+			local waiting = nextTouchRequests
+			nextTouchRequests = {}
+			requestTouch(waiting[1])
+			for i = 2, #waiting do
+				table.insert(touchRequests, waiting[i])
+			end
+		end
 	end
 end
 
-function changeMove(player, moveIdStr)
-	local moveSlotAddr = getFirstMoveSlotAddress(player)
+-- 기술 여러 개를 같은 프레임에 기록한 뒤 터치 입력은 한 번만 예약
+--   writes: { {player = 1, slot = 0, moveId = 123}, ... } (slot은 0~3)
+-- 하나라도 잘못된 항목이 있으면 아무것도 쓰지 않음
+-- request: 명령 큐의 {session, seq} (단계 기록용, 없으면 nil)
+function applyMoveWrites(writes, request)
+	for _, write in ipairs(writes) do
+		if (write.player ~= 1 and write.player ~= 2) or write.slot < 0 or write.slot > 3
+				or write.moveId < 0 or write.moveId > MAX_MOVE_ID then
+			print(string.format("잘못된 기술 변경: %dP 슬롯 %d = %d", write.player, write.slot, write.moveId))
+			return false
+		end
+	end
+
+	-- 대전이 바뀌어 구조체가 옮겨졌으면 포인터 경로로 주소부터 갱신
+	followPointerPaths()
+
+	-- 기술 변경 (2바이트 리틀엔디안)
+	overlayRefresh = true
+	for _, write in ipairs(writes) do
+		local moveSlotAddr = getFirstMoveSlotAddress(write.player) + write.slot * 2
+		memory.write_u16_le(moveSlotAddr, write.moveId, "Main RAM")
+		print(string.format("%dP 기술 변경: 슬롯 %d = %d (0x%04X) at 0x%08X",
+			write.player, write.slot + 1, write.moveId, write.moveId, moveSlotAddr))
+	end
+
+	-- 직접 바꾼 기술은 감지 기준값에 반영 (바꾼 기술을 쓰면 PP 감소로 감지됨)
+	resyncMoveUsage()
 
+	traceEvent(request, "ram_write")
+	requestTouch(request)
+	return true
+end
+
+function changeMove(player, moveIdStr, request)
 	-- 문자열을 숫자로 변환
 	local moveId = tonumber(moveIdStr)
 	if not moveId then
@@ -186,39 +956,274 @@ function changeMove(player, moveIdStr)
 		return false
 	end
 
-	-- 기술 변경 (2바이트 리틀엔디안)
-	memory.write_u16_le(moveSlotAddr, moveId, "Main RAM")
-	print(string.format("%dP 기술 변경: %d (0x%04X) at 0x%08X", player, moveId, moveId, moveSlotAddr))
+	return applyMoveWrites({ { player = player, slot = 0, moveId = moveId } }, request)
+end
 
-	-- 터치 입력이 비활성화되지 않은 경우에만 실행
-	if not DISABLE_TOUCH then
-		-- 0.5초 대기 후 좌측상단 두번 클릭 (30프레임 = 0.5초)
-		for i = 1, 30 do
-			emu.frameadvance()
+-- "BATCH:1P:0=123,1=45;2P:0=77" -> writes 테이블 (형식이 틀리면 nil)
+function parseBatchCommand(command)
+	local body = command:match("^BATCH:(.+)$")
+	if not body then
+		return nil
+	end
+	local writes = {}
+	for group in body:gmatch("[^;]+") do
+		local player, slots = group:match("^(%d+)P:(.+)$")
+		if not player then
+			return nil
+		end
+		for item in slots:gmatch("[^,]+") do
+			local slot, moveId = item:match("^(%d+)=(%d+)$")
+			if not slot then
+				return nil
+			end
+			table.insert(writes, { player = tonumber(player), slot = tonumber(slot), moveId = tonumber(moveId) })
 		end
+	end
+	if #writes == 0 then
+		return nil
+	end
+	return writes
+end
 
-		-- 첫 번째 클릭 (좌측상단: 50, 50)
-		touchScreen(50, 50, 5)
+-- ========================================
+-- 기술 사용 감지
+-- ========================================
 
-		-- 0.5초 대기
-		for i = 1, 30 do
-			emu.frameadvance()
+-- 전투 포켓몬 구조체에서 포켓몬 번호, 기술 4개, PP 4개 읽기 (구조체가 아니면 nil)
+function readBattlerMoves(player)
+	local addr = getFirstMoveSlotAddress(player)
+	if not validateMoveSlotAddress(addr) then
+		return nil
+	end
+	local bytes, base = readBytes(addr - gameProfile.movesOffset, gameProfile.ppOffset + 4)
+	local snapshot = { addr = addr, species = bytes[base] + bytes[base + 1] * 256, moves = {}, pp = {} }
+	for k = 0, 3 do
+		local index = base + gameProfile.movesOffset + k * 2
+		snapshot.moves[k] = bytes[index] + bytes[index + 1] * 256
+		snapshot.pp[k] = bytes[base + gameProfile.ppOffset + k]
+	end
+	return snapshot
+end
+
+-- 기준값만 다시 읽음 (스크립트가 직접 기술을 바꾼 뒤 호출, 알림 없음)
+function resyncMoveUsage()
+	detectSnapshots[1] = readBattlerMoves(1)
+	detectSnapshots[2] = readBattlerMoves(2)
+end
+
+-- 이전에 읽은 값과 비교해 같은 기술의 PP가 1~2 줄었으면 "USED" 알림 (2는 상대 특성 프레셔)
+-- 포켓몬/주소/기술이 바뀐 슬롯은 비교하지 않고 기준값만 갱신
+function detectMoveUsage(player)
+	local previous = detectSnapshots[player]
+	local current = readBattlerMoves(player)
+	detectSnapshots[player] = current
+	if not previous or not current or previous.addr ~= current.addr or previous.species ~= current.species then
+		return
+	end
+	for k = 0, 3 do
+		local moveId = current.moves[k]
+		local used = previous.pp[k] - current.pp[k]
+		if moveId ~= 0 and moveId == previous.moves[k] and used >= 1 and used <= 2 then
+			print(string.format("%dP 기술 사용 감지: 슬롯 %d = %d", player, k + 1, moveId))
+			respond({ session = EVENT_SESSION, seq = 0 }, "USED", string.format("%dP:%d=%d", player, k, moveId))
 		end
+	end
+end
 
-		-- 두 번째 클릭
-		touchScreen(50, 50, 5)
+function unregisterPPWatch()
+	if ppWatchActive then
+		for player = 1, 2 do
+			for k = 0, 3 do
+				event.unregisterbyname(string.format("oneshot_pp_%d_%d", player, k))
+			end
+		end
+	end
+	ppWatchAddr = nil
+	ppWatchActive = false
+end
 
-		print("터치 입력 완료")
-	else
-		print("터치 입력 비활성화됨")
+-- 두 포켓몬의 PP 8바이트에 메모리 쓰기 콜백 등록 (콜백에서는 표시만 하고 비교는 mainLoop에서)
+-- 코어가 메모리 콜백을 지원하지 않으면 AUTO_DETECT_INTERVAL마다 폴링
+function registerPPWatch()
+	unregisterPPWatch()
+	ppWatchAddr = FIRST_MOVE_SLOT_1P
+	ppWriteDirty = true
+	if not (event and event.onmemorywrite) then
+		return
 	end
-	return true
+	local onWrite = function()
+		ppWriteDirty = true
+	end
+	ppWatchActive = true
+	for player = 1, 2 do
+		local ppAddr = getFirstMoveSlotAddress(player) - gameProfile.movesOffset + gameProfile.ppOffset
+		for k = 0, 3 do
+			local ok = pcall(event.onmemorywrite, onWrite, MAIN_RAM_BUS_BASE + ppAddr + k,
+				string.format("oneshot_pp_%d_%d", player, k))
+			if not ok then
+				unregisterPPWatch()
+				ppWatchAddr = FIRST_MOVE_SLOT_1P
+				print("메모리 쓰기 콜백을 사용할 수 없음 - PP 폴링으로 기술 사용 감지")
+				return
+			end
+		end
+	end
+end
+
+-- 기술 사용 감지 (mainLoop에서 호출)
+function checkMoveUsage()
+	if not AUTO_DETECT_ENABLED then
+		return
+	end
+	if ppWatchAddr ~= FIRST_MOVE_SLOT_1P then
+		registerPPWatch()
+	end
+	if ppWatchActive then
+		-- 구조체를 통째로 복사하는 경우 콜백이 안 올 수 있어 가끔은 그냥 읽음
+		if not ppWriteDirty and frameCounter % VALIDATE_INTERVAL ~= 0 then
+			return
+		end
+		ppWriteDirty = false
+	elseif frameCounter % AUTO_DETECT_INTERVAL ~= 0 then
+		return
+	end
+	detectMoveUsage(1)
+	detectMoveUsage(2)
+end
+
+function setAutoDetectEnabled(enabled)
+	AUTO_DETECT_ENABLED = enabled
+	unregisterPPWatch()
+	detectSnapshots = {}
+	print(enabled and "기술 사용 감지 켜짐" or "기술 사용 감지 꺼짐")
+	writeGameInfo()  -- Python이 설정과 다르면 다시 보내도록 현재 상태 기록
 end
 
 -- ========================================
 -- 명령 처리
 -- ========================================
 
+-- request: 명령 큐의 {session, seq} (응답을 보낼 곳, 이전 방식 명령이면 nil)
+function executeCommand(command, request)
+	-- SCAN 명령 처리: "SCAN:ID1,ID2,ID3,ID4" (끝에 ":WIDE"면 Main RAM 전체)
+	-- RESCAN 명령 처리: "RESCAN:ID1,ID2,ID3,ID4" (이전 후보만 다시 확인)
+	if command:match("^SCAN:") or command:match("^RESCAN:") then
+		local moves = {}
+		for id in command:gmatch("%d+") do
+			table.insert(moves, tonumber(id))
+		end
+
+		if #moves ~= 4 then
+			print("오류: SCAN 명령 형식이 잘못되었습니다")
+			respondScan(request, "ERROR", "INVALID_FORMAT")
+		elseif command:match("^RESCAN:") then
+			rescanCandidates(moves, request)
+		elseif command:match(":WIDE$") then
+			scanMemoryForMoves(moves, 0, MAIN_RAM_SIZE, request)
+		else
+			scanMemoryForMoves(moves, gameProfile.scanStart, gameProfile.scanEnd, request)
+		end
+
+	-- 주소 직접 지정: "SETADDR:0x002C6AEC" (후보 중 하나 선택)
+	elseif command:match("^SETADDR:") then
+		local addr = tonumber(command:match("^SETADDR:0[xX](%x+)$") or "", 16)
+		if addr then
+			setMoveSlotAddress(addr, "manual")
+			respondScan(request, "RESULT", string.format("0x%08X", addr))
+		else
+			respondScan(request, "ERROR", "INVALID_FORMAT")
+		end
+
+	-- 여러 슬롯/플레이어 한 번에 변경: "BATCH:1P:0=123,1=45;2P:0=77" (슬롯 0~3)
+	elseif command:match("^BATCH:") then
+		local writes = parseBatchCommand(command)
+		if not writes then
+			print("오류: BATCH 명령 형식이 잘못되었습니다: " .. command)
+			respond(request, "ERROR", "INVALID_FORMAT")
+		elseif applyMoveWrites(writes, request) then
+			print(string.format("기술 %d개 변경 완료", #writes))
+			respond(request, "DONE", command)
+		else
+			respond(request, "ERROR", "MOVE_FAILED")
+		end
+
+	-- 현재 기술 4개 읽기: "READMOVES" 또는 "READMOVES:2P" (스캔 다이얼로그 미리 채우기용)
+	elseif command:match("^READMOVES") then
+		local player = tonumber(command:match("^READMOVES:(%d)P$") or "1")
+		followPointerPaths()
+		local addr = getFirstMoveSlotAddress(player)
+		if not validateMoveSlotAddress(addr) then
+			respond(request, "ERROR", "INVALID_ADDRESS")
+		else
+			local moves = {}
+			for k = 0, 3 do
+				moves[k + 1] = memory.read_u16_le(addr + k * 2, "Main RAM")
+			end
+			respond(request, "RESULT", table.concat(moves, ","))
+		end
+
+	-- 포인터 경로 확인: "POINTERS" ("0x기준주소|0x오프셋,...;..." 또는 NO_POINTERS 오류)
+	-- "POINTERS:RESET"은 저장된 경로를 지우고 현재 주소가 검증되어 있으면 다시 검색
+	elseif command:match("^POINTERS") then
+		if command == "POINTERS:RESET" then
+			pointerSearch = nil
+			pointerPaths = {}
+			savePointerPaths()
+			if addressVerified then
+				startPointerSearch()
+			end
+			writeGameInfo()
+			respond(request, "DONE", command)
+		elseif #pointerPaths == 0 then
+			respond(request, "ERROR", pointerSearch and "SEARCHING" or "NO_POINTERS")
+		else
+			local parts = {}
+			for i, path in ipairs(pointerPaths) do
+				parts[i] = formatPointerPath(path)
+			end
+			respond(request, "RESULT", table.concat(parts, ";"))
+		end
+
+	-- 단계별 시각 기록 켜기/끄기: "TRACE:ON" (이전 기록 지움) 또는 "TRACE:OFF"
+	elseif command:match("^TRACE:") then
+		TRACE_ENABLED = command == "TRACE:ON"
+		if TRACE_ENABLED then
+			writeFile(TRACE_FILE, "")
+		end
+		respond(request, "DONE", command)
+
+	-- 화면 표시 켜기/끄기: "OVERLAY:ON" 또는 "OVERLAY:OFF"
+	elseif command:match("^OVERLAY:") then
+		setOverlayEnabled(command == "OVERLAY:ON")
+		respond(request, "DONE", command)
+
+	-- 기술 사용 감지 켜기/끄기: "AUTODETECT:ON" 또는 "AUTODETECT:OFF"
+	elseif command:match("^AUTODETECT:") then
+		setAutoDetectEnabled(command == "AUTODETECT:ON")
+		respond(request, "DONE", command)
+
+	-- 기존 기술 변경 명령: "1P:123" 또는 "2P:456"
+	elseif command:match("^%d+P:%d+$") then
+		local player, moveId = command:match("(%d+)P:(%d+)")
+
+		if player and moveId then
+			player = tonumber(player)
+			if changeMove(player, moveId, request) then
+				print(string.format("%dP 기술 변경 완료: %s", player, moveId))
+				respond(request, "DONE", command)
+			else
+				print(string.format("%dP 기술 변경 실패: %s", player, moveId))
+				respond(request, "ERROR", "MOVE_FAILED")
+			end
+		end
+
+	else
+		print("잘못된 명령 형식: " .. command)
+		respond(request, "ERROR", "UNKNOWN_COMMAND")
+	end
+end
+
+-- 이전 방식: command.txt 한 개 (외부 도구 호환용, command_queue.txt가 없을 때만 확인)
 function checkCommands()
 	if fileExists(COMMAND_FILE) then
 		local command = readFile(COMMAND_FILE)
@@ -226,47 +1231,179 @@ function checkCommands()
 			-- 개행문자 제거
 			command = command:gsub("[\r\n]", "")
 
-			-- SCAN 명령 처리: "SCAN:ID1,ID2,ID3,ID4"
-			if command:match("^SCAN:") then
-				local moves = {}
-				for id in command:gmatch("%d+") do
-					table.insert(moves, tonumber(id))
-				end
+			executeCommand(command)
 
-				if #moves == 4 then
-					scanMemoryForMoves(moves[1], moves[2], moves[3], moves[4])
-				else
-					print("오류: SCAN 명령 형식이 잘못되었습니다")
-					writeFile(RESULT_FILE, "ERROR:INVALID_FORMAT")
-				end
+			-- 명령 파일 삭제
+			deleteFile(COMMAND_FILE)
+		end
+	end
+end
 
-			-- 기존 기술 변경 명령: "1P:123" 또는 "2P:456"
-			elseif command:match("^%d+P:%d+$") then
-				local player, moveId = command:match("(%d+)P:(%d+)")
+-- ack.txt 로드 (스크립트를 다시 실행해도 처리한 명령을 반복하지 않도록)
+-- 한 줄 = "세션:seq" 또는 "세션:seq:추가seq,..." (seq까지는 빠짐없이 처리, 추가 seq는 그 이후 처리한 seq)
+function loadAcks()
+	local content = readFile(ACK_FILE)
+	if not content then
+		return
+	end
+	for line in content:gmatch("[^\n]+") do
+		local session, seq, extras = line:match("^(%w+):(%d+):?([%d,]*)")
+		if session then
+			sessionSeqs[session] = tonumber(seq)
+			sessionExtras[session] = {}
+			for extra in extras:gmatch("%d+") do
+				sessionExtras[session][tonumber(extra)] = true
+			end
+			table.insert(sessionOrder, session)
+		end
+	end
+end
 
-				if player and moveId then
-					player = tonumber(player)
-					if changeMove(player, moveId) then
-						print(string.format("%dP 기술 변경 완료: %s", player, moveId))
-					else
-						print(string.format("%dP 기술 변경 실패: %s", player, moveId))
-					end
-				end
+function writeAcks()
+	local lines = {}
+	for _, session in ipairs(sessionOrder) do
+		local extras = {}
+		for seq in pairs(sessionExtras[session] or {}) do
+			table.insert(extras, seq)
+		end
+		local line = session .. ":" .. sessionSeqs[session]
+		if #extras > 0 then
+			table.sort(extras)
+			line = line .. ":" .. table.concat(extras, ",")
+		end
+		table.insert(lines, line)
+	end
+	writeFile(ACK_FILE, table.concat(lines, "\n") .. "\n")
+end
+
+function isProcessed(session, seq)
+	if seq <= (sessionSeqs[session] or 0) then
+		return true
+	end
+	return sessionExtras[session] ~= nil and sessionExtras[session][seq] == true
+end
 
+-- 앞 seq가 빠진 채 처리한 seq도 따로 기억해 두어, 빠진 seq를 나중에 다시 보내면 실행되게 함
+function markProcessed(session, seq)
+	local low = sessionSeqs[session] or 0
+	local extras = sessionExtras[session] or {}
+	extras[seq] = true
+	while true do
+		while extras[low + 1] do
+			low = low + 1
+			extras[low] = nil
+		end
+		local count, lowest = 0, nil
+		for extra in pairs(extras) do
+			count = count + 1
+			if not lowest or extra < lowest then
+				lowest = extra
+			end
+		end
+		if count <= MAX_ACK_EXTRAS then
+			break
+		end
+		-- 빠진 seq가 끝내 오지 않음: 가장 작은 추가 seq까지 처리한 것으로 간주
+		low = lowest
+		extras[lowest] = nil
+	end
+	sessionSeqs[session] = low
+	sessionExtras[session] = extras
+	for i, name in ipairs(sessionOrder) do
+		if name == session then
+			table.remove(sessionOrder, i)
+			break
+		end
+	end
+	table.insert(sessionOrder, 1, session)
+	writeAcks()
+end
+
+-- 오래된 세션의 ack 정리 (명령 큐를 비운 뒤에만: 큐에 그 세션의 줄이 남아 있으면 다시 실행되므로)
+function evictAckSessions()
+	if #sessionOrder <= MAX_ACK_SESSIONS then
+		return
+	end
+	while #sessionOrder > MAX_ACK_SESSIONS do
+		local removed = table.remove(sessionOrder)
+		sessionSeqs[removed] = nil
+		sessionExtras[removed] = nil
+	end
+	writeAcks()
+end
+
+-- 명령 큐: "세션|seq|명령" 줄을 순서대로 한 번씩만 실행
+function checkCommandQueue()
+	local file = io.open(COMMAND_QUEUE_FILE, "r")
+	if not file then
+		return
+	end
+	local size = file:seek("end")
+	if size == lastQueueSize then
+		file:close()
+		return
+	end
+	file:seek("set", 0)
+	local content = file:read("*all")
+	file:close()
+
+	for line in content:gmatch("([^\n]*)\n") do
+		-- "세션|seq|명령" 또는 "세션|seq@기한|명령" (기한 = Unix 시각 초, 지나면 실행하지 않음)
+		local session, seq, deadline, command = line:match("^(%w+)|(%d+)@?(%d*)|(.-)\r?$")
+		seq = tonumber(seq)
+		if session and not isProcessed(session, seq) then
+			local request = { session = session, seq = seq }
+			if deadline ~= "" and os.time() > tonumber(deadline) then
+				respond(request, "ERROR", "EXPIRED")
 			else
-				print("잘못된 명령 형식: " .. command)
+				traceEvent(request, "pickup")
+				executeCommand(command, request)
 			end
+			markProcessed(session, seq)
+		end
+	end
 
-			-- 명령 파일 삭제
-			deleteFile(COMMAND_FILE)
+	-- 마지막 줄을 쓰는 중이면 다음 폴링에서 다시 읽음
+	if content == "" or content:sub(-1) == "\n" then
+		lastQueueSize = size
+		-- 세션이 많이 쌓여도 비움 (오래된 세션의 ack는 큐를 비운 뒤에만 정리할 수 있음)
+		if size >= QUEUE_ROTATE_SIZE or #sessionOrder > MAX_ACK_SESSIONS then
+			rotateCommandQueue(size)
 		end
 	end
 end
 
+-- 모두 처리한 명령 큐 비우기 (읽은 뒤 새 줄이 추가되지 않았을 때만)
+function rotateCommandQueue(size)
+	local file = io.open(COMMAND_QUEUE_FILE, "r")
+	if not file then
+		return
+	end
+	local currentSize = file:seek("end")
+	file:close()
+	if currentSize == size then
+		writeFile(COMMAND_QUEUE_FILE, "")
+		lastQueueSize = 0
+		evictAckSessions()
+	end
+end
+
 function mainLoop()
 	frameCounter = frameCounter + 1
 
-	if frameCounter % POLLING_INTERVAL == 0 then
+	rotateResponseLog()
+	stepTouch()
+	stepScan()
+	stepPointerSearch()
+	checkAddressValidation()
+	checkMoveUsage()
+
+	if frameCounter % QUEUE_POLLING_INTERVAL == 0 then
+		checkCommandQueue()
+	end
+
+	-- 명령 큐를 쓰는 프로그램이 한 번이라도 있었으면 이전 방식 파일은 확인하지 않음
+	if lastQueueSize < 0 and frameCounter % POLLING_INTERVAL == 0 then
 		checkCommands()
 	end
 end
@@ -284,44 +1421,106 @@ function initialize()
 	-- 디렉토리 생성
 	os.execute("mkdir lua_interface 2>nul")
 
-	-- 메모리 설정 로드
-	loadMemoryConfig()
+	-- 게임 감지 후 주소 결정 (롬별 캐시가 있으면 스캔 불필요)
+	detectGame()
+	resolveAddress()
+
+	-- 처리한 명령 기록 로드
+	loadAcks()
+	responseSize = #(readFile(RESPONSE_FILE) or "")
 
 	print("첫 번째 포켓몬의 첫 번째 기술 슬롯을 변경합니다")
 	print("초기화 완료 - 명령 대기 중...")
 	print("==============================================")
 end
 
-function watchMemory()
-	local moveAddr1P = getFirstMoveSlotAddress(1)
-	local moveAddr2P = getFirstMoveSlotAddress(2)
-	local currentMove1P = memory.read_u16_le(moveAddr1P, "Main RAM")
-	local currentMove2P = memory.read_u16_le(moveAddr2P, "Main RAM")
+function setOverlayEnabled(enabled)
+	OVERLAY_ENABLED = enabled
+	overlayValues = {}
+	overlayRefresh = true
+	if not enabled and gui.cleartext then
+		gui.cleartext()
+	end
+	print(enabled and "화면 표시 켜짐" or "화면 표시 꺼짐")
+end
 
-	local y = 10
+-- 현재 작업 상태 (파일 확인 없이 스크립트 안의 상태로 판단)
+function overlayStatus()
+	if activeScan then
+		local progress = math.floor((activeScan.nextAddr - activeScan.rangeStart) * 100
+			/ (activeScan.rangeEnd - activeScan.rangeStart))
+		return string.format("Status: Scanning %d%%", progress), "green"
+	elseif pointerSearch then
+		return string.format("Status: Pointer Search %d/%d %d%%", pointerSearch.depth, MAX_POINTER_DEPTH,
+			math.floor(pointerSearch.nextAddr * 100 / MAIN_RAM_SIZE)), "green"
+	elseif touchJob then
+		return "Status: Touch Input", "green"
+	end
+	return "Status: Waiting for Command", "white"
+end
 
-	-- 설정 상태 표시
-	if addressConfigLoaded then
-		gui.text(10, y, "Memory Config: Loaded", "lime")
-	else
-		gui.text(10, y, "Memory Config: Default", "yellow")
+-- 표시할 값이 바뀌었으면 줄 캐시를 다시 만듦
+-- 기술 값은 OVERLAY_REFRESH_INTERVAL마다 (또는 기술 변경/주소 변경 직후) 다시 읽음
+function updateOverlay()
+	local values = overlayValues
+	local changed = false
+
+	if overlayRefresh or frameCounter % OVERLAY_REFRESH_INTERVAL == 0
+			or values.addr1P ~= FIRST_MOVE_SLOT_1P or values.addr2P ~= FIRST_MOVE_SLOT_2P then
+		overlayRefresh = false
+		local move1P = memory.read_u16_le(FIRST_MOVE_SLOT_1P, "Main RAM")
+		local move2P = memory.read_u16_le(FIRST_MOVE_SLOT_2P, "Main RAM")
+		if values.move1P ~= move1P or values.move2P ~= move2P
+				or values.addr1P ~= FIRST_MOVE_SLOT_1P or values.addr2P ~= FIRST_MOVE_SLOT_2P then
+			values.move1P, values.move2P = move1P, move2P
+			values.addr1P, values.addr2P = FIRST_MOVE_SLOT_1P, FIRST_MOVE_SLOT_2P
+			changed = true
+		end
+	end
+
+	local configState = addressVerified and "verified" or (addressConfigLoaded and "loaded" or "default")
+	if values.configState ~= configState or values.source ~= addressSource or values.game ~= gameProfile.name then
+		values.configState, values.source, values.game = configState, addressSource, gameProfile.name
+		changed = true
 	end
-	y = y + 20
 
-	gui.text(10, y, string.format("1P Move Addr: 0x%08X", moveAddr1P), "white")
-	y = y + 20
-	gui.text(10, y, string.format("1P Current Move: %d (0x%04X)", currentMove1P, currentMove1P), "white")
-	y = y + 20
-	gui.text(10, y, string.format("2P Move Addr: 0x%08X", moveAddr2P), "white")
-	y = y + 20
-	gui.text(10, y, string.format("2P Current Move: %d (0x%04X)", currentMove2P, currentMove2P), "white")
-	y = y + 20
+	local status, statusColor = overlayStatus()
+	if values.status ~= status then
+		values.status, values.statusColor = status, statusColor
+		changed = true
+	end
 
-	-- 명령 대기 상태 표시
-	if fileExists(COMMAND_FILE) then
-		gui.text(10, y, "Status: Command Pending", "green")
+	if not changed then
+		return
+	end
+
+	local lines = {}
+	table.insert(lines, { string.format("Game: %s (%s)", gameProfile.name, gameCode), "white" })
+	-- 설정 상태 표시
+	if configState == "verified" then
+		table.insert(lines, { "Memory Config: Verified (" .. addressSource .. ")", "lime" })
+	elseif configState == "loaded" then
+		table.insert(lines, { "Memory Config: Loaded (" .. addressSource .. ")", "lime" })
 	else
-		gui.text(10, y, "Status: Waiting for Command", "white")
+		table.insert(lines, { "Memory Config: Default", "yellow" })
+	end
+	table.insert(lines, { string.format("1P Move Addr: 0x%08X", values.addr1P), "white" })
+	table.insert(lines, { string.format("1P Current Move: %d (0x%04X)", values.move1P, values.move1P), "white" })
+	table.insert(lines, { string.format("2P Move Addr: 0x%08X", values.addr2P), "white" })
+	table.insert(lines, { string.format("2P Current Move: %d (0x%04X)", values.move2P, values.move2P), "white" })
+	-- 명령 처리 상태 표시
+	table.insert(lines, { values.status, values.statusColor })
+	overlayLines = lines
+end
+
+-- 화면 표시 (BizHawk는 gui.text를 매 프레임 지우므로 캐시된 줄을 다시 그림)
+function watchMemory()
+	if not OVERLAY_ENABLED then
+		return
+	end
+	updateOverlay()
+	for i, line in ipairs(overlayLines) do
+		gui.text(10, 10 + (i - 1) * 20, line[1], line[2])
 	end
 end
 
@@ -0,0 +1,127 @@
+import csv
+import json
+
+import pytest
+
+import challenge_core
+from challenge_core import ActionTracer, percentile
+
+
+def test_percentile_nearest_rank():
+    values = list(range(1, 101))
+    assert percentile(values, 0.50) == 50
+    assert percentile(values, 0.95) == 95
+    assert percentile(values, 0.99) == 99
+    assert percentile(values, 1.0) == 100
+    assert percentile(values, 0.0) == 1
+    assert percentile([7.5], 0.99) == 7.5
+    assert percentile([1, 2, 3], 0.5) == 2
+    assert percentile([], 0.5) is None
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(challenge_core.time, "perf_counter", lambda: now[0])
+    return now
+
+
+def record_action(tracer, clock, seq, start):
+    """클릭 → 상태 변경(1ms) → 명령 전송(1ms) → 파일 쓰기(1ms), UI 갱신(3ms), 응답 20ms 뒤"""
+    clock[0] = start
+    tracer.begin(f"use {seq}")
+    for stage, offset in (("state", 0.001), ("send", 0.002), ("ui", 0.005)):
+        clock[0] = start + offset
+        tracer.mark(stage)
+    tracer.bind(seq)
+    tracer.mark_seq(seq, "written", start + 0.003)
+    tracer.mark_seq(seq, "response", start + 0.020)
+    tracer.end()
+
+
+def make_tracer(tmp_path, clock, seqs=(5,)):
+    trace_file = tmp_path / "trace.txt"
+    lines = []
+    for seq in seqs:
+        # Lua 읽기 → RAM 쓰기 2ms, RAM 쓰기 → 터치 완료 58ms(4프레임)
+        lines += [f"abcd|{seq}|pickup|100|500.0", f"abcd|{seq}|ram_write|100|502.0",
+                  f"abcd|{seq}|touch_done|104|560.0", f"other|{seq}|pickup|1|1.0"]
+    trace_file.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+    tracer = ActionTracer(str(trace_file), "abcd")
+    tracer.enabled = True
+    for i, seq in enumerate(seqs):
+        record_action(tracer, clock, seq, 1.0 + i)
+    tracer.load_lua_trace()
+    return tracer
+
+
+def test_disabled_tracer_records_nothing(tmp_path, clock):
+    tracer = ActionTracer(str(tmp_path / "trace.txt"), "abcd")
+    record_action(tracer, clock, 1, 1.0)
+    assert tracer.actions == [] and tracer.by_seq == {}
+
+
+def test_durations_per_stage(tmp_path, clock):
+    tracer = make_tracer(tmp_path, clock)
+    durations = tracer.durations(tracer.actions[0])
+    assert durations == pytest.approx({
+        "click_to_state": 1.0, "state_to_send": 1.0, "ui_refresh": 3.0, "file_write": 1.0,
+        "lua_write": 2.0, "pickup_wait": 15.0, "touch": 58.0, "total": 78.0,
+    })
+
+
+def test_summary_uses_percentiles(tmp_path, clock):
+    tracer = make_tracer(tmp_path, clock, seqs=(1, 2, 3))
+    rows = {row[0]: row[1:] for row in tracer.summary()}
+    count, p50, p95, p99, maximum = rows["전체 (클릭 → 터치 완료)"]
+    assert count == 3
+    assert (p50, p95, p99, maximum) == pytest.approx((78.0, 78.0, 78.0, 78.0))
+
+
+def test_max_actions_drops_oldest(tmp_path, clock):
+    tracer = ActionTracer(str(tmp_path / "trace.txt"), "abcd", max_actions=2)
+    tracer.enabled = True
+    for seq in (1, 2, 3):
+        record_action(tracer, clock, seq, float(seq))
+    assert [action["seq"] for action in tracer.actions] == [2, 3]
+    assert sorted(tracer.by_seq) == [2, 3]
+
+
+def test_export_csv(tmp_path, clock):
+    tracer = make_tracer(tmp_path, clock)
+    tracer.actions.append({"name": "unbound", "seq": None, "gui": {"click": 9.0}, "lua": {}})
+    path = tmp_path / "trace.csv"
+    tracer.export_csv(str(path))
+
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert list(rows[0]) == ["name", "seq"] + [key for key, _ in ActionTracer.STAGES] + ["touch_frames"]
+    assert rows[0]["name"] == "use 5" and rows[0]["seq"] == "5"
+    assert rows[0]["pickup_wait"] == "15.000"
+    assert rows[0]["total"] == "78.000"
+    assert rows[0]["touch_frames"] == "4"
+    # 기록이 없는 단계는 빈 칸
+    assert rows[1]["total"] == "" and rows[1]["touch_frames"] == ""
+
+
+def test_export_chrome_trace(tmp_path, clock):
+    tracer = make_tracer(tmp_path, clock)
+    path = tmp_path / "trace.json"
+    tracer.export_chrome_trace(str(path))
+
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    spans = {event["name"]: event for event in data["traceEvents"] if event["ph"] == "X"}
+    assert data["displayTimeUnit"] == "ms"
+    assert {event["args"]["name"] for event in data["traceEvents"] if event["ph"] == "M"} == {"GUI", "Lua"}
+
+    # GUI 단계는 첫 클릭 기준 마이크로초
+    assert (spans["상태 변경"]["ts"], spans["상태 변경"]["dur"]) == pytest.approx((0, 1000))
+    assert (spans["명령 파일 쓰기"]["ts"], spans["명령 파일 쓰기"]["dur"]) == pytest.approx((2000, 1000))
+    # Lua 단계는 RAM 쓰기 완료를 응답 도착 시각(20ms)에 맞춤
+    assert spans["RAM 쓰기"]["pid"] == 2
+    assert (spans["RAM 쓰기"]["ts"], spans["RAM 쓰기"]["dur"]) == pytest.approx((18000, 2000))
+    assert (spans["Lua 읽기 대기 (추정)"]["ts"], spans["Lua 읽기 대기 (추정)"]["dur"]) == pytest.approx((3000, 15000))
+    assert (spans["터치 입력"]["ts"], spans["터치 입력"]["dur"]) == pytest.approx((20000, 58000))
+    assert spans["터치 입력"]["args"] == {"action": "use 5", "seq": 5}
@@ -0,0 +1,236 @@
+import configparser
+import json
+import os
+import shutil
+
+import pytest
+
+import challenge_core
+from challenge_core import ChallengeJournal, ChallengeSession, JournalLockedError, SaveWorker
+
+CSV_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "pokemon_moves.csv")
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / "pokemon_moves.csv"
+    shutil.copy(CSV_PATH, path)
+    return str(path)
+
+
+@pytest.fixture
+def save_path(tmp_path):
+    return str(tmp_path / "saves" / "challenge.json")
+
+
+def open_session(csv_path, save_path=None, compact_every=50):
+    config = configparser.ConfigParser()
+    config['Save'] = {'journal_enabled': 'true', 'journal_compact_every': str(compact_every)}
+    session = ChallengeSession(config)
+    session.load_moves(csv_path)
+    if save_path and os.path.exists(save_path):
+        session.load(save_path)
+    return session
+
+
+def save_as(session, save_path):
+    # GUI의 "다른 이름으로 저장"과 같이 저장 후 현재 세이브 파일로 지정
+    session.save(save_path)
+    session.current_save_file = save_path
+
+
+def use(session, *move_ids):
+    session.use_moves([(1, 0, move_id) for move_id in move_ids])
+
+
+def history_ids(session):
+    return [record["id"] for record in session.move_history]
+
+
+def journal_seqs(save_path):
+    with open(save_path + ChallengeJournal.SUFFIX, encoding='utf-8') as f:
+        return [json.loads(line)["seq"] for line in f]
+
+
+def test_replay_records_after_snapshot(csv_path, save_path):
+    session = open_session(csv_path)
+    save_as(session, save_path)
+    use(session, 10, 11)
+    session.close_journal()
+
+    session = open_session(csv_path, save_path)
+    assert history_ids(session) == [10, 11]
+    assert 10 in session.used_moves and 11 in session.used_moves
+    assert len(session.used_moves) == 2
+    assert session.journal.seq == 2
+    assert session.dirty
+
+
+def test_replay_reset(csv_path, save_path):
+    session = open_session(csv_path)
+    use(session, 1)
+    save_as(session, save_path)
+    use(session, 10)
+    session.reset()
+    use(session, 11)
+    session.close_journal()
+
+    session = open_session(csv_path, save_path)
+    assert history_ids(session) == [11]
+    assert len(session.used_moves) == 1
+
+
+def test_records_already_in_snapshot_are_not_replayed(csv_path, save_path):
+    session = open_session(csv_path)
+    save_as(session, save_path)
+    use(session, 10, 11)
+    save_as(session, save_path)
+    session.close_journal()
+
+    # 스냅샷 저장 후 저널 정리 전에 종료된 경우: 이미 반영된 기록이 저널에 남아 있음
+    with open(save_path + ChallengeJournal.SUFFIX, 'w', encoding='utf-8') as f:
+        for seq, move_id in ((1, 10), (2, 11)):
+            f.write(json.dumps({"seq": seq, "op": "use", "id": move_id, "timestamp": "t"}) + "\n")
+
+    session = open_session(csv_path, save_path)
+    assert history_ids(session) == [10, 11]
+    assert not session.dirty
+
+
+def test_compaction_keeps_only_records_after_snapshot(csv_path, save_path):
+    session = open_session(csv_path, compact_every=3)
+    save_as(session, save_path)
+    use(session, 10, 11, 12)
+    assert session.journal.pending == 0
+    assert journal_seqs(save_path) == []
+    with open(save_path, encoding='utf-8') as f:
+        assert json.load(f)["journal_seq"] == 3
+
+    use(session, 13, 14)
+    assert journal_seqs(save_path) == [4, 5]
+    session.close_journal()
+
+    session = open_session(csv_path, save_path, compact_every=3)
+    assert history_ids(session) == [10, 11, 12, 13, 14]
+    use(session, 15)
+    assert journal_seqs(save_path) == []
+    session.close_journal()
+
+    session = open_session(csv_path, save_path)
+    assert history_ids(session) == [10, 11, 12, 13, 14, 15]
+
+
+def test_torn_last_line_then_more_appends(csv_path, save_path):
+    session = open_session(csv_path)
+    save_as(session, save_path)
+    use(session, 10, 11)
+    session.close_journal()
+
+    # 기록 도중 종료되어 마지막 줄이 끊긴 상태
+    with open(save_path + ChallengeJournal.SUFFIX, 'a', encoding='utf-8') as f:
+        f.write('{"seq": 3, "op": "use", "id')
+
+    session = open_session(csv_path, save_path)
+    assert history_ids(session) == [10, 11]
+    use(session, 12, 13)
+    session.close_journal()
+    assert journal_seqs(save_path) == [1, 2, 3, 4]
+
+    session = open_session(csv_path, save_path)
+    assert history_ids(session) == [10, 11, 12, 13]
+    assert session.journal.seq == 4
+
+
+def test_read_records_skips_unreadable_line(save_path):
+    os.makedirs(os.path.dirname(save_path))
+    with open(save_path + ChallengeJournal.SUFFIX, 'w', encoding='utf-8') as f:
+        f.write('{"seq": 1, "op": "use", "id": 10}\n')
+        f.write('{"seq": 2, "op": "use", "id\n')
+        f.write('{"seq": 3, "op": "use", "id": 12}\n')
+
+    assert [record["seq"] for record in ChallengeJournal.read_records(save_path)] == [1, 3]
+    assert [record["seq"] for record in ChallengeJournal.read_records(save_path, after_seq=1)] == [3]
+
+
+def test_second_writer_is_refused(csv_path, save_path):
+    gui = open_session(csv_path)
+    save_as(gui, save_path)
+    use(gui, 10)
+
+    # GUI가 저널을 열고 있는 동안 다른 세션(CLI use)은 저널을 열 수 없고 상태도 바뀌지 않음
+    cli = open_session(csv_path)
+    with pytest.raises(JournalLockedError):
+        cli.load(save_path)
+    assert cli.journal is None and cli.current_save_file is None
+    assert len(cli.used_moves) == 0
+    with pytest.raises(JournalLockedError):
+        cli.save(save_path)
+
+    # 읽기 전용 로드(CLI status/export)는 가능
+    cli.load(save_path, open_journal=False)
+    assert history_ids(cli) == [10]
+    assert cli.journal is None
+
+    # GUI가 정리해도 CLI가 끼워 넣은 기록은 없음, 닫은 뒤에는 CLI가 열 수 있음
+    use(gui, 11)
+    gui.save(save_path)
+    gui.close_journal()
+    cli = open_session(csv_path, save_path)
+    use(cli, 12)
+    cli.close_journal()
+    assert history_ids(open_session(csv_path, save_path)) == [10, 11, 12]
+
+
+def test_reload_same_file_keeps_own_lock(csv_path, save_path):
+    session = open_session(csv_path)
+    save_as(session, save_path)
+    use(session, 10)
+    session.load(save_path)
+    use(session, 11)
+    assert history_ids(session) == [10, 11]
+    session.close_journal()
+    assert history_ids(open_session(csv_path, save_path)) == [10, 11]
+
+
+def test_dirty_kept_when_save_fails(csv_path, save_path, monkeypatch):
+    session = open_session(csv_path)
+    save_as(session, save_path)
+    use(session, 10)
+    assert session.dirty
+
+    def fail(*args):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(challenge_core, "write_save_file", fail)
+    with pytest.raises(OSError):
+        session.save(save_path)
+    assert session.dirty
+
+    monkeypatch.undo()
+    session.save(save_path)
+    assert not session.dirty
+    session.close_journal()
+
+
+def test_dirty_cleared_only_by_successful_worker_result(csv_path, save_path):
+    session = open_session(csv_path)
+    save_as(session, save_path)
+    session.save_worker = SaveWorker()
+    try:
+        use(session, 10)
+        session.save(save_path)
+        assert session.dirty  # 요청만 한 상태
+
+        file_path, journal_seq, _, error, _ = session.save_worker.results.get(timeout=5)
+        assert error is None
+        use(session, 11)  # 저장 중에 바뀜
+        session.finish_save(file_path, journal_seq)
+        assert session.dirty
+
+        session.save(save_path)
+        file_path, journal_seq, _, error, _ = session.save_worker.results.get(timeout=5)
+        session.finish_save(file_path, journal_seq)
+        assert not session.dirty
+    finally:
+        session.save_worker.stop()
+        session.close_journal()
@@ -0,0 +1,175 @@
+import os
+import queue
+import time
+
+import pytest
+
+from challenge_core import LuaCommandChannel, LuaResponseWatcher, LuaSessionFile
+from mock_lua_endpoint import MockLuaEndpoint
+
+
+@pytest.fixture
+def channel(tmp_path):
+    channel = LuaCommandChannel(str(tmp_path), resend_timeout=1.0)
+    yield channel
+    channel.stop()
+
+
+def write_ack(channel, text):
+    with open(channel.ack_file, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+
+def queue_lines(channel, count, timeout=2.0):
+    """쓰기 스레드가 명령 count줄을 쓸 때까지 대기"""
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if os.path.exists(channel.queue_file):
+            with open(channel.queue_file, encoding='utf-8') as f:
+                lines = f.read().splitlines()
+            if len(lines) >= count:
+                return lines
+        time.sleep(0.005)
+    raise AssertionError("명령이 큐에 기록되지 않음")
+
+
+def age(channel, seq, seconds):
+    channel.pending[seq][1] = time.perf_counter() - seconds
+
+
+def test_skipped_seq_is_not_treated_as_acked(channel):
+    for _ in range(3):
+        channel.send("OVERLAY:ON")
+    write_ack(channel, f"other:9\n{channel.session}:1:3\n")
+
+    assert channel.poll_acks() == [1, 3]
+    assert list(channel.pending) == [2]
+
+    write_ack(channel, f"{channel.session}:3\n")
+    assert channel.poll_acks() == [2]
+    assert not channel.pending
+
+
+def test_resend_backs_off_then_gives_up(channel):
+    results = []
+    seq = channel.send("OVERLAY:ON", callback=lambda seq, kind, payload: results.append((kind, payload)))
+
+    for tries in range(LuaCommandChannel.MAX_RESENDS):
+        # 대기 시간이 resend_timeout * 2**재전송 횟수를 넘어야 다시 보냄
+        age(channel, seq, 2 ** tries * 0.9)
+        channel.poll_acks()
+        assert channel.pending[seq][2] == tries
+        age(channel, seq, 2 ** tries * 1.1)
+        channel.poll_acks()
+        assert channel.pending[seq][2] == tries + 1
+    assert len(queue_lines(channel, 1 + LuaCommandChannel.MAX_RESENDS)) == 1 + LuaCommandChannel.MAX_RESENDS
+
+    age(channel, seq, 2 ** LuaCommandChannel.MAX_RESENDS * 1.1)
+    assert channel.poll_acks() == []
+    assert not channel.pending
+    assert results == [("ERROR", "NO_ACK")]
+    assert seq not in channel.callbacks
+
+
+def test_lost_write_is_executed_when_resent(channel, tmp_path):
+    endpoint = MockLuaEndpoint(str(tmp_path))
+    for _ in range(3):
+        channel.send("OVERLAY:ON")
+    lines = queue_lines(channel, 3)
+
+    # 2번 명령 쓰기가 실패한 상황
+    with open(channel.queue_file, 'w', encoding='utf-8') as f:
+        f.write(lines[0] + "\n" + lines[2] + "\n")
+    endpoint.check_command_queue()
+    assert channel.poll_acks() == [1, 3]
+
+    age(channel, 2, 1.1)
+    channel.poll_acks()
+    queue_lines(channel, 3)
+    endpoint.check_command_queue()
+    assert channel.poll_acks() == [2]
+    assert endpoint.executed[(channel.session, 2)] == 1
+    assert endpoint.executed[(channel.session, 3)] == 1
+
+
+def test_expired_command_is_dropped_instead_of_resent(channel, tmp_path):
+    results = []
+    seq = channel.send("READMOVES", callback=lambda seq, kind, payload: results.append((kind, payload)), ttl=10.0)
+    line = queue_lines(channel, 1)[0]
+    assert line.startswith(f"{channel.session}|{seq}@")
+
+    channel.pending[seq][3] = int(time.time()) - 1
+    age(channel, seq, 1.1)
+    assert channel.poll_acks() == []
+    assert not channel.pending
+    assert results == [("ERROR", "EXPIRED")]
+    assert len(queue_lines(channel, 1)) == 1
+
+    # Lua가 늦게 켜져도 기한이 지난 명령은 실행하지 않고 처리한 것으로만 기록
+    endpoint = MockLuaEndpoint(str(tmp_path))
+    with open(channel.queue_file, 'w', encoding='utf-8') as f:
+        f.write(f"{channel.session}|{seq}@{int(time.time()) - 1}|READMOVES\n")
+    endpoint.check_command_queue()
+    assert not endpoint.executed
+    assert endpoint.session_seqs[channel.session] == seq
+
+
+def read_responses(watcher, count, timeout=2.0):
+    responses = []
+    deadline = time.perf_counter() + timeout
+    while len(responses) < count and time.perf_counter() < deadline:
+        try:
+            responses.append(watcher.responses.get(timeout=0.05))
+        except queue.Empty:
+            pass
+    return responses
+
+
+def test_watcher_does_not_redeliver_after_trim(tmp_path):
+    path = tmp_path / "response.txt"
+    path.write_text("", encoding="utf-8")
+    watcher = LuaResponseWatcher(str(path), "abcd", poll_interval=0.005)
+    try:
+        lines = [f"abcd|{seq}|DONE|\n" for seq in range(1, 6)]
+        with open(path, 'a', encoding='utf-8') as f:
+            f.writelines(lines)
+        assert [seq for seq, _, _ in read_responses(watcher, 5)] == [1, 2, 3, 4, 5]
+
+        # Lua가 최근 두 줄만 남기고 새 응답을 추가
+        path.write_text("".join(lines[-2:]) + "abcd|6|DONE|\n*|0|USED|1P:0=33\n", encoding="utf-8")
+        assert read_responses(watcher, 3, timeout=0.5) == [(6, "DONE", ""), (0, "USED", "1P:0=33")]
+    finally:
+        watcher.stop()
+
+
+def test_many_sessions_do_not_replay_old_commands(tmp_path):
+    # 핫키로 CLI를 여러 번 실행한 경우처럼 세션마다 명령 하나씩
+    endpoint = MockLuaEndpoint(str(tmp_path))
+    for i in range(1, 41):
+        with open(endpoint.queue_file, 'a', encoding='utf-8') as f:
+            f.write(f"s{i:04d}|1|SETMOVE:1:{i}\n")
+        endpoint.check_command_queue()
+
+    assert len(endpoint.executed) == 40
+    assert set(endpoint.executed.values()) == {1}
+    assert len(endpoint.session_seqs) <= 16
+
+
+def test_session_file_keeps_session_across_runs(tmp_path):
+    path = str(tmp_path / "cli_session.txt")
+    session_file = LuaSessionFile(path)
+    session, seq = session_file.acquire()
+    assert seq == 0
+
+    # 사용 중에는 다른 프로세스(다른 실행)가 같은 세션을 쓰지 않음
+    assert LuaSessionFile(path).acquire() is None
+    session_file.release(session, 3)
+
+    assert LuaSessionFile(path).acquire() == (session, 3)
+
+
+def test_session_file_ignores_broken_content(tmp_path):
+    path = tmp_path / "cli_session.txt"
+    path.write_text("??:x\n", encoding="utf-8")
+    session, seq = LuaSessionFile(str(path)).acquire()
+    assert session.isalnum() and seq == 0
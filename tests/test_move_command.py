@@ -0,0 +1,39 @@
+import pytest
+
+from challenge_core import format_move_command
+from mock_lua_endpoint import PLAYER2_OFFSET, MockLuaEndpoint
+
+
+def test_first_slot_single_write_uses_legacy_form():
+    assert format_move_command([(1, 0, 123)]) == "1P:123"
+    assert format_move_command([(2, 0, 7)]) == "2P:7"
+
+
+def test_other_slot_or_several_writes_use_batch():
+    assert format_move_command([(1, 2, 45)]) == "BATCH:1P:2=45"
+    assert format_move_command([(1, 0, 123), (1, 1, 45)]) == "BATCH:1P:0=123,1=45"
+    # 플레이어별로 묶되 처음 나온 플레이어 순서 유지
+    assert format_move_command([(2, 0, 77), (1, 3, 5), (2, 1, 8)]) == "BATCH:2P:0=77,1=8;1P:3=5"
+
+
+@pytest.mark.parametrize("writes", [
+    [(1, 0, 123)],
+    [(2, 0, 400)],
+    [(1, 2, 45)],
+    [(1, 0, 123), (1, 1, 45), (2, 3, 77)],
+])
+def test_both_forms_write_the_same_slots(tmp_path, writes):
+    endpoint = MockLuaEndpoint(str(tmp_path))
+    responses = []
+    endpoint.respond = lambda request, kind, payload: responses.append(kind)
+    expected = {player: endpoint.read_moves(endpoint.address + (PLAYER2_OFFSET if player == 2 else 0))
+                for player in (1, 2)}
+    for player, slot, move_id in writes:
+        expected[player][slot] = move_id
+
+    endpoint.execute(format_move_command(writes), ("test", 1))
+
+    assert responses == ["DONE"]
+    for player in (1, 2):
+        address = endpoint.address + (PLAYER2_OFFSET if player == 2 else 0)
+        assert endpoint.read_moves(address) == expected[player]
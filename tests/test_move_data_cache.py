@@ -0,0 +1,123 @@
+import os
+
+import pytest
+
+import challenge_core
+from challenge_core import MoveDataCache, MoveTable
+
+CSV_TEXT = (
+    "id,name,type,category,power,accuracy,pp\n"
+    "1,막치기,노말,물리,40,100%,35\n"
+    "7,불꽃펀치,불꽃,물리,75,100%,15\n"
+    "8,냉동펀치,얼음,물리,75,100%,15\n"
+)
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / "moves.csv"
+    path.write_text(CSV_TEXT, encoding="utf-8")
+    return str(path)
+
+
+@pytest.fixture
+def parse_calls(monkeypatch):
+    """CSV를 다시 파싱한 횟수"""
+    calls = []
+    parse = MoveTable.parse.__func__
+
+    def counting_parse(cls, text):
+        calls.append(text)
+        return parse(cls, text)
+
+    monkeypatch.setattr(MoveTable, "parse", classmethod(counting_parse))
+    return calls
+
+
+def names(move_table):
+    return [record.name for record in move_table]
+
+
+def rewrite_csv(path, text, mtime_ns):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_second_load_uses_cache(csv_path, parse_calls):
+    move_table, _ = MoveDataCache(csv_path).load()
+    assert names(move_table) == ["막치기", "불꽃펀치", "냉동펀치"]
+    assert os.path.exists(os.path.splitext(csv_path)[0] + ".cache")
+
+    move_table, move_index = MoveDataCache(csv_path).load()
+    assert len(parse_calls) == 1
+    assert names(move_table) == ["막치기", "불꽃펀치", "냉동펀치"]
+    assert move_index.search.search("ㅂㄲ") == [7]
+
+
+def test_mtime_change_with_same_content_only_refreshes_header(csv_path, parse_calls):
+    cache = MoveDataCache(csv_path)
+    cache.load()
+    mtime_ns = os.stat(csv_path).st_mtime_ns + 5 * 10**9
+    rewrite_csv(csv_path, CSV_TEXT, mtime_ns)
+
+    cache.load()
+    assert len(parse_calls) == 1
+    header, _ = cache._read_cache()
+    assert header[3] == mtime_ns
+
+
+def test_size_change_rebuilds(csv_path, parse_calls):
+    cache = MoveDataCache(csv_path)
+    cache.load()
+    mtime_ns = os.stat(csv_path).st_mtime_ns
+    rewrite_csv(csv_path, CSV_TEXT + "33,몸통박치기,노말,물리,35,95%,35\n", mtime_ns)
+
+    move_table, _ = cache.load()
+    assert len(parse_calls) == 2
+    assert move_table.get(33).name == "몸통박치기"
+
+
+def test_content_change_with_same_size_rebuilds(csv_path, parse_calls):
+    cache = MoveDataCache(csv_path)
+    cache.load()
+    changed = CSV_TEXT.replace("75,100%,15\n8", "80,100%,15\n8")
+    assert len(changed.encode("utf-8")) == len(CSV_TEXT.encode("utf-8"))
+    rewrite_csv(csv_path, changed, os.stat(csv_path).st_mtime_ns + 5 * 10**9)
+
+    move_table, _ = cache.load()
+    assert len(parse_calls) == 2
+    assert move_table.get(7).power == 80
+
+
+@pytest.mark.parametrize("keep", [MoveDataCache.HEADER.size, MoveDataCache.HEADER.size + 10, -1])
+def test_truncated_cache_falls_back_to_csv(csv_path, parse_calls, keep):
+    cache = MoveDataCache(csv_path)
+    cache.load()
+    with open(cache.cache_path, "rb") as f:
+        data = f.read()
+    with open(cache.cache_path, "wb") as f:
+        f.write(data[:keep])
+
+    move_table, move_index = cache.load()
+    assert len(parse_calls) == 2
+    assert names(move_table) == ["막치기", "불꽃펀치", "냉동펀치"]
+    assert move_index.search.search("막칙") == [1]
+
+    # 캐시가 다시 써졌으므로 다음 로드는 CSV를 읽지 않음
+    with open(cache.cache_path, "rb") as f:
+        assert f.read() == data
+    cache.load()
+    assert len(parse_calls) == 2
+
+
+def test_garbage_payload_falls_back_to_csv(csv_path, parse_calls):
+    cache = MoveDataCache(csv_path)
+    cache.load()
+    with open(cache.cache_path, "r+b") as f:
+        f.seek(MoveDataCache.HEADER.size)
+        f.write(challenge_core.marshal.dumps({"records": [(1,)]}))
+
+    move_table, _ = cache.load()
+    assert len(parse_calls) == 2
+    assert names(move_table) == ["막치기", "불꽃펀치", "냉동펀치"]
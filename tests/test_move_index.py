@@ -0,0 +1,88 @@
+from challenge_core import EMPTY_SLOT_LABEL, MoveIndex, MoveTable
+
+CSV_TEXT = """id,name,type,category,power,accuracy,pp
+1,막치기,노말,물리,40,100%,35
+7,불꽃펀치,불꽃,물리,75,100%,15
+8,냉동펀치,얼음,물리,75,100%,15
+14,칼춤,노말,변화,—,—,30
+52,불꽃세례,불꽃,특수,40,100%,25
+126,불대문자,불꽃,특수,120,85%,5
+"""
+
+
+def make_index():
+    return MoveIndex(MoveTable.parse(CSV_TEXT))
+
+
+def test_filter_combines_type_category_and_search():
+    index = make_index()
+    assert index.filter() == [1, 7, 8, 14, 52, 126]
+    assert index.filter(move_type="불꽃") == [7, 52, 126]
+    assert index.filter(move_type="불꽃", category="특수") == [52, 126]
+    assert index.filter(search_text="펀치") == [7, 8]
+    assert index.filter(search_text="ㅂ", move_type="불꽃", category="물리") == [7]
+    assert index.filter(move_type="드래곤") == []
+
+
+def test_filter_by_used_status():
+    index = make_index()
+    index.set_used(7)
+    index.set_used(126)
+    assert index.filter(status="used") == [7, 126]
+    assert index.filter(status="unused") == [1, 8, 14, 52]
+    assert index.filter(move_type="불꽃", status="unused") == [52]
+
+
+def test_sort_orders_put_missing_numbers_last():
+    index = make_index()
+    assert index.filter(sort_column="power") == [1, 52, 7, 8, 126, 14]
+    assert index.filter(sort_column="power", sort_reverse=True) == [126, 7, 8, 1, 52, 14]
+    assert index.filter(sort_column="pp", sort_reverse=True)[0] == 1
+    assert index.filter(move_type="불꽃", sort_column="id", sort_reverse=True) == [126, 52, 7]
+    # 모르는 컬럼은 ID 순서
+    assert index.filter(sort_column="unknown") == [1, 7, 8, 14, 52, 126]
+
+
+def test_set_used_keeps_available_values_in_id_order():
+    index = make_index()
+    before = index.available_values()
+    index.set_used(8)
+    after = index.available_values()
+    assert after is not before
+    assert [label.split(".")[0] for label in after] == ["1", "7", "14", "52", "126"]
+    # 이미 사용한 기술을 다시 사용 처리하면 목록을 새로 만들지 않음
+    index.set_used(8)
+    assert index.available_values() is after
+
+    # 사용 취소는 목록을 다시 만들어 원래 순서 자리로 돌아감
+    index.set_used(8, used=False)
+    assert index.available_values() == before
+    assert not index.is_used(8)
+
+
+def test_load_used_rebuilds_available():
+    index = make_index()
+    index.set_used(1)
+    index.load_used(1 << 14 | 1 << 52)
+    assert index.used_bits == 1 << 14 | 1 << 52
+    assert list(index.available) == [1, 7, 8, 126]
+    assert index.filter(status="used") == [14, 52]
+
+
+def test_slot_values_and_labels():
+    index = make_index()
+    assert index.slot_values()[0] == EMPTY_SLOT_LABEL
+    assert index.slot_values()[1:] == ("1. 막치기", "7. 불꽃펀치", "8. 냉동펀치", "14. 칼춤", "52. 불꽃세례", "126. 불대문자")
+    assert index.slot_label(52) == "52. 불꽃세례"
+    assert index.slot_label(0) == EMPTY_SLOT_LABEL
+    assert index.slot_label(999) == EMPTY_SLOT_LABEL
+    # 사용해도 슬롯 선택 목록은 그대로
+    index.set_used(1)
+    assert index.slot_values()[1] == "1. 막치기"
+
+
+def test_state_round_trip_keeps_filters():
+    index = make_index()
+    restored = MoveIndex.from_state(index.to_state())
+    restored.set_used(52)
+    assert restored.filter(move_type="불꽃", status="unused", sort_column="power", sort_reverse=True) == [126, 7]
@@ -0,0 +1,67 @@
+import marshal
+import os
+
+from challenge_core import MoveSearchIndex, MoveTable
+
+CSV_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "pokemon_moves.csv")
+NAMES = {1: "막치기", 7: "불꽃펀치", 8: "냉동펀치", 10: "할퀴기", 33: "몸통박치기",
+         52: "불꽃세례", 126: "불대문자"}
+
+
+def ids(bits):
+    return sorted(i for i in range(bits.bit_length()) if bits >> i & 1)
+
+
+def test_choseong_query():
+    index = MoveSearchIndex(NAMES)
+    assert index.search("ㅁㅊ") == [1]
+    assert index.search("ㅂㄲ") == [7, 52]
+
+
+def test_trailing_consonant_is_read_as_next_choseong():
+    # "막치" 입력 도중 IME가 "막칙"을 만든 상태
+    index = MoveSearchIndex(NAMES)
+    assert index.search("막칙") == [1]
+    assert index.search("불꽃ㅍ") == [7]
+
+
+def test_ranking_prefix_before_substring():
+    index = MoveSearchIndex(NAMES)
+    assert index.search("불") == [7, 52, 126]
+    assert index.search("펀치") == [7, 8]
+    assert index.search("막치기") == [1]
+    assert index.search("치기") == [1, 33]
+
+
+def test_id_search_only_when_requested():
+    index = MoveSearchIndex(NAMES)
+    assert index.search("12", match_ids=True) == [126]
+    assert index.search("12") == []
+    assert index.search("1", match_ids=True)[:2] == [1, 10]
+
+
+def test_empty_query_and_candidates():
+    index = MoveSearchIndex(NAMES)
+    assert ids(index.match_bits("")) == sorted(NAMES)
+    assert index.search("불", candidates=1 << 52 | 1 << 126) == [52, 126]
+
+
+def test_incremental_queries_match_fresh_index():
+    # 이전 검색어 결과로 후보를 좁혀도 새 인덱스에서 바로 찾은 결과와 같아야 함
+    typed = MoveSearchIndex(NAMES)
+    for query in ("ㅂ", "부", "불", "불ㄲ", "불꼬", "불꽃", "불꽃ㅍ", "불꽃퍼", "불꽃펀", "불꽃펀치", "불꽃", "불", ""):
+        assert typed.match_bits(query) == MoveSearchIndex(NAMES).match_bits(query), query
+
+
+def test_state_round_trip():
+    index = MoveSearchIndex(NAMES)
+    restored = MoveSearchIndex.from_state(marshal.loads(marshal.dumps(index.to_state())))
+    for query in ("ㅁㅊ", "막칙", "불", "펀치", "12"):
+        assert restored.search(query, match_ids=True) == index.search(query, match_ids=True)
+
+
+def test_real_move_table():
+    table = MoveTable.load(CSV_PATH)
+    index = MoveSearchIndex({record.id: record.name for record in table})
+    assert index.search("ㅁㅊ")[0] == 1
+    assert index.search("불꽃펀치") == [7]
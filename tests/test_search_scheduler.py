@@ -0,0 +1,88 @@
+import pytest
+
+import oneshot_allmove_challenge as tracker
+from oneshot_allmove_challenge import SearchScheduler
+
+
+class FakeWidget:
+    """Tk after/after_cancel 대신 가짜 시계(ms)로 예약을 실행"""
+    def __init__(self):
+        self.now_ms = 0
+        self.jobs = {}  # job id -> (실행 시각 ms, 함수)
+        self.next_id = 0
+
+    def after(self, delay_ms, func):
+        self.next_id += 1
+        self.jobs[self.next_id] = (self.now_ms + delay_ms, func)
+        return self.next_id
+
+    def after_cancel(self, job):
+        del self.jobs[job]
+
+    def advance(self, ms):
+        """ms만큼 시간을 진행하며 때가 된 예약 실행"""
+        end = self.now_ms + ms
+        while True:
+            due = [(when, job) for job, (when, _) in self.jobs.items() if when <= end]
+            if not due:
+                break
+            when, job = min(due)
+            self.now_ms = when
+            self.jobs.pop(job)[1]()
+        self.now_ms = end
+
+
+@pytest.fixture
+def widget(monkeypatch):
+    widget = FakeWidget()
+    monkeypatch.setattr(tracker.time, "perf_counter", lambda: widget.now_ms / 1000)
+    return widget
+
+
+def test_runs_once_after_last_input(widget):
+    calls = []
+    scheduler = SearchScheduler(widget, 100, lambda: calls.append(widget.now_ms), max_wait_ms=1000)
+    for _ in range(5):
+        scheduler.schedule()
+        widget.advance(50)
+    assert calls == []
+    widget.advance(100)
+    assert calls == [300]
+    assert not widget.jobs
+
+
+def test_max_wait_forces_run_while_typing(widget):
+    calls = []
+    scheduler = SearchScheduler(widget, 100, lambda: calls.append(widget.now_ms))  # max_wait = 300ms
+    assert scheduler.max_wait_ms == 300
+    for _ in range(20):
+        scheduler.schedule()
+        widget.advance(40)
+    # 계속 입력해도 (실행 후) 첫 입력부터 300ms 안에 실행: 0 -> 300, 320 -> 620
+    assert calls == [300, 620]
+    # 마지막 입력(760ms) 후에는 평소대로 100ms 뒤 실행
+    widget.advance(200)
+    assert calls == [300, 620, 860]
+
+
+def test_cancel_drops_pending_run(widget):
+    calls = []
+    scheduler = SearchScheduler(widget, 100, lambda: calls.append(widget.now_ms))
+    scheduler.schedule()
+    scheduler.cancel()
+    widget.advance(500)
+    assert calls == []
+
+    # 취소한 뒤 다시 예약하면 새로 대기 시작
+    scheduler.schedule()
+    widget.advance(100)
+    assert calls == [600]
+
+
+def test_zero_delay_runs_on_next_idle(widget):
+    calls = []
+    scheduler = SearchScheduler(widget, -10, lambda: calls.append(widget.now_ms))
+    assert scheduler.delay_ms == 0
+    scheduler.schedule()
+    widget.advance(0)
+    assert calls == [0]
@@ -0,0 +1,124 @@
+import random
+
+from challenge_core import UsedMoveState, pack_used_moves, unpack_used_moves
+
+TYPES = {1: "노말", 7: "불꽃", 8: "얼음", 33: "노말", 52: "불꽃", 100: "에스퍼"}
+CATEGORIES = {1: "물리", 7: "물리", 8: "물리", 33: "물리", 52: "특수", 100: "변화"}
+
+
+def recount(state):
+    """기술 하나씩 다시 센 (사용 수, 타입별, 카테고리별)"""
+    used = [move_id for move_id in TYPES if move_id in state]
+    type_counts = {key: sum(TYPES[i] == key for i in used) for key in state.type_masks}
+    category_counts = {key: sum(CATEGORIES[i] == key for i in used) for key in state.category_masks}
+    return len(used), type_counts, category_counts
+
+
+def test_totals_from_move_data():
+    state = UsedMoveState(TYPES, CATEGORIES)
+    assert state.move_count == 6
+    assert state.type_totals == {"노말": 2, "불꽃": 2, "얼음": 1, "에스퍼": 1}
+    assert state.category_totals == {"물리": 4, "특수": 1, "변화": 1}
+    assert len(state) == 0
+    assert state.unused_bits == state.all_bits
+
+
+def test_add_and_discard_update_counters():
+    state = UsedMoveState(TYPES, CATEGORIES)
+    assert state.add(7)
+    assert state.add(52)
+    assert not state.add(7)
+    assert 7 in state and 52 in state and 8 not in state
+    assert len(state) == 2
+    assert state.type_progress("불꽃") == (2, 2)
+    assert state.category_progress("특수") == (1, 1)
+
+    assert state.discard(7)
+    assert not state.discard(7)
+    assert not state.discard(8)
+    assert len(state) == 1
+    assert state.type_progress("불꽃") == (1, 2)
+    assert state.category_progress("물리") == (0, 4)
+
+
+def test_unknown_ids_are_ignored():
+    state = UsedMoveState(TYPES, CATEGORIES)
+    assert not state.add(2)
+    assert not state.add(500)
+    assert not state.discard(2)
+    assert len(state) == 0 and state.bits == 0
+    assert state.type_progress("격투") == (0, 0)
+
+
+def test_load_bits_masks_unknown_ids():
+    state = UsedMoveState(TYPES, CATEGORIES)
+    state.load_bits(1 << 1 | 1 << 2 | 1 << 33 | 1 << 600)
+    assert state.bits == 1 << 1 | 1 << 33
+    assert len(state) == 2
+    assert state.type_progress("노말") == (2, 2)
+    assert state.unused_bits == state.all_bits & ~state.bits
+
+
+def test_set_and_clear_bits():
+    state = UsedMoveState(TYPES, CATEGORIES)
+    state.add(1)
+    state.set_bits(1 << 8 | 1 << 100)
+    assert len(state) == 3
+    state.clear_bits(1 << 1 | 1 << 8)
+    assert state.bits == 1 << 100
+    assert state.category_progress("변화") == (1, 1)
+    assert recount(state) == (len(state), state.type_counts, state.category_counts)
+
+
+def test_incremental_counters_match_recount():
+    state = UsedMoveState(TYPES, CATEGORIES)
+    rng = random.Random(0)
+    for _ in range(500):
+        move_id = rng.choice(list(TYPES) + [2, 3])
+        if rng.random() < 0.6:
+            state.add(move_id)
+        else:
+            state.discard(move_id)
+        assert recount(state) == (len(state), state.type_counts, state.category_counts)
+
+    reloaded = UsedMoveState(TYPES, CATEGORIES)
+    reloaded.load_bits(state.bits)
+    assert (reloaded.count, reloaded.type_counts, reloaded.category_counts) == \
+        (state.count, state.type_counts, state.category_counts)
+
+
+def test_copy_is_independent():
+    state = UsedMoveState(TYPES, CATEGORIES)
+    state.add(7)
+    snapshot = state.copy()
+    state.add(8)
+    state.discard(7)
+    assert snapshot.bits == 1 << 7
+    assert len(snapshot) == 1
+    assert snapshot.type_progress("불꽃") == (1, 2)
+    assert snapshot.type_progress("얼음") == (0, 1)
+
+
+def test_clear():
+    state = UsedMoveState(TYPES, CATEGORIES)
+    state.set_bits(state.all_bits)
+    assert len(state) == state.move_count
+    state.clear()
+    assert len(state) == 0
+    assert all(count == 0 for count in state.type_counts.values())
+
+
+def test_pack_round_trip():
+    state = UsedMoveState(TYPES, CATEGORIES)
+    state.set_bits(1 << 1 | 1 << 52 | 1 << 100)
+    assert unpack_used_moves(pack_used_moves(state)) == state.bits
+
+
+def test_pack_size_follows_move_count():
+    # 기술 ID 1~467이면 59바이트 (예전 세이브와 같은 길이)
+    types = {move_id: "노말" for move_id in range(1, 468)}
+    state = UsedMoveState(types, {})
+    state.add(467)
+    packed = pack_used_moves(state)
+    assert len(packed) == 59 * 2
+    assert unpack_used_moves(packed) == 1 << 467